@@ -2,233 +2,634 @@ from flask import Flask, render_template, request, jsonify
 import os
 import json
 import requests
+import threading
+import time
+import hashlib
+import math
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime
 from dotenv import load_dotenv
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, g, request, jsonify, render_template
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 
+import geohash
+import json_backend
+from disk_cache import DiskCache
+from refresh_scheduler import BackgroundRefresher, RefreshScheduler
+from location_index import get_location_index
+from metrics import registry
+from response_cache import ResponseCache, TTLCache
+from single_flight import upstream_flight, upstream_key
+from upstream_client import QuotaExceededError, get_default_client
+from upstream_trace import upstream_tracer
+from weather_models import ForecastSeries
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    ให้ jsonify ใช้ json_backend (orjson ถ้าติดตั้งไว้) ผ่าน dumps/loads และ encode() สำหรับ body ที่เข้ารหัสไว้ล่วงหน้า
+    
+    ใช้ sort_keys/ensure_ascii ของ provider เหมือน Flask ข้อมูลจาก OpenWeatherMap (ชนิดพื้นฐานของ JSON)
+    จึงได้ body (และ ETag) เหมือนกันไม่ว่าจะติดตั้ง orjson หรือไม่ ดูข้อยกเว้นใน json_backend
+    """
+    
+    # ข้อความภาษาไทยส่งเป็น UTF-8 ตรง ๆ ไม่ต้อง escape เป็น \uXXXX
+    ensure_ascii = False
+    
+    def encode(self, obj):
+        """เข้ารหัส obj เป็น JSON bytes แบบ compact ตามค่าตั้งของ provider"""
+        return json_backend.dumps(obj, default=self.default, sort_keys=self.sort_keys,
+                                  ensure_ascii=self.ensure_ascii)
+    
+    def dumps(self, obj, **kwargs):
+        sort_keys = kwargs.pop('sort_keys', self.sort_keys)
+        ensure_ascii = kwargs.pop('ensure_ascii', self.ensure_ascii)
+        default = kwargs.pop('default', self.default)
+        if kwargs:
+            # ตัวเลือกอื่น (เช่น indent) ให้ json ของ Python จัดการ
+            return super().dumps(obj, sort_keys=sort_keys, ensure_ascii=ensure_ascii, default=default, **kwargs)
+        return json_backend.dumps(obj, default=default, sort_keys=sort_keys, ensure_ascii=ensure_ascii).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return json_backend.loads(s)
+
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app)  # เปิดใช้งาน CORS สำหรับทุก route
 
 # โหลด API Key จากไฟล์ .env
 load_dotenv()
 API_KEY = os.getenv('OPENWEATHER_API_KEY')
 
-def get_weather(city_name, api_key):
+# แคชผลลัพธ์จาก OpenWeatherMap ใช้ร่วมกันทุก request ใน process เดียวกัน
+FORECAST_CACHE_TTL = float(os.getenv('FORECAST_CACHE_TTL', ResponseCache.DEFAULT_TTLS['forecast']))
+response_cache = ResponseCache(
+    ttls={
+        'weather': float(os.getenv('WEATHER_CACHE_TTL', ResponseCache.DEFAULT_TTLS['weather'])),
+        'forecast': FORECAST_CACHE_TTL,
+        'forecast_daily': FORECAST_CACHE_TTL  # สรุปรายวันมีอายุเท่ากับพยากรณ์ที่ใช้คำนวณ
+    },
+    maxsize=int(os.getenv('RESPONSE_CACHE_SIZE', '1024')),
+    # แคชบนดิสก์ (SQLite) ทำให้รีสตาร์ท/deploy แล้วยังมีข้อมูลพร้อมใช้
+    disk=DiskCache.from_env(),
+    # หลังหมด TTL ยังส่งข้อมูลเดิมได้อีกช่วงหนึ่งระหว่างรีเฟรชในเบื้องหลัง
+    stale_ttls={
+        'weather': float(os.getenv('WEATHER_STALE_TTL', '1800')),
+        'forecast': float(os.getenv('FORECAST_STALE_TTL', '3600'))
+    }
+)
+app.logger.info(f"โหลดแคชจากดิสก์ {response_cache.warm()} รายการ")
+
+# JSON ของ /api/weather ที่เข้ารหัสแล้ว ใช้ซ้ำได้ตราบใดที่ข้อมูลต้นทางในแคชยังเป็นชุดเดิม
+rendered_responses = TTLCache(maxsize=int(os.getenv('RESPONSE_CACHE_SIZE', '1024')))
+
+# รีเฟรชแคชในเบื้องหลัง (stale-while-revalidate) และรีเฟรชเมืองยอดนิยมล่วงหน้าก่อนหมดอายุ
+cache_refresher = BackgroundRefresher(max_workers=int(os.getenv('REFRESH_WORKERS', '2')))
+refresh_scheduler = RefreshScheduler(
+    response_cache,
+    cache_refresher,
+    top_n=int(os.getenv('REFRESH_TOP_N', '20')),
+    interval=float(os.getenv('REFRESH_INTERVAL', '60')),
+    lead_time=float(os.getenv('REFRESH_LEAD_TIME', '120'))
+)
+
+# โหลด index ค้นหาสถานที่ตั้งแต่เริ่ม process เพื่อไม่ให้ request autocomplete แรกต้องรอ
+app.logger.info(f"โหลด index สถานที่ {len(get_location_index())} รายการ")
+
+# thread pool สำหรับเรียก OpenWeatherMap พร้อมกันหลาย endpoint
+# (ค่าเริ่มต้นเท่ากับ connection pool เพื่อให้ request พร้อมกันหลายรายการไม่ต้องรอคิว thread)
+upstream_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('UPSTREAM_WORKERS', os.getenv('UPSTREAM_POOL_SIZE', '16'))),
+    thread_name_prefix='owm-upstream'
+)
+# เวลาสูงสุด (วินาที) ที่ /api/weather ยอมรอข้อมูลจาก OpenWeatherMap นับจากเริ่มเรียกจริง
+UPSTREAM_DEADLINE = float(os.getenv('UPSTREAM_DEADLINE', '8'))
+# ฟิลด์ที่เพิ่มในข้อมูลพยากรณ์ก่อนเก็บลงแคช: เวลาที่ดึงจาก OpenWeatherMap
+FORECAST_FETCHED_AT = '_fetched_at'
+# ความละเอียดของช่อง geohash ที่ใช้รวมพิกัดใกล้เคียงกัน (5 ≈ 4.9 กม.)
+GEOHASH_PRECISION = int(os.getenv('GEOHASH_PRECISION', '5'))
+
+def location_params(city_name=None, coords=None):
+    """
+    สร้างพารามิเตอร์ตำแหน่งสำหรับ OpenWeatherMap
+    
+    พิกัดจะถูกปัดไปยังจุดกึ่งกลางของช่อง geohash เพื่อให้ผู้ใช้ที่อยู่ใกล้กัน
+    ใช้ cache key และผลลัพธ์จาก upstream ร่วมกัน
+    
+    Args:
+        city_name (str): ชื่อเมือง (ใช้เมื่อไม่ได้ระบุพิกัด)
+        coords (tuple): (ละติจูด, ลองจิจูด)
+        
+    Returns:
+        dict: {'q': ...} หรือ {'lat': ..., 'lon': ...}
+    """
+    if coords is not None:
+        _, lat, lon = geohash.snap(coords[0], coords[1], GEOHASH_PRECISION)
+        return {'lat': lat, 'lon': lon}
+    return {'q': city_name}
+
+def get_weather(city_name, api_key, coords=None):
     """
     ฟังก์ชันสำหรับดึงข้อมูลสภาพอากาศจาก OpenWeatherMap API
     
     Args:
         city_name (str): ชื่อเมืองที่ต้องการตรวจสอบสภาพอากาศ
         api_key (str): API Key สำหรับใช้งาน OpenWeatherMap
+        coords (tuple): (ละติจูด, ลองจิจูด) ใช้แทนชื่อเมืองถ้าระบุ
         
     Returns:
         dict: ข้อมูลสภาพอากาศในรูปแบบ dictionary
     """
     if not api_key or api_key == 'your_api_key_here':
-        print("Error: ยังไม่ได้ตั้งค่า API Key ในไฟล์ .env")
+        upstream_tracer.failure('weather', 'ยังไม่ได้ตั้งค่า API Key ในไฟล์ .env')
         return {'error': 'กรุณาตั้งค่า OpenWeatherMap API Key ในไฟล์ .env'}
     
-    print(f"\n=== กำลังดึงข้อมูลสภาพอากาศ ===")
-    print(f"เมือง: {city_name}")
-    
-    base_url = "http://api.openweathermap.org/data/2.5/weather"
-    params = {
-        'q': city_name,
+    params = _weather_params(city_name, api_key, coords)
+    return _cached_or_fetch('weather', params, lambda: _request_weather(params))
+
+def _weather_params(city_name, api_key, coords=None):
+    """สร้างพารามิเตอร์สำหรับขอข้อมูลสภาพอากาศปัจจุบัน"""
+    return {
+        **location_params(city_name, coords),
         'appid': api_key,
         'units': 'metric',  # ใช้หน่วยเมตริก (องศาเซลเซียส)
         'lang': 'th'  # ใช้ภาษาไทย
     }
-    
-    print(f"URL: {base_url}")
-    print(f"Parameters: {params}")
-    
-    try:
-        # ส่งคำขอไปยัง OpenWeatherMap API
-        print("\n=== ส่งคำขอไปยัง OpenWeatherMap ===")
-        response = requests.get(base_url, params=params)
-        
-        # ตรวจสอบสถานะการตอบกลับ
-        print("\n=== การตอบกลับจาก API ===")
-        print(f"Status Code: {response.status_code}")
-        print(f"Response Headers: {response.headers}")
-        
-        # พยายามแปลงข้อมูล JSON
-        data = response.json()
-        print(f"Response JSON: {data}")
-        
-        # ตรวจสอบสถานะการตอบกลับ
-        if response.status_code != 200:
-            error_msg = data.get('message', 'เกิดข้อผิดพลาดในการเชื่อมต่อกับ OpenWeatherMap API')
-            print(f"Error: {error_msg}")
-            return {'error': error_msg}
-            
-        print("\n=== ดึงข้อมูลสำเร็จ ===")
-        return data
-        
-    except requests.exceptions.RequestException as e:
-        error_msg = f"เกิดข้อผิดพลาดในการเชื่อมต่อ: {str(e)}"
-        print(f"Error: {error_msg}")
-        return {'error': error_msg}
-    except json.JSONDecodeError as e:
-        error_msg = f"เกิดข้อผิดพลาดในการแปลงข้อมูล JSON: {str(e)}"
-        print(f"Error: {error_msg}")
-        return {'error': 'เกิดข้อผิดพลาดในการประมวลผลข้อมูลจาก API'}
-    except Exception as e:
-        error_msg = f"เกิดข้อผิดพลาดที่ไม่คาดคิด: {str(e)}"
-        print(f"Error: {error_msg}")
-        return {'error': 'เกิดข้อผิดพลาดในการดึงข้อมูลสภาพอากาศ'}
 
-def get_forecast(city_name, api_key):
+def _cached_or_fetch(endpoint, params, fetch):
     """
-    ฟังก์ชันสำหรับดึงข้อมูลพยากรณ์อากาศ 5 วัน จาก OpenWeatherMap API
+    คืนข้อมูลจากแคช หรือดึงจาก upstream ถ้าไม่มี
     
-    Args:
-        city_name (str): ชื่อเมืองที่ต้องการตรวจสอบพยากรณ์อากาศ
-        api_key (str): API Key สำหรับใช้งาน OpenWeatherMap
-        
-    Returns:
-        dict: ข้อมูลพยากรณ์อากาศในรูปแบบ dictionary
+    ข้อมูลที่เลย TTL แล้วแต่ยังไม่เกิน stale TTL จะถูกส่งกลับทันที
+    พร้อมสั่งรีเฟรชในเบื้องหลัง ผู้ใช้จึงไม่ต้องรอ OpenWeatherMap
     """
-    if not api_key or api_key == 'your_api_key_here':
-        return {'error': 'กรุณาตั้งค่า OpenWeatherMap API Key ในไฟล์ .env'}
-    
-    print(f"\n=== กำลังดึงข้อมูลพยากรณ์อากาศ 5 วัน ===")
-    print(f"เมือง: {city_name}")
+    refresh_scheduler.track(endpoint, params, fetch)
     
-    base_url = "http://api.openweathermap.org/data/2.5/forecast"
-    params = {
-        'q': city_name,
-        'appid': api_key,
-        'units': 'metric',  # ใช้หน่วยเมตริก (องศาเซลเซียส)
-        'lang': 'th',  # ใช้ภาษาไทย
-        'cnt': 40  # จำนวนรายการพยากรณ์ (5 วัน * 8 รายการต่อวัน = 40 รายการ)
-    }
+    cached, stale = response_cache.get_stale(endpoint, params)
+    if cached is not None:
+        if stale:
+            cache_refresher.refresh(upstream_key(endpoint, params), fetch)
+        return cached
     
-    print(f"Forecast URL: {base_url}")
-    print(f"Forecast Parameters: {params}")
+    # คำขอที่เหมือนกันซึ่งกำลังรอผลอยู่จะใช้ผลลัพธ์เดียวกัน (single-flight)
+    return upstream_flight.do(upstream_key(endpoint, params), fetch)
+
+def _request_weather(params):
+    """ส่งคำขอข้อมูลสภาพอากาศปัจจุบันไปยัง OpenWeatherMap และเก็บผลลัพธ์ลงแคช"""
+    # log ระดับ DEBUG เท่านั้นและสุ่มตัวอย่างตาม UPSTREAM_TRACE_SAMPLE
+    span = upstream_tracer.span('weather', params=params)
     
     try:
-        # ส่งคำขอไปยัง OpenWeatherMap API
-        print("\n=== ส่งคำขอพยากรณ์อากาศไปยัง OpenWeatherMap ===")
-        response = requests.get(base_url, params=params)
-        
-        # ตรวจสอบสถานะการตอบกลับ
-        print(f"\n=== การตอบกลับจาก API พยากรณ์อากาศ ===")
-        print(f"Status Code: {response.status_code}")
-        
-        # พยายามแปลงข้อมูล JSON
-        data = response.json()
-        print(f"Forecast Response: {json.dumps(data, indent=2, ensure_ascii=False)[:500]}...")  # แสดงเฉพาะส่วนต้นของข้อมูล
+        # ใช้ client กลางที่มี connection pool, timeout และการลองใหม่
+        response = get_default_client().get('weather', params)
+        data = json_backend.loads(response.content)
+        span.event('response', status=response.status_code)
         
         # ตรวจสอบสถานะการตอบกลับ
         if response.status_code != 200:
             error_msg = data.get('message', 'เกิดข้อผิดพลาดในการเชื่อมต่อกับ OpenWeatherMap API')
-            print(f"Error: {error_msg}")
+            upstream_tracer.failure('weather', 'upstream error', status=response.status_code, message=error_msg)
             return {'error': error_msg}
             
-        print("\n=== ดึงข้อมูลพยากรณ์อากาศสำเร็จ ===")
+        response_cache.set('weather', params, data)
         return data
         
+    except QuotaExceededError as e:
+        # ต้องจับก่อน RequestException: โควตาเต็มเป็นปัญหาฝั่งเซิร์ฟเวอร์ ไม่ใช่คำขอของผู้ใช้ผิด
+        upstream_tracer.failure('weather', 'quota exceeded', error=e)
+        return {'error': 'มีคำขอไปยัง OpenWeatherMap มากเกินไป กรุณาลองใหม่ภายหลัง',
+                'retry_after': e.retry_after}
     except requests.exceptions.RequestException as e:
         error_msg = f"เกิดข้อผิดพลาดในการเชื่อมต่อ: {str(e)}"
-        print(f"Forecast Error: {error_msg}")
+        upstream_tracer.failure('weather', 'request failed', error=e)
         return {'error': error_msg}
     except json.JSONDecodeError as e:
-        error_msg = f"เกิดข้อผิดพลาดในการแปลงข้อมูล JSON: {str(e)}"
-        print(f"Forecast JSON Error: {error_msg}")
-        return {'error': 'เกิดข้อผิดพลาดในการประมวลผลข้อมูลพยากรณ์อากาศ'}
-    except Exception as e:
-        error_msg = f"เกิดข้อผิดพลาดที่ไม่คาดคิด: {str(e)}"
-        print(f"Forecast Error: {error_msg}")
-        return {'error': 'เกิดข้อผิดพลาดในการดึงข้อมูลพยากรณ์อากาศ'}
-    except requests.exceptions.RequestException as e:
-        return {'error': 'เกิดข้อผิดพลาดในการเชื่อมต่อกับเซิร์ฟเวอร์สภาพอากาศ'}
+        upstream_tracer.failure('weather', 'invalid JSON', error=e)
+        return {'error': 'เกิดข้อผิดพลาดในการประมวลผลข้อมูลจาก API'}
     except Exception as e:
-        return {'error': f'เกิดข้อผิดพลาด: {str(e)}'}
+        upstream_tracer.failure('weather', 'unexpected error', error=e)
+        return {'error': 'เกิดข้อผิดพลาดในการดึงข้อมูลสภาพอากาศ'}
 
-def get_forecast(city_name, api_key):
+def get_forecast(city_name, api_key, coords=None):
     """
-    ฟังก์ชันสำหรับดึงข้อมูลพยากรณ์อากาศ 5 วัน
+    ฟังก์ชันสำหรับดึงข้อมูลพยากรณ์อากาศ 5 วัน (ระบุ coords เพื่อค้นหาด้วยพิกัด)
     """
     if not api_key or api_key == 'your_api_key_here':
         return None
         
-    base_url = "http://api.openweathermap.org/data/2.5/forecast"
-    params = {
-        'q': city_name,
+    params = _forecast_params(city_name, api_key, coords)
+    return _cached_or_fetch('forecast', params, lambda: _request_forecast(params))
+
+def _forecast_params(city_name, api_key, coords=None):
+    """สร้างพารามิเตอร์สำหรับขอข้อมูลพยากรณ์อากาศ 5 วัน"""
+    return {
+        **location_params(city_name, coords),
         'appid': api_key,
         'units': 'metric',
         'lang': 'th',
         'cnt': 40  # จำนวนรายการ (5 วัน * 8 รายการต่อวัน)
     }
-    
+
+def _request_forecast(params):
+    """ส่งคำขอข้อมูลพยากรณ์อากาศไปยัง OpenWeatherMap และเก็บผลลัพธ์ลงแคช"""
+    span = upstream_tracer.span('forecast', params=params)
     try:
-        response = requests.get(base_url, params=params)
+        response = get_default_client().get('forecast', params)
         response.raise_for_status()
-        data = response.json()
+        data = json_backend.loads(response.content)
+        span.event('response', status=response.status_code, items=len(data.get('list', [])))
         
         # ตรวจสอบว่ามีข้อมูลที่ถูกต้องหรือไม่
         if not data or 'list' not in data:
             return None
             
+        # เวลาที่ดึงข้อมูลชุดนี้ ใช้เป็นส่วนหนึ่งของคีย์สรุปรายวัน (frontend ใช้เฉพาะ list จึงไม่เห็นฟิลด์นี้)
+        data[FORECAST_FETCHED_AT] = time.time()
+        response_cache.set('forecast', params, data)
         return data
         
-    except:
+    except Exception as e:
+        upstream_tracer.failure('forecast', 'request failed', error=e)
         return None
 
+def get_daily_forecast(city_name, api_key, forecast=None, coords=None):
+    """
+    ฟังก์ชันสำหรับดึงพยากรณ์อากาศที่สรุปเป็นรายวันแล้ว
+    
+    ผลสรุปถูกคำนวณครั้งเดียวต่อพยากรณ์แต่ละชุดแล้วเก็บในแคช ทำให้ frontend ไม่ต้องจัดกลุ่มข้อมูลเอง
+    
+    Args:
+        city_name (str): ชื่อเมืองที่ต้องการตรวจสอบพยากรณ์อากาศ
+        api_key (str): API Key สำหรับใช้งาน OpenWeatherMap
+        forecast (dict): ข้อมูลพยากรณ์อากาศดิบที่ดึงมาแล้ว (ถ้ามี จะไม่ดึงซ้ำ)
+        coords (tuple): (ละติจูด, ลองจิจูด) ใช้แทนชื่อเมืองถ้าระบุ
+        
+    Returns:
+        list: รายการสรุปรายวัน (min/max/mean, ไอคอนที่พบบ่อยที่สุด, ปริมาณฝนรวม) หรือ None หากดึงข้อมูลไม่ได้
+    """
+    if not api_key or api_key == 'your_api_key_here':
+        return None
+    
+    if forecast is None:
+        forecast = get_forecast(city_name, api_key, coords)
+    if not forecast:
+        return None
+    
+    # คีย์ผูกกับพยากรณ์ชุดที่ใช้คำนวณ สรุปจากข้อมูลเก่า (เช่นระหว่างรีเฟรชเบื้องหลัง)
+    # จึงไม่มีทางถูกใช้แทนสรุปของพยากรณ์ชุดใหม่ และไม่ต้องลบทิ้งเมื่อพยากรณ์เปลี่ยน
+    params = {**_forecast_params(city_name, api_key, coords), 'source': forecast.get(FORECAST_FETCHED_AT, 0)}
+    cached = response_cache.get('forecast_daily', params)
+    if cached is not None:
+        return cached
+    
+    daily = [day.to_dict() for day in ForecastSeries.from_response(forecast).daily()]
+    response_cache.set('forecast_daily', params, daily)
+    return daily
+
+class _UpstreamTask:
+    """งานใน upstream_executor ที่บันทึกเวลาเริ่มทำงานจริง เพื่อไม่นับเวลารอคิวเป็นส่วนหนึ่งของ deadline"""
+    
+    def __init__(self, fn, *args):
+        self.started = threading.Event()
+        self.started_at = None
+        self.future = upstream_executor.submit(self._run, fn, args)
+    
+    def _run(self, fn, args):
+        self.started_at = time.monotonic()
+        self.started.set()
+        return fn(*args)
+    
+    def result(self, deadline, queue_deadline):
+        """
+        รอผลลัพธ์ภายใน deadline วินาทีนับจากงานเริ่มทำงาน
+        
+        Args:
+            deadline (float): เวลาที่ให้ upstream ตอบหลังงานเริ่ม
+            queue_deadline (float): เวลา (time.monotonic) ล่าสุดที่งานต้องได้เริ่ม ถ้า pool เต็มนานกว่านี้จะหมดเวลา
+            
+        Raises:
+            concurrent.futures.TimeoutError: ถ้างานไม่ได้เริ่มหรือไม่เสร็จทันเวลา
+        """
+        if not self.started.wait(max(0.0, queue_deadline - time.monotonic())):
+            raise FutureTimeoutError()
+        return self.future.result(timeout=max(0.0, self.started_at + deadline - time.monotonic()))
+    
+    def cancel(self):
+        self.future.cancel()
+
+def fetch_weather_and_forecast(city_name, api_key, deadline=None, coords=None):
+    """
+    ฟังก์ชันสำหรับดึงข้อมูลสภาพอากาศปัจจุบันและพยากรณ์อากาศพร้อมกัน
+    
+    ทั้งสองคำขอถูกส่งไปยัง OpenWeatherMap พร้อมกัน แต่ละคำขอมีเวลา deadline นับจากตอนที่เริ่มทำงานจริง
+    (เวลารอคิวใน thread pool ไม่ถูกนับ แต่ต้องได้เริ่มภายใน deadline หลังส่งงาน)
+    หากพยากรณ์อากาศตอบกลับไม่ทันเวลา จะคืนค่าเฉพาะข้อมูลปัจจุบัน (partial)
+    
+    Args:
+        city_name (str): ชื่อเมืองที่ต้องการตรวจสอบสภาพอากาศ
+        api_key (str): API Key สำหรับใช้งาน OpenWeatherMap
+        deadline (float): เวลาสูงสุดต่อคำขอเป็นวินาที (ค่าเริ่มต้น UPSTREAM_DEADLINE)
+        coords (tuple): (ละติจูด, ลองจิจูด) ใช้แทนชื่อเมืองถ้าระบุ
+        
+    Returns:
+        tuple: (ข้อมูลสภาพอากาศปัจจุบัน, ข้อมูลพยากรณ์อากาศหรือ None, พยากรณ์หมดเวลาหรือไม่)
+        
+    Raises:
+        concurrent.futures.TimeoutError: ถ้าข้อมูลสภาพอากาศปัจจุบันตอบกลับไม่ทันเวลา
+    """
+    if deadline is None:
+        deadline = UPSTREAM_DEADLINE
+    queue_deadline = time.monotonic() + deadline
+    
+    weather_task = _UpstreamTask(get_weather, city_name, api_key, coords)
+    forecast_task = _UpstreamTask(get_forecast, city_name, api_key, coords)
+    
+    try:
+        current_weather = weather_task.result(deadline, queue_deadline)
+    except FutureTimeoutError:
+        forecast_task.cancel()
+        raise
+    
+    # ไม่ต้องรอพยากรณ์อากาศถ้าข้อมูลปัจจุบันผิดพลาดอยู่แล้ว
+    if 'error' in current_weather:
+        forecast_task.cancel()
+        return current_weather, None, False
+    
+    try:
+        forecast = forecast_task.result(deadline, queue_deadline)
+        return current_weather, forecast, False
+    except FutureTimeoutError:
+        # คำขอที่ค้างอยู่จะทำงานต่อในเบื้องหลังและเติมแคชให้ request ถัดไป
+        return current_weather, None, True
+
+# metric ของ HTTP request แยกตาม route (ใช้ rule ของ Flask เพื่อไม่ให้ label เพิ่มตาม query)
+http_requests = registry.counter('weather_http_requests_total', 'HTTP requests by route, method and status',
+                                 ('route', 'method', 'status'))
+http_latency = registry.histogram('weather_http_request_duration_seconds', 'HTTP request latency by route',
+                                  ('route',))
+http_in_flight = registry.gauge('weather_http_requests_in_flight', 'HTTP requests currently being served',
+                                ('route',))
+
+def _route_label():
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+@app.before_request
+def start_request_timer():
+    """เริ่มจับเวลาและนับ request ที่กำลังทำงาน"""
+    g.metrics_started = time.perf_counter()
+    g.metrics_route = _route_label()
+    http_in_flight.inc(g.metrics_route)
+
+@app.after_request
+def record_request_metrics(response):
+    """บันทึกจำนวน request และเวลาที่ใช้ของแต่ละ route"""
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        route = g.metrics_route
+        http_latency.observe(time.perf_counter() - started, route)
+        http_requests.inc(route, request.method, str(response.status_code))
+    return response
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    """ลดจำนวน request ที่กำลังทำงาน (รวมกรณีเกิด exception)"""
+    route = g.pop('metrics_route', None)
+    if route is None:
+        return
+    if g.pop('metrics_started', None) is not None:
+        # after_request ไม่ถูกเรียกเพราะเกิด exception
+        http_requests.inc(route, request.method, '500')
+    http_in_flight.dec(route)
+
+def _collect_service_metrics():
+    """แปลงสถิติของแคช, single-flight และ rate limiter เป็น metric ตอนที่ถูก scrape"""
+    cache = response_cache.stats()
+    endpoints = cache['endpoints']
+    for field in ('hits', 'stale_hits', 'disk_hits', 'misses'):
+        yield (f'weather_cache_{field}_total', 'counter', f'Response cache {field.replace("_", " ")} by endpoint',
+               [(f'weather_cache_{field}_total', {'endpoint': name}, counters[field])
+                for name, counters in sorted(endpoints.items())])
+    ratios = []
+    for name, counters in sorted(endpoints.items()):
+        lookups = counters['hits'] + counters['stale_hits'] + counters['misses']
+        served = counters['hits'] + counters['stale_hits']
+        ratios.append(('weather_cache_hit_ratio', {'endpoint': name}, served / lookups if lookups else 0.0))
+    yield 'weather_cache_hit_ratio', 'gauge', 'Share of cache lookups answered from cache', ratios
+    yield ('weather_cache_entries', 'gauge', 'Responses held in the memory cache',
+           [('weather_cache_entries', {}, cache['size'])])
+    
+    flight = upstream_flight.stats()
+    yield ('weather_single_flight_collapsed_total', 'counter', 'Requests that shared an in-flight upstream call',
+           [('weather_single_flight_collapsed_total', {}, flight['collapsed'])])
+    yield ('weather_single_flight_in_flight', 'gauge', 'Distinct upstream calls currently in flight',
+           [('weather_single_flight_in_flight', {}, flight['in_flight'])])
+    
+    rate_limiter = get_default_client().rate_limiter
+    if rate_limiter is not None:
+        usage = rate_limiter.usage(API_KEY)
+        yield ('weather_upstream_quota_day_used', 'gauge', 'Upstream calls charged to the API key today',
+               [('weather_upstream_quota_day_used', {}, usage['day_used'])])
+        yield ('weather_upstream_quota_minute_tokens', 'gauge', 'Upstream calls available in the per-minute bucket',
+               [('weather_upstream_quota_minute_tokens', {}, usage['minute_tokens'])])
+        lanes = rate_limiter.stats()['lanes']
+        yield ('weather_upstream_throttled_total', 'counter', 'Upstream calls refused by the rate limiter by lane',
+               [('weather_upstream_throttled_total', {'lane': name}, counters['throttled'])
+                for name, counters in sorted(lanes.items())])
+
+registry.add_collector(_collect_service_metrics)
+
 @app.route('/')
 def home():
     """หน้าแรกของแอปพลิเคชัน"""
     return render_template('index.html')
 
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """API สำหรับดูสถิติการใช้งานแคช (hit/miss) และจำนวนคำขอที่ถูกรวม"""
+    stats = response_cache.stats()
+    stats['single_flight'] = upstream_flight.stats()
+    stats['refresh'] = refresh_scheduler.stats()
+    rate_limiter = get_default_client().rate_limiter
+    if rate_limiter is not None:
+        stats['rate_limit'] = rate_limiter.stats(API_KEY)
+    return jsonify(stats)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """metric ทั้งหมดในรูปแบบข้อความของ Prometheus"""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+def parse_location_args(args):
+    """
+    อ่านตำแหน่งจาก query string: ชื่อเมือง (city) หรือพิกัด (lat, lon)
+    
+    Returns:
+        tuple: (ชื่อเมือง, พิกัด, ข้อความ error) โดยค่าที่ไม่ได้ใช้จะเป็น None
+    """
+    city = args.get('city')
+    lat, lon = args.get('lat'), args.get('lon')
+    if lat is not None or lon is not None:
+        try:
+            coords = (float(lat), float(lon))
+        except (TypeError, ValueError):
+            return None, None, 'พิกัดไม่ถูกต้อง กรุณาระบุ lat และ lon เป็นตัวเลข'
+        if not (-90 <= coords[0] <= 90 and -180 <= coords[1] <= 180):
+            return None, None, 'พิกัดอยู่นอกช่วงที่ถูกต้อง'
+        return None, coords, None
+    if not city:
+        return None, None, 'กรุณาระบุชื่อเมืองหรือพิกัด'
+    return city, None, None
+
+@app.route('/api/locations/autocomplete', methods=['GET'])
+def locations_autocomplete():
+    """API สำหรับค้นหาชื่อจังหวัด/อำเภอ/ตำบล (ไทยและอังกฤษ) แบบ autocomplete"""
+    query = request.args.get('q') or request.args.get('query') or ''
+    if not query.strip():
+        return jsonify({'error': "กรุณาระบุคำค้นในพารามิเตอร์ 'q'"}), 400
+    
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), 50)
+    except ValueError:
+        limit = 10
+    return jsonify(get_location_index().suggest(query, limit))
+
+@app.route('/api/forecast/daily', methods=['GET'])
+def forecast_daily():
+    """API สำหรับดึงพยากรณ์อากาศที่สรุปเป็นรายวัน (ระบุ city หรือ lat/lon)"""
+    city, coords, error = parse_location_args(request.args)
+    
+    if error:
+        return jsonify({'error': error}), 400
+    
+    if not API_KEY or API_KEY == 'your_api_key_here':
+        return jsonify({'error': 'กรุณาตั้งค่า OpenWeatherMap API Key ในไฟล์ .env'}), 500
+    
+    daily = get_daily_forecast(city, API_KEY, coords=coords)
+    if daily is None:
+        return jsonify({'error': 'ไม่สามารถดึงข้อมูลพยากรณ์อากาศได้'}), 502
+    return jsonify({'daily': daily})
+
+def render_weather_response(render_key, current_weather, forecast_part, daily, partial, forecast_fetched_at=0):
+    """
+    คืน JSON ของ /api/weather ที่เข้ารหัสแล้วพร้อม ETag
+    
+    ถ้าข้อมูลสภาพอากาศและพยากรณ์เป็นออบเจ็กต์เดิมจากแคช (ยังไม่ถูกรีเฟรช)
+    จะใช้ bytes ที่เข้ารหัสไว้ครั้งก่อนเลย ไม่ต้องสร้าง dict และเข้ารหัส JSON ใหม่
+    
+    Args:
+        render_key (tuple): คีย์ของตำแหน่งและรูปแบบ response
+        current_weather (dict): ข้อมูลสภาพอากาศปัจจุบันจาก OpenWeatherMap
+        forecast_part (list): สรุปรายวันหรือรายการพยากรณ์ดิบ
+        daily (bool): forecast_part เป็นสรุปรายวันหรือไม่
+        partial (bool): พยากรณ์อากาศหมดเวลาหรือไม่
+        forecast_fetched_at (float): เวลาที่ดึงพยากรณ์ชุดนี้จาก OpenWeatherMap (0 ถ้าไม่มี)
+        
+    Returns:
+        tuple: (JSON bytes, ETag, Last-Modified เป็น Unix timestamp)
+    """
+    rendered = rendered_responses.get(render_key)
+    if (rendered is not None and rendered[0] is current_weather and rendered[1] is forecast_part
+            and rendered[2] == partial):
+        return rendered[3:]
+    
+    response = {
+        'name': current_weather.get('name', ''),
+        'sys': current_weather.get('sys', {}),
+        'main': current_weather.get('main', {}),
+        'weather': current_weather.get('weather', []),
+        'wind': current_weather.get('wind', {}),
+        'visibility': current_weather.get('visibility', 0),
+        'dt': current_weather.get('dt', 0),
+        'timezone': current_weather.get('timezone', 0),
+        'daily' if daily else 'forecast': forecast_part
+    }
+    if partial:
+        # แจ้ง frontend ว่าข้อมูลพยากรณ์อากาศขาดหายเพราะหมดเวลา
+        response['partial'] = True
+    
+    body = app.json.encode(response)
+    # strong ETag: เวลาวัดของ upstream (dt) + คีย์ของ response และ hash ของเนื้อหา
+    # (พยากรณ์อาจถูกรีเฟรชโดยที่ dt ของสภาพอากาศปัจจุบันไม่เปลี่ยน)
+    dt = int(response['dt'] or 0)
+    digest = hashlib.blake2b(repr(render_key).encode('utf-8') + body, digest_size=12).hexdigest()
+    etag = f"{dt:x}-{digest}"
+    # เวลาที่ข้อมูลต้นทางเปลี่ยนล่าสุด (ไม่ใช่เวลาที่สร้าง response) ใช้ตอบ If-Modified-Since
+    last_modified = max(dt, int(forecast_fetched_at or 0))
+    rendered_responses.set(render_key, (current_weather, forecast_part, partial, body, etag, last_modified),
+                           response_cache.ttl_for('weather') + response_cache.stale_ttl_for('weather'))
+    return body, etag, last_modified
+
+def weather_cache_control(city_name, coords, partial):
+    """
+    สร้างค่า Cache-Control ของ /api/weather ให้สอดคล้องกับอายุแคชฝั่งเซิร์ฟเวอร์
+    
+    max-age คือเวลาที่เหลือก่อนข้อมูลสภาพอากาศหรือพยากรณ์ในแคชจะหมดอายุ
+    และ stale-while-revalidate เท่ากับช่วงที่เซิร์ฟเวอร์ยังส่งข้อมูลเดิมระหว่างรีเฟรช
+    """
+    if partial:
+        # พยากรณ์ขาดหายไป ให้ browser ขอใหม่ทุกครั้ง (ยังได้ 304 ถ้าข้อมูลไม่เปลี่ยน)
+        return 'no-cache'
+    endpoints = {
+        'weather': _weather_params(city_name, API_KEY, coords),
+        'forecast': _forecast_params(city_name, API_KEY, coords)
+    }
+    if any(response_cache.ttl_for(endpoint) <= 0 for endpoint in endpoints):
+        return 'no-cache'
+    
+    remaining = [response_cache.freshness(endpoint, params) for endpoint, params in endpoints.items()]
+    max_age = int(max(0, min(value or 0 for value in remaining)))
+    stale = int(min(response_cache.stale_ttl_for(endpoint) for endpoint in endpoints))
+    return f"public, max-age={max_age}, stale-while-revalidate={stale}"
+
 @app.route('/api/weather', methods=['GET'])
 def weather():
-    """API สำหรับดึงข้อมูลสภาพอากาศ"""
-    city = request.args.get('city')
+    """API สำหรับดึงข้อมูลสภาพอากาศ (ระบุ city หรือ lat/lon และ summary=daily เพื่อรับพยากรณ์แบบสรุปรายวันแทนรายการดิบ)"""
+    city, coords, error = parse_location_args(request.args)
+    summary = request.args.get('summary')
     
-    if not city:
-        return jsonify({'error': 'กรุณาระบุชื่อเมือง'}), 400
+    if error:
+        return jsonify({'error': error}), 400
     
     if not API_KEY or API_KEY == 'your_api_key_here':
         return jsonify({'error': 'กรุณาตั้งค่า OpenWeatherMap API Key ในไฟล์ .env'}), 500
     
     try:
-        # ดึงข้อมูลสภาพอากาศปัจจุบัน
-        current_weather = get_weather(city, API_KEY)
+        # ดึงข้อมูลสภาพอากาศปัจจุบันและพยากรณ์อากาศพร้อมกัน
+        try:
+            current_weather, forecast, forecast_timed_out = fetch_weather_and_forecast(city, API_KEY, coords=coords)
+        except FutureTimeoutError:
+            return jsonify({'error': 'OpenWeatherMap ตอบกลับช้าเกินไป กรุณาลองใหม่อีกครั้ง'}), 504
         
+        if 'retry_after' in current_weather:
+            # ไม่มีข้อมูลในแคช (แม้แต่ข้อมูลเก่า) และโควตา upstream เต็ม
+            response = jsonify({'error': current_weather['error']})
+            response.status_code = 503
+            response.headers['Retry-After'] = str(max(1, math.ceil(current_weather['retry_after'])))
+            return response
         if 'error' in current_weather:
             return jsonify({'error': current_weather['error']}), 400
         
-        # ดึงข้อมูลพยากรณ์อากาศ
-        forecast = get_forecast(city, API_KEY)
-        
-        # สร้าง response ที่มีโครงสร้างที่ถูกต้อง
-        response = {
-            'name': current_weather.get('name', ''),
-            'sys': current_weather.get('sys', {}),
-            'main': current_weather.get('main', {}),
-            'weather': current_weather.get('weather', []),
-            'wind': current_weather.get('wind', {}),
-            'visibility': current_weather.get('visibility', 0),
-            'dt': current_weather.get('dt', 0),
-            'timezone': current_weather.get('timezone', 0),
-            'forecast': forecast.get('list', []) if forecast and 'list' in forecast else []
-        }
-        
-        print("\n=== ส่งข้อมูลกลับไปยัง Frontend ===")
-        print(f"มีข้อมูลพยากรณ์อากาศ: {len(response['forecast'])} รายการ")
-        
-        # ตรวจสอบว่า response มีข้อมูลที่จำเป็นหรือไม่
-        if not all(key in response for key in ['main', 'weather', 'name', 'sys']):
-            return jsonify({'error': 'ข้อมูลที่ได้รับจาก API ไม่ครบถ้วน'}), 500
-            
-        return jsonify(response)
+        if summary == 'daily':
+            # ส่งเฉพาะสรุปรายวัน (ขนาดเล็กกว่ารายการดิบ 40 รายการหลายเท่า)
+            forecast_part = (get_daily_forecast(city, API_KEY, forecast, coords) or []) if forecast else []
+        else:
+            forecast_part = forecast.get('list', []) if forecast and 'list' in forecast else []
+        
+        render_key = ResponseCache.make_key('api_weather', {**location_params(city, coords), 'summary': summary})
+        body, etag, last_modified = render_weather_response(
+            render_key, current_weather, forecast_part, summary == 'daily', forecast_timed_out,
+            forecast.get(FORECAST_FETCHED_AT, 0) if forecast else 0)
+        response = app.response_class(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.headers['Cache-Control'] = weather_cache_control(city, coords, forecast_timed_out)
+        # ตอบ 304 (ไม่มี body) ถ้า If-None-Match/If-Modified-Since ตรงกับข้อมูลปัจจุบัน
+        return response.make_conditional(request)
         
     except Exception as e:
-        app.logger.error(f'Error in weather API: {str(e)}')
-        import traceback
-        traceback.print_exc()
+        app.logger.exception('Error in weather API: %s', e)
         return jsonify({'error': f'เกิดข้อผิดพลาดในการประมวลผลคำขอ: {str(e)}'}), 500
 
 if __name__ == '__main__':
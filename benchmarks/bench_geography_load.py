@@ -0,0 +1,97 @@
+"""Compare cold-loading the geography dataset from JSON and from the snapshot.
+
+Each measurement runs in a fresh interpreter so nothing is warm in-process.
+Reports wall time, tracemalloc peak and RSS growth for loading the places,
+for getting a usable LocationIndex (built from JSON, or mapped from the
+snapshot), and for that index after answering a fixed set of queries.
+
+    python benchmarks/bench_geography_load.py [--runs 5]
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = ('json', 'snapshot')
+STAGES = ('places', 'index', 'queries')
+STAGE_NAMES = {'places': 'load places', 'index': 'load + index', 'queries': 'index + queries'}
+QUERIES = ('bang', 'เมือง', 'chiang', 'ลำ', 'nakhon', 'ong', 'khon kaen', 'สมุทร', 'phra', 'hat yai')
+
+
+def _rss_kib() -> int:
+    # ru_maxrss เป็น KiB บน Linux แต่เป็น byte บน macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def _child(mode: str, stage: str) -> None:
+    """Load once and print the measurements as JSON."""
+    import geography_snapshot
+    import location_index
+
+    rss_before = _rss_kib()
+    tracemalloc.start()
+    started = time.perf_counter()
+    if mode == 'json':
+        with open(location_index.DEFAULT_DATA_PATH, encoding='utf-8') as f:
+            places = location_index.places_from_entries(json.load(f))
+        if stage != 'places':
+            index = location_index.LocationIndex(places)
+    elif stage == 'places':
+        places = geography_snapshot.load_places()
+    else:
+        index = geography_snapshot.open_index()
+        places = index.places
+    if stage == 'queries':
+        for query in QUERIES:
+            index.search(query)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(json.dumps({'ms': elapsed * 1000, 'peak_kib': peak / 1024,
+                      'rss_kib': _rss_kib() - rss_before, 'places': len(places)}))
+
+
+def _measure(mode: str, stage: str, runs: int) -> dict:
+    samples = []
+    for _ in range(runs):
+        command = [sys.executable, __file__, '--child', mode, '--stage', stage]
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        samples.append(json.loads(output))
+    return {key: statistics.median(sample[key] for sample in samples) for key in samples[0]}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters per measurement')
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--stage', choices=STAGES, default='places', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child, args.stage)
+        return
+
+    import geography_snapshot
+    size = geography_snapshot.compile_json()
+    json_size = os.path.getsize(geography_snapshot.DEFAULT_DATA_PATH)
+    print(f"geography.json {json_size / 1024:.0f} KiB, snapshot {size / 1024:.0f} KiB")
+    print(f"median of {args.runs} cold runs")
+    print(f"{'stage':<16}{'source':<10}{'time ms':>10}{'peak KiB':>11}{'RSS +KiB':>11}")
+    for stage in STAGES:
+        for mode in MODES:
+            result = _measure(mode, stage, args.runs)
+            print(f"{STAGE_NAMES[stage]:<16}{mode:<10}{result['ms']:>10.1f}"
+                  f"{result['peak_kib']:>11.0f}{result['rss_kib']:>11.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""Microbenchmarks for the WeatherService parse layer.
+
+Times each case (best of several repeats), measures allocations with
+tracemalloc, and compares against baselines stored in
+benchmarks/baselines/parse.json.
+
+    python benchmarks/bench_parse.py              # run and compare
+    python benchmarks/bench_parse.py --check      # exit 1 on a regression
+    python benchmarks/bench_parse.py --update     # record new baselines
+    python benchmarks/bench_parse.py -k forecast  # only matching cases
+    python -m pytest benchmarks                   # same check as --check
+
+Each case is timed next to a fixed calibration workload and compared as a
+ratio to it, which cancels most of the difference between machines and
+background load. Allocation block counts are deterministic and compared
+exactly (within the tolerance).
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from fake_owm_server import load_fixture  # noqa: E402
+from weather_service import WeatherService  # noqa: E402
+
+BASELINE_PATH = os.path.join(HERE, 'baselines', 'parse.json')
+BATCH_SIZE = 100
+DEFAULT_TOLERANCE = 0.3
+
+
+def build_cases() -> List[Tuple[str, Callable[[], Any]]]:
+    """Return (name, zero-argument callable) pairs to benchmark."""
+    # ไม่เรียก API จึงไม่ต้องใช้ API key จริง
+    service = WeatherService('benchmark-key')
+    weather = load_fixture('weather')
+    forecast = load_fixture('forecast')
+    batch = []
+    for i in range(BATCH_SIZE):
+        payload = copy.deepcopy(weather)
+        payload['name'] = f"City {i}"
+        payload['main']['temp'] += i % 7
+        batch.append(payload)
+
+    def daily():
+        return service.parse_forecast_series(forecast).daily()
+
+    return [
+        ('current.records', lambda: service.parse_current_weather(weather)),
+        ('current.dict', lambda: service.parse_weather_data(weather)),
+        ('forecast40.records', lambda: service.parse_forecast_points(forecast)),
+        ('forecast40.dict', lambda: service.parse_forecast_data(forecast)),
+        ('forecast40.columnar', lambda: service.parse_forecast_series(forecast)),
+        ('forecast40.daily', daily),
+        (f'batch{BATCH_SIZE}.records', lambda: [service.parse_current_weather(item) for item in batch]),
+        (f'batch{BATCH_SIZE}.dict', lambda: [service.parse_weather_data(item) for item in batch]),
+    ]
+
+
+def _calibration() -> Dict[str, float]:
+    """Reference workload of the same flavor as parsing (dict lookups, small objects)."""
+    source = {'main': {'temp': 30.5, 'humidity': 60}, 'name': 'calibration'}
+    return {f"{source['name']}{i}": source['main'].get('temp', 0) * i for i in range(50)}
+
+
+def _loops(timer: timeit.Timer, min_time: float) -> int:
+    number, elapsed = timer.autorange()
+    if elapsed < min_time:
+        number = max(number, int(number * min_time / max(elapsed, 1e-9)))
+    return number
+
+
+def measure(fn: Callable[[], Any], repeat: int, min_time: float) -> Dict[str, float]:
+    """Return best time per call (µs), time relative to the calibration workload,
+    and allocation figures for one call."""
+    timer = timeit.Timer(fn)
+    calibration_timer = timeit.Timer(_calibration)
+    number = _loops(timer, min_time)
+    calibration_number = _loops(calibration_timer, min_time / 2)
+    best = calibration = float('inf')
+    # สลับวัด case กับ calibration ทีละรอบ ให้ทั้งสองเจอสภาพเครื่องเดียวกัน
+    for _ in range(repeat):
+        best = min(best, timer.timeit(number) / number)
+        calibration = min(calibration, calibration_timer.timeit(calibration_number) / calibration_number)
+
+    fn()  # แคชภายใน (เช่น import, interning) ไม่ควรถูกนับรวม
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    result = fn()
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count for stat in snapshot.statistics('filename'))
+    del result
+    return {
+        'us': best * 1e6,
+        'relative': best / calibration,
+        'retained_kib': (current - before) / 1024,
+        'peak_kib': (peak - before) / 1024,
+        'blocks': blocks
+    }
+
+
+def load_baselines(path: str = BASELINE_PATH) -> Dict[str, Dict[str, float]]:
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baselines(results: Dict[str, Dict[str, float]], path: str = BASELINE_PATH) -> None:
+    baselines = load_baselines(path)
+    baselines.update({name: {key: round(value, 3) for key, value in result.items()}
+                      for name, result in results.items()})
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(dict(sorted(baselines.items())), f, indent=2)
+        f.write('\n')
+
+
+def compare(name: str, result: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    """Return a description of every way result regressed past the baseline."""
+    regressions = []
+    change = result['relative'] / baseline['relative'] - 1
+    if change > tolerance:
+        regressions.append(f"{name}: {result['relative']:.2f}x calibration vs baseline "
+                           f"{baseline['relative']:.2f}x ({change:+.0%})")
+    if result['blocks'] > baseline['blocks'] * (1 + tolerance):
+        regressions.append(f"{name}: {result['blocks']} allocated blocks vs baseline {baseline['blocks']}")
+    if result['peak_kib'] > baseline['peak_kib'] * (1 + tolerance) + 1:
+        regressions.append(f"{name}: peak {result['peak_kib']:.1f} KiB vs baseline "
+                           f"{baseline['peak_kib']:.1f} KiB")
+    return regressions
+
+
+def test_parse_regressions() -> None:
+    """pytest entry point: fail if any case regressed past its baseline."""
+    baselines = load_baselines()
+    regressions = []
+    for name, fn in build_cases():
+        if name not in baselines:
+            continue
+        found = compare(name, measure(fn, 3, 0.02), baselines[name], DEFAULT_TOLERANCE)
+        if found:
+            # รอบสั้นโดนรบกวนง่าย วัดซ้ำด้วยค่าเดียวกับ --check ก่อนตัดสินว่าช้าลงจริง
+            found = compare(name, measure(fn, 7, 0.05), baselines[name], DEFAULT_TOLERANCE)
+        regressions.extend(found)
+    assert not regressions, '\n'.join(regressions)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Parse-layer microbenchmarks.')
+    parser.add_argument('-k', dest='pattern', default='', help='only run cases whose name contains this')
+    parser.add_argument('--repeat', type=int, default=7, help='timing repeats (best is kept)')
+    parser.add_argument('--min-time', type=float, default=0.05, help='seconds per repeat')
+    parser.add_argument('--check', action='store_true', help='exit 1 if a case regressed past the tolerance')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='allowed slowdown / extra peak memory as a fraction of the baseline')
+    parser.add_argument('--update', action='store_true', help='write the results as the new baselines')
+    args = parser.parse_args()
+
+    baselines = load_baselines()
+    results: Dict[str, Dict[str, float]] = {}
+    regressions = []
+    print(f"{'case':<22}{'µs/call':>11}{'relative':>10}{'base':>10}{'Δ':>8}{'peak KiB':>10}{'blocks':>8}")
+    for name, fn in build_cases():
+        if args.pattern not in name:
+            continue
+        result = results[name] = measure(fn, args.repeat, args.min_time)
+        baseline = baselines.get(name)
+        delta = ''
+        if baseline:
+            delta = f"{result['relative'] / baseline['relative'] - 1:+.0%}"
+            regressions.extend(compare(name, result, baseline, args.tolerance))
+        print(f"{name:<22}{result['us']:>11.2f}{result['relative']:>10.2f}"
+              f"{baseline['relative'] if baseline else float('nan'):>10.2f}"
+              f"{delta:>8}{result['peak_kib']:>10.1f}{result['blocks']:>8}")
+
+    if args.update:
+        save_baselines(results)
+        print(f"Baselines written to {os.path.relpath(BASELINE_PATH)}")
+    if regressions:
+        print('\nRegressions:')
+        for line in regressions:
+            print(f"  {line}")
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""Local stand-in for the OpenWeatherMap API used by the benchmarks.
+
+Serves /weather and /forecast under /data/2.5 from the JSON fixtures in
+benchmarks/fixtures, echoing the requested city or coordinates, with
+configurable latency and error rate.
+
+    python benchmarks/fake_owm_server.py --port 8099 --latency 0.05 --error-rate 0.01
+    OPENWEATHER_BASE_URL=http://127.0.0.1:8099/data/2.5 python app.py
+"""
+import argparse
+import copy
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+API_PREFIX = '/data/2.5'
+
+
+def load_fixture(name: str, fixtures_dir: str = FIXTURES_DIR) -> Dict[str, Any]:
+    """Load benchmarks/fixtures/<name>.json."""
+    with open(os.path.join(fixtures_dir, f"{name}.json"), encoding='utf-8') as f:
+        return json.load(f)
+
+
+class FakeOWMServer(ThreadingHTTPServer):
+    """Threaded HTTP server answering like OpenWeatherMap."""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address: Tuple[str, int], latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, throttle_rate: float = 0.0, fixtures_dir: str = FIXTURES_DIR):
+        """Create the server.
+
+        Args:
+            address: (host, port) to bind; port 0 picks a free port
+            latency: Base response delay in seconds
+            jitter: Extra uniformly distributed delay in seconds
+            error_rate: Fraction of requests answered with 500
+            throttle_rate: Fraction of requests answered with 429
+            fixtures_dir: Directory holding weather.json and forecast.json
+        """
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.fixtures = {name: load_fixture(name, fixtures_dir) for name in ('weather', 'forecast')}
+        self._lock = threading.Lock()
+        self.requests = 0
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+    def count(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: FakeOWMServer
+    protocol_version = 'HTTP/1.1'  # keep-alive เหมือน API จริง
+
+    def do_GET(self) -> None:
+        server = self.server
+        server.count()
+        url = urlsplit(self.path)
+        endpoint = url.path[len(API_PREFIX) + 1:] if url.path.startswith(API_PREFIX + '/') else ''
+        if endpoint not in server.fixtures:
+            self._send(404, {'cod': '404', 'message': 'Internal error'})
+            return
+
+        delay = server.latency + random.uniform(0, server.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        roll = random.random()
+        if roll < server.error_rate:
+            self._send(500, {'cod': 500, 'message': 'Internal server error'})
+            return
+        if roll < server.error_rate + server.throttle_rate:
+            self._send(429, {'cod': 429, 'message': 'Too many requests'}, {'Retry-After': '1'})
+            return
+
+        params = {name: values[0] for name, values in parse_qs(url.query).items()}
+        self._send(200, _personalize(endpoint, server.fixtures[endpoint], params))
+
+    def _send(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def _personalize(endpoint: str, fixture: Dict[str, Any], params: Dict[str, str]) -> Dict[str, Any]:
+    """Return the fixture with the requested location filled in."""
+    name = params.get('q', '').split(',')[0].strip().title()
+    if endpoint == 'weather':
+        data = dict(fixture)
+        if name:
+            data['name'] = name
+        if 'lat' in params and 'lon' in params:
+            data['coord'] = {'lat': float(params['lat']), 'lon': float(params['lon'])}
+        return data
+    data = dict(fixture)
+    city = data['city'] = copy.copy(fixture.get('city', {}))
+    if name:
+        city['name'] = name
+    count = params.get('cnt')
+    if count and count.isdigit():
+        data['list'] = fixture['list'][:int(count)]
+        data['cnt'] = len(data['list'])
+    return data
+
+
+def start_server(host: str = '127.0.0.1', port: int = 0, **options: Any) -> FakeOWMServer:
+    """Start a server in a daemon thread and return it (stop with shutdown())."""
+    server = FakeOWMServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, name='fake-owm', daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Local OpenWeatherMap stand-in.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency', type=float, default=0.05, help='base delay in seconds')
+    parser.add_argument('--jitter', type=float, default=0.02, help='extra random delay in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of 500 responses')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='fraction of 429 responses')
+    parser.add_argument('--fixtures', default=FIXTURES_DIR, help='directory with weather.json/forecast.json')
+    args = parser.parse_args()
+
+    server = FakeOWMServer((args.host, args.port), latency=args.latency, jitter=args.jitter,
+                           error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+                           fixtures_dir=args.fixtures)
+    print(f"Fake OpenWeatherMap listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+"""Concurrent load test of the Flask app and WeatherService against a fake upstream.
+
+Starts benchmarks/fake_owm_server.py in-process (or uses --upstream), points
+the app at it through OPENWEATHER_BASE_URL, then issues requests from many
+threads and reports throughput and latency percentiles.
+
+    python benchmarks/load_test.py --target both --requests 2000 --concurrency 32
+    python benchmarks/load_test.py --target flask --no-cache --latency 0.1 --error-rate 0.02
+
+The in-process Flask target runs on the werkzeug development server and shares
+the GIL with the load generator. To measure a production setup, start the fake
+server and gunicorn separately and use --upstream and --app-url:
+
+    python benchmarks/fake_owm_server.py --port 8099 &
+    OPENWEATHER_BASE_URL=http://127.0.0.1:8099/data/2.5 UPSTREAM_RATE_PER_MINUTE=0 \
+        gunicorn -w 4 --threads 8 -b 127.0.0.1:5000 app:app &
+    python benchmarks/load_test.py --target flask --upstream http://127.0.0.1:8099/data/2.5 \
+        --app-url http://127.0.0.1:5000
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_owm_server  # noqa: E402
+
+
+def configure_environment(base_url: str, use_cache: bool) -> None:
+    """Point the app at the fake upstream; must run before app modules are imported."""
+    os.environ['OPENWEATHER_BASE_URL'] = base_url
+    os.environ.setdefault('OPENWEATHER_API_KEY', 'benchmark-key')
+    # ไม่ให้ผลการทดสอบขึ้นกับสถานะที่ค้างอยู่บนดิสก์หรือโควตาจริง
+    os.environ['DISK_CACHE_PATH'] = ''
+    os.environ.setdefault('UPSTREAM_RATE_PER_MINUTE', '0')
+    os.environ.setdefault('REFRESH_TOP_N', '0')
+    if not use_cache:
+        for name in ('WEATHER_CACHE_TTL', 'FORECAST_CACHE_TTL', 'WEATHER_STALE_TTL', 'FORECAST_STALE_TTL'):
+            os.environ[name] = '0'
+
+
+def run_load(operation: Callable[[str], bool], cities: List[str], total: int, concurrency: int) -> Dict[str, float]:
+    """Call operation(city) total times from concurrency threads.
+
+    operation returns True on success. Returns throughput and latency figures.
+    """
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+    counter = iter(range(total))
+
+    def worker() -> None:
+        nonlocal errors
+        local_latencies = []
+        local_errors = 0
+        while True:
+            with lock:
+                index = next(counter, None)
+            if index is None:
+                break
+            started = time.perf_counter()
+            try:
+                ok = operation(cities[index % len(cities)])
+            except Exception:
+                ok = False
+            local_latencies.append(time.perf_counter() - started)
+            local_errors += not ok
+        with lock:
+            latencies.extend(local_latencies)
+            errors += local_errors
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'elapsed_s': elapsed,
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': cuts[49] * 1000,
+        'p95_ms': cuts[94] * 1000,
+        'p99_ms': cuts[98] * 1000,
+        'max_ms': max(latencies) * 1000
+    }
+
+
+def flask_operation(app_url: Optional[str] = None) -> Callable[[str], bool]:
+    """Return a GET /api/weather operation against app_url.
+
+    Without app_url the Flask app is imported and served on a local port.
+    """
+    import requests
+
+    if app_url is None:
+        import logging
+
+        from werkzeug.serving import make_server
+
+        import app as weather_app
+
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)  # ไม่พิมพ์ access log ทุก request
+        server = make_server('127.0.0.1', 0, weather_app.app, threaded=True)
+        threading.Thread(target=server.serve_forever, name='flask-under-test', daemon=True).start()
+        app_url = f"http://127.0.0.1:{server.server_port}"
+    url = f"{app_url.rstrip('/')}/api/weather"
+    local = threading.local()
+
+    def operation(city: str) -> bool:
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        response = session.get(url, params={'city': city, 'summary': 'daily'}, timeout=30)
+        return response.status_code == 200
+
+    return operation
+
+
+def service_operation(use_cache: bool) -> Callable[[str], bool]:
+    """Return an operation fetching and parsing current weather through WeatherService."""
+    from response_cache import ResponseCache
+    from weather_service import WeatherService, WeatherServiceError
+
+    service = WeatherService(os.environ['OPENWEATHER_API_KEY'], cache=ResponseCache() if use_cache else None)
+
+    def operation(city: str) -> bool:
+        try:
+            service.parse_current_weather(service.get_current_weather(city))
+            return True
+        except WeatherServiceError:
+            return False
+
+    return operation
+
+
+def report(name: str, result: Dict[str, float], upstream_calls: Optional[int]) -> None:
+    upstream = f"  upstream calls {upstream_calls}" if upstream_calls is not None else ''
+    print(f"{name:<8} {result['requests']:>6} req  {result['errors']:>4} err  {result['rps']:>8.1f} req/s  "
+          f"p50 {result['p50_ms']:>7.2f} ms  p95 {result['p95_ms']:>7.2f} ms  "
+          f"p99 {result['p99_ms']:>7.2f} ms  max {result['max_ms']:>7.2f} ms{upstream}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--target', choices=('flask', 'service', 'both'), default='both')
+    parser.add_argument('--requests', type=int, default=2000, help='requests per target')
+    parser.add_argument('--concurrency', type=int, default=16, help='client threads')
+    parser.add_argument('--cities', type=int, default=50, help='distinct cities requested (cache working set)')
+    parser.add_argument('--no-cache', action='store_true', help='disable response caching (every request goes upstream)')
+    parser.add_argument('--upstream', help='base URL of an already running fake server')
+    parser.add_argument('--app-url', help='root URL of an already running app (flask target only)')
+    parser.add_argument('--latency', type=float, default=0.05, help='fake upstream base delay (s)')
+    parser.add_argument('--jitter', type=float, default=0.02, help='fake upstream extra random delay (s)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fake upstream fraction of 500s')
+    args = parser.parse_args()
+
+    server = None
+    if args.upstream:
+        base_url = args.upstream
+    else:
+        server = fake_owm_server.start_server(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+        base_url = server.base_url
+    configure_environment(base_url, use_cache=not args.no_cache)
+
+    cities = [f"Benchmark City {i}" for i in range(args.cities)]
+    print(f"upstream {base_url}  concurrency {args.concurrency}  cities {args.cities}  "
+          f"cache {'off' if args.no_cache else 'on'}")
+
+    targets = ('flask', 'service') if args.target == 'both' else (args.target,)
+    for target in targets:
+        operation = flask_operation(args.app_url) if target == 'flask' else service_operation(not args.no_cache)
+        before = server.requests if server else None
+        result = run_load(operation, cities, args.requests, args.concurrency)
+        report(target, result, server.requests - before if server else None)
+
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,311 @@
+"""Persistent SQLite tier for cached OpenWeatherMap responses.
+
+Survives process restarts so a freshly started worker can serve warm data
+instead of sending a burst of upstream calls. Reads go straight to SQLite;
+writes and deletes are queued and committed in order, in batches, by a
+background thread, which also compacts expired entries periodically, so the
+request path never waits on a disk write.
+"""
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'responses.sqlite3')
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS responses ('
+    ' key TEXT PRIMARY KEY,'
+    ' endpoint TEXT NOT NULL,'
+    ' value TEXT NOT NULL,'
+    ' expires_at REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at)'
+)
+
+_STOP = object()
+_BATCH_SIZE = 256
+_UPSERT = 'INSERT OR REPLACE INTO responses (key, endpoint, value, expires_at) VALUES (?, ?, ?, ?)'
+_DELETE = 'DELETE FROM responses WHERE key = ?'
+_CLEAR = 'DELETE FROM responses'
+
+
+def encode_key(key: Tuple) -> str:
+    """Serialize a ResponseCache key to the text stored in SQLite."""
+    return json.dumps(key, ensure_ascii=False, separators=(',', ':'))
+
+
+def decode_key(text: str) -> Tuple:
+    """Rebuild a ResponseCache key from its stored text."""
+    endpoint, *items = json.loads(text)
+    return (endpoint,) + tuple(tuple(item) for item in items)
+
+
+class DiskCache:
+    """SQLite-backed response store with absolute (wall-clock) expiry times.
+
+    Safe to share between threads, and between gunicorn workers pointing at
+    the same file (WAL mode). Disk errors are logged and treated as misses.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, max_entries: int = 10000,
+                 compact_interval: float = 300.0, clock: Callable[[], float] = time.time):
+        """Open (and create if needed) the cache database.
+
+        Args:
+            path: SQLite file; its directory is created if missing
+            max_entries: Rows kept after compaction (soonest-expiring dropped first)
+            compact_interval: Seconds between background compactions
+            clock: Wall-clock time source (overridable for testing)
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.compact_interval = compact_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.dropped = 0
+        self.errors = 0
+        self.compactions = 0
+        self.removed = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._reset()
+        with self._connection() as conn:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+
+    @classmethod
+    def from_env(cls) -> Optional['DiskCache']:
+        """Create a cache configured by DISK_CACHE_* variables, or None if disabled.
+
+        Setting DISK_CACHE_PATH to an empty string disables the disk tier.
+        """
+        path = os.getenv('DISK_CACHE_PATH', DEFAULT_PATH)
+        if not path:
+            return None
+        try:
+            return cls(path,
+                       max_entries=int(os.getenv('DISK_CACHE_MAX_ENTRIES', '10000')),
+                       compact_interval=float(os.getenv('DISK_CACHE_COMPACT_INTERVAL', '300')))
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"Disk cache disabled, cannot open {path}: {e}")
+            return None
+
+    def _reset(self) -> None:
+        """Drop per-process state (connections and the writer thread)."""
+        self._pid = os.getpid()
+        self._local = threading.local()
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=10000)
+        self._writer: Optional[threading.Thread] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, reopening after a fork."""
+        if self._pid != os.getpid():
+            # SQLite connections must not cross fork(); เช่น gunicorn --preload
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _ensure_writer(self) -> None:
+        if self._writer is None or not self._writer.is_alive() or self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+                if self._writer is None or not self._writer.is_alive():
+                    self._writer = threading.Thread(target=self._write_loop, name='disk-cache-writer',
+                                                    daemon=True)
+                    self._writer.start()
+
+    def get(self, key: Tuple) -> Optional[Tuple[Any, float]]:
+        """Return (value, expires_at) for an unexpired entry, or None."""
+        try:
+            row = self._connection().execute(
+                'SELECT value, expires_at FROM responses WHERE key = ? AND expires_at > ?',
+                (encode_key(key), self._clock())).fetchone()
+        except sqlite3.Error as e:
+            self._error('read', e)
+            return None
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0]), row[1]
+
+    def set(self, key: Tuple, value: Any, expires_at: float) -> None:
+        """Queue an entry for writing; never blocks the caller."""
+        try:
+            row = (encode_key(key), key[0], json.dumps(value, ensure_ascii=False), expires_at)
+        except (TypeError, ValueError) as e:
+            self._error('encode', e)
+            return
+        self._enqueue(_UPSERT, row)
+
+    def _enqueue(self, sql: str, params: Tuple) -> None:
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait((sql, params))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def entries(self, limit: int) -> Iterator[Tuple[Tuple, Any, float]]:
+        """Yield (key, value, expires_at) for the limit longest-lived unexpired entries.
+
+        Entries are yielded soonest-expiring first, so inserting them into an
+        LRU in this order keeps the longest-lived ones.
+        """
+        try:
+            rows = self._connection().execute(
+                'SELECT key, value, expires_at FROM ('
+                ' SELECT key, value, expires_at FROM responses WHERE expires_at > ?'
+                ' ORDER BY expires_at DESC LIMIT ?) ORDER BY expires_at',
+                (self._clock(), limit)).fetchall()
+        except sqlite3.Error as e:
+            self._error('read', e)
+            return
+        for key, value, expires_at in rows:
+            yield decode_key(key), json.loads(value), expires_at
+
+    def delete(self, key: Tuple) -> None:
+        """Queue an entry for removal; never blocks the caller.
+
+        The delete shares the write queue, so it lands after any write of the
+        same key queued before it and before any queued after it.
+        """
+        self._enqueue(_DELETE, (encode_key(key),))
+
+    def clear(self) -> None:
+        """Queue the removal of every entry, after the writes already queued.
+
+        Unlike set() and delete() this waits for room in a full queue, since
+        dropping it would leave every entry in place.
+        """
+        self._ensure_writer()
+        self._queue.put((_CLEAR, ()))
+
+    def flush(self) -> None:
+        """Block until every queued write has been committed."""
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.join()
+
+    def compact(self) -> int:
+        """Delete expired rows and trim to max_entries; returns rows removed."""
+        conn = self._connection()
+        try:
+            with conn:
+                removed = conn.execute('DELETE FROM responses WHERE expires_at <= ?',
+                                       (self._clock(),)).rowcount
+                removed += conn.execute(
+                    'DELETE FROM responses WHERE key IN ('
+                    ' SELECT key FROM responses ORDER BY expires_at DESC LIMIT -1 OFFSET ?)',
+                    (self.max_entries,)).rowcount
+            # คืนพื้นที่ WAL หลังลบแถวจำนวนมาก
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        except sqlite3.Error as e:
+            self._error('compact', e)
+            return 0
+        with self._lock:
+            self.compactions += 1
+            self.removed += removed
+        return removed
+
+    def close(self) -> None:
+        """Flush pending writes and stop the writer thread."""
+        writer = self._writer
+        if writer is not None and writer.is_alive() and self._pid == os.getpid():
+            self._queue.put(_STOP)
+            writer.join()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return a snapshot of the disk tier counters."""
+        with self._lock:
+            return {
+                'path': self.path,
+                'hits': self.hits,
+                'misses': self.misses,
+                'writes': self.writes,
+                'pending': self._queue.qsize(),
+                'dropped': self.dropped,
+                'errors': self.errors,
+                'compactions': self.compactions,
+                'removed': self.removed
+            }
+
+    def _write_loop(self) -> None:
+        """Commit queued writes in batches and compact every compact_interval seconds."""
+        next_compaction = time.monotonic() + self.compact_interval
+        while True:
+            timeout = max(0.0, next_compaction - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            batch: List[Tuple] = []
+            stop = False
+            while item is not None:
+                if item is _STOP:
+                    stop = True
+                    self._queue.task_done()
+                    break
+                batch.append(item)
+                if len(batch) >= _BATCH_SIZE:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    item = None
+
+            if batch:
+                self._write_batch(batch)
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                return
+            if time.monotonic() >= next_compaction:
+                removed = self.compact()
+                if removed:
+                    logger.info(f"Disk cache compaction removed {removed} entries")
+                next_compaction = time.monotonic() + self.compact_interval
+
+    def _write_batch(self, batch: List[Tuple[str, Tuple]]) -> None:
+        conn = self._connection()
+        try:
+            with conn:
+                # รวมคำสั่งชนิดเดียวกันที่อยู่ติดกันเป็น executemany โดยคงลำดับเดิมไว้
+                start = 0
+                while start < len(batch):
+                    sql = batch[start][0]
+                    end = start + 1
+                    while end < len(batch) and batch[end][0] == sql:
+                        end += 1
+                    conn.executemany(sql, [params for _, params in batch[start:end]])
+                    start = end
+        except sqlite3.Error as e:
+            self._error('write', e)
+            return
+        with self._lock:
+            self.writes += len(batch)
+
+    def _error(self, operation: str, error: Exception) -> None:
+        with self._lock:
+            self.errors += 1
+        logger.warning(f"Disk cache {operation} failed: {error}")
@@ -0,0 +1,380 @@
+"""Compiled binary snapshot of the geography dataset and its search index.
+
+The snapshot stores the places derived from geography.json, together with the
+LocationIndex tables built from them, as fixed-width little-endian records
+that reference a deduplicated UTF-8 string table. Opening it memory-maps the
+file and serves lookups straight from the mapped bytes: records, strings and
+posting lists are decoded only when a query touches them, so nothing is
+parsed or built at startup and the pages are shared by every gunicorn worker
+through the page cache.
+
+Layout::
+
+    header    MAGIC, version, section counts and offsets
+    offsets   (string count + 1) x uint32, byte offsets into the blob
+    records   place count x RECORD
+    names     place count x NAMES, normalized English/Thai name ids
+    order     place count x uint32, tie-break rank of each place
+    keys      key count x KEY, sorted prefix keys
+    grams     gram count x GRAM, sorted trigrams with their posting ranges
+    postings  posting count x uint32 place ids
+    blob      concatenated UTF-8 strings
+
+Build it with ``python geography_snapshot.py`` (see --help).
+"""
+import argparse
+import bisect
+import json
+import mmap
+import os
+import struct
+from collections.abc import Mapping, Sequence
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from location_index import DEFAULT_DATA_PATH, LocationIndex, Place, places_from_entries
+
+DEFAULT_SNAPSHOT_PATH = os.path.splitext(DEFAULT_DATA_PATH)[0] + '.snap'
+
+MAGIC = b'GEOSNAP\0'
+VERSION = 2
+
+# magic, version, place_count, string_count, key_count, gram_count, posting_count,
+# offsets_at, records_at, names_at, order_at, keys_at, grams_at, postings_at, blob_at
+HEADER = struct.Struct('<8s14I')
+# code, postal_code, level, (padding), name_en, name_th, district_en,
+# district_th, province_en, province_th (string ids)
+RECORD = struct.Struct('<IIB3x6I')
+# normalized name_en, name_th (string ids)
+NAMES = struct.Struct('<2I')
+# key (string id), kind, place index
+KEY = struct.Struct('<IBxxxI')
+# gram (string id), first and past-the-end position in postings
+GRAM = struct.Struct('<3I')
+_OFFSET = struct.Struct('<I')
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is missing, truncated or of another version."""
+    pass
+
+
+def build_snapshot(places: List[Place], path: str = DEFAULT_SNAPSHOT_PATH) -> int:
+    """Index places and write them with the index tables to a snapshot file.
+
+    Args:
+        places: Places to store, in index order
+        path: Output file (written atomically)
+
+    Returns:
+        Size of the snapshot in bytes
+    """
+    _, names, keys, key_entries, ngrams, order = LocationIndex(places).tables()
+    string_ids: Dict[str, int] = {}
+    strings: List[bytes] = []
+
+    def intern(text: str) -> int:
+        string_id = string_ids.get(text)
+        if string_id is None:
+            string_id = string_ids[text] = len(strings)
+            strings.append(text.encode('utf-8'))
+        return string_id
+
+    records = bytearray()
+    for place in places:
+        records += RECORD.pack(place.code, place.postal_code, place.level,
+                               intern(place.name_en), intern(place.name_th),
+                               intern(place.district_en), intern(place.district_th),
+                               intern(place.province_en), intern(place.province_th))
+    name_table = bytearray()
+    for name_en, name_th in names:
+        name_table += NAMES.pack(intern(name_en), intern(name_th))
+    order_table = struct.pack(f'<{len(order)}I', *order)
+    key_table = bytearray()
+    for key, (kind, place_id) in zip(keys, key_entries):
+        key_table += KEY.pack(intern(key), kind, place_id)
+    gram_table = bytearray()
+    postings = bytearray()
+    posting_count = 0
+    for gram in sorted(ngrams):
+        ids = ngrams[gram]
+        gram_table += GRAM.pack(intern(gram), posting_count, posting_count + len(ids))
+        postings += struct.pack(f'<{len(ids)}I', *ids)
+        posting_count += len(ids)
+
+    offsets = bytearray()
+    position = 0
+    for data in strings:
+        offsets += _OFFSET.pack(position)
+        position += len(data)
+    offsets += _OFFSET.pack(position)
+
+    offsets_at = HEADER.size
+    records_at = offsets_at + len(offsets)
+    names_at = records_at + len(records)
+    order_at = names_at + len(name_table)
+    keys_at = order_at + len(order_table)
+    grams_at = keys_at + len(key_table)
+    postings_at = grams_at + len(gram_table)
+    blob_at = postings_at + len(postings)
+    header = HEADER.pack(MAGIC, VERSION, len(places), len(strings), len(keys), len(ngrams), posting_count,
+                         offsets_at, records_at, names_at, order_at, keys_at, grams_at, postings_at, blob_at)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        for section in (header, offsets, records, name_table, order_table, key_table, gram_table, postings):
+            f.write(section)
+        for data in strings:
+            f.write(data)
+    os.replace(tmp_path, path)
+    return blob_at + position
+
+
+def compile_json(json_path: str = DEFAULT_DATA_PATH, snapshot_path: str = DEFAULT_SNAPSHOT_PATH) -> int:
+    """Compile geography.json into a snapshot; returns the snapshot size in bytes."""
+    with open(json_path, encoding='utf-8') as f:
+        entries = json.load(f)
+    return build_snapshot(places_from_entries(entries), snapshot_path)
+
+
+class GeographySnapshot:
+    """Read-only, memory-mapped view of a snapshot file.
+
+    Records and strings are decoded on access; nothing is copied at open time.
+    """
+
+    def __init__(self, path: str = DEFAULT_SNAPSHOT_PATH):
+        """Map a snapshot file.
+
+        Raises:
+            SnapshotError: If the file is not a readable snapshot of this version
+        """
+        self.path = path
+        try:
+            with open(path, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise SnapshotError(f"Cannot map snapshot {path}: {e}") from e
+
+        if len(self._map) < HEADER.size:
+            self.close()
+            raise SnapshotError(f"Snapshot {path} is truncated")
+        (magic, version, self.place_count, self.string_count, self.key_count, self.gram_count,
+         self.posting_count, self._offsets_at, self._records_at, self._names_at, self._order_at, self._keys_at,
+         self._grams_at, self._postings_at, self._blob_at) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise SnapshotError(f"{path} is not a version {VERSION} geography snapshot")
+        if self._blob_at > len(self._map) or self._postings_at + self.posting_count * _OFFSET.size > self._blob_at:
+            self.close()
+            raise SnapshotError(f"Snapshot {path} is truncated")
+
+    def __len__(self) -> int:
+        return self.place_count
+
+    def string(self, string_id: int) -> str:
+        """Decode one entry of the string table."""
+        if not 0 <= string_id < self.string_count:
+            raise IndexError(string_id)
+        start, end = struct.unpack_from('<2I', self._map, self._offsets_at + string_id * _OFFSET.size)
+        return self._map[self._blob_at + start:self._blob_at + end].decode('utf-8')
+
+    def place(self, index: int) -> Place:
+        """Decode the place stored at index."""
+        if not 0 <= index < self.place_count:
+            raise IndexError(index)
+        code, postal_code, level, *string_ids = RECORD.unpack_from(
+            self._map, self._records_at + index * RECORD.size)
+        name_en, name_th, district_en, district_th, province_en, province_th = map(self.string, string_ids)
+        return Place(code, level, name_en, name_th, district_en, district_th,
+                     province_en, province_th, postal_code)
+
+    def __iter__(self) -> Iterator[Place]:
+        return (self.place(index) for index in range(self.place_count))
+
+    def places(self) -> List[Place]:
+        """Decode every place, sharing one str object per distinct string."""
+        table = self._map[self._offsets_at:self._records_at]
+        bounds = struct.unpack(f'<{self.string_count + 1}I', table)
+        blob = self._map[self._blob_at:self._blob_at + bounds[-1]]
+        strings = [blob[bounds[i]:bounds[i + 1]].decode('utf-8') for i in range(self.string_count)]
+        records = self._map[self._records_at:self._records_at + self.place_count * RECORD.size]
+        return [Place(code, level, strings[name_en], strings[name_th], strings[district_en],
+                      strings[district_th], strings[province_en], strings[province_th], postal_code)
+                for code, postal_code, level, name_en, name_th, district_en, district_th,
+                province_en, province_th in RECORD.iter_unpack(records)]
+
+    def index(self) -> LocationIndex:
+        """Return a LocationIndex that reads its tables from the map.
+
+        The snapshot must stay open for as long as the index is used.
+        """
+        return LocationIndex.from_tables(_PlaceTable(self), _NameTable(self), _KeyTable(self),
+                                         _KeyEntryTable(self), _GramTable(self), _OrderTable(self))
+
+    def close(self) -> None:
+        """Unmap the file."""
+        self._map.close()
+
+    def __enter__(self) -> 'GeographySnapshot':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+# มุมมองแบบ lazy ของแต่ละตาราง: อ่านจาก mmap ทีละแถวเมื่อ LocationIndex เรียกใช้
+class _PlaceTable(Sequence):
+    def __init__(self, snapshot: GeographySnapshot):
+        self._snapshot = snapshot
+
+    def __len__(self) -> int:
+        return self._snapshot.place_count
+
+    def __getitem__(self, index: int) -> Place:
+        return self._snapshot.place(index)
+
+
+class _NameTable(Sequence):
+    def __init__(self, snapshot: GeographySnapshot):
+        self._snapshot = snapshot
+
+    def __len__(self) -> int:
+        return self._snapshot.place_count
+
+    def __getitem__(self, index: int) -> Tuple[str, str]:
+        snapshot = self._snapshot
+        if not 0 <= index < snapshot.place_count:
+            raise IndexError(index)
+        name_en, name_th = NAMES.unpack_from(snapshot._map, snapshot._names_at + index * NAMES.size)
+        return snapshot.string(name_en), snapshot.string(name_th)
+
+
+class _OrderTable(Sequence):
+    def __init__(self, snapshot: GeographySnapshot):
+        self._snapshot = snapshot
+
+    def __len__(self) -> int:
+        return self._snapshot.place_count
+
+    def __getitem__(self, index: int) -> int:
+        snapshot = self._snapshot
+        if not 0 <= index < snapshot.place_count:
+            raise IndexError(index)
+        return _OFFSET.unpack_from(snapshot._map, snapshot._order_at + index * _OFFSET.size)[0]
+
+
+class _KeyTable(Sequence):
+    def __init__(self, snapshot: GeographySnapshot):
+        self._snapshot = snapshot
+
+    def __len__(self) -> int:
+        return self._snapshot.key_count
+
+    def __getitem__(self, position: int) -> str:
+        snapshot = self._snapshot
+        if not 0 <= position < snapshot.key_count:
+            raise IndexError(position)
+        string_id, _, _ = KEY.unpack_from(snapshot._map, snapshot._keys_at + position * KEY.size)
+        return snapshot.string(string_id)
+
+
+class _KeyEntryTable(Sequence):
+    def __init__(self, snapshot: GeographySnapshot):
+        self._snapshot = snapshot
+
+    def __len__(self) -> int:
+        return self._snapshot.key_count
+
+    def __getitem__(self, position: int) -> Tuple[int, int]:
+        snapshot = self._snapshot
+        if not 0 <= position < snapshot.key_count:
+            raise IndexError(position)
+        _, kind, place_id = KEY.unpack_from(snapshot._map, snapshot._keys_at + position * KEY.size)
+        return kind, place_id
+
+
+class _GramTable(Mapping):
+    """Trigram -> posting list, found by binary search over the sorted gram records."""
+
+    def __init__(self, snapshot: GeographySnapshot):
+        self._snapshot = snapshot
+        self._sorted_grams = _GramKeys(self)
+
+    def __len__(self) -> int:
+        return self._snapshot.gram_count
+
+    def _gram(self, position: int) -> str:
+        snapshot = self._snapshot
+        string_id, _, _ = GRAM.unpack_from(snapshot._map, snapshot._grams_at + position * GRAM.size)
+        return snapshot.string(string_id)
+
+    def __iter__(self) -> Iterator[str]:
+        return (self._gram(position) for position in range(len(self)))
+
+    def __getitem__(self, gram: str) -> Tuple[int, ...]:
+        snapshot = self._snapshot
+        position = bisect.bisect_left(self._sorted_grams, gram)
+        if position == len(self) or self._gram(position) != gram:
+            raise KeyError(gram)
+        _, start, end = GRAM.unpack_from(snapshot._map, snapshot._grams_at + position * GRAM.size)
+        return struct.unpack_from(f'<{end - start}I', snapshot._map, snapshot._postings_at + start * _OFFSET.size)
+
+
+class _GramKeys(Sequence):
+    def __init__(self, grams: _GramTable):
+        self._grams = grams
+
+    def __len__(self) -> int:
+        return len(self._grams)
+
+    def __getitem__(self, position: int) -> str:
+        return self._grams._gram(position)
+
+
+def is_fresh(snapshot_path: str = DEFAULT_SNAPSHOT_PATH, json_path: str = DEFAULT_DATA_PATH) -> bool:
+    """Return True if the snapshot exists and is not older than its source JSON."""
+    try:
+        snapshot_mtime = os.path.getmtime(snapshot_path)
+    except OSError:
+        return False
+    try:
+        return snapshot_mtime >= os.path.getmtime(json_path)
+    except OSError:
+        # ไม่มีไฟล์ JSON ต้นฉบับ (เช่น deploy เฉพาะ snapshot) ถือว่าใช้ได้
+        return True
+
+
+def load_places(snapshot_path: str = DEFAULT_SNAPSHOT_PATH) -> Optional[List[Place]]:
+    """Return the places from a snapshot, or None if it cannot be read."""
+    try:
+        with GeographySnapshot(snapshot_path) as snapshot:
+            return snapshot.places()
+    except SnapshotError:
+        return None
+
+
+def open_index(snapshot_path: str = DEFAULT_SNAPSHOT_PATH) -> Optional[LocationIndex]:
+    """Map a snapshot and return an index served from it, or None if it cannot be read.
+
+    The map stays open for the life of the index (normally the process).
+    """
+    try:
+        return GeographySnapshot(snapshot_path).index()
+    except SnapshotError:
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description='Compile geography.json into a binary snapshot.')
+    parser.add_argument('--source', default=DEFAULT_DATA_PATH, help='geography.json to compile')
+    parser.add_argument('--output', default=DEFAULT_SNAPSHOT_PATH, help='snapshot file to write')
+    args = parser.parse_args(argv)
+
+    size = compile_json(args.source, args.output)
+    with GeographySnapshot(args.output) as snapshot:
+        print(f"Wrote {args.output}: {len(snapshot)} places, {snapshot.key_count} keys, "
+              f"{snapshot.gram_count} trigrams, {snapshot.string_count} strings, {size / 1024:.1f} KiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Geohash encoding used to bucket nearby coordinates into shared cache cells."""
+from typing import Tuple
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+_DECODE_MAP = {char: index for index, char in enumerate(_BASE32)}
+
+
+def encode(lat: float, lon: float, precision: int = 5) -> str:
+    """Encode a coordinate as a geohash string.
+
+    Args:
+        lat: Latitude in degrees (-90..90)
+        lon: Longitude in degrees (-180..180)
+        precision: Number of characters (5 ≈ 4.9 km x 4.9 km cells)
+
+    Returns:
+        Geohash of the cell containing the coordinate
+    """
+    if not -90.0 <= lat <= 90.0 or not -180.0 <= lon <= 180.0:
+        raise ValueError(f"Coordinate out of range: {lat}, {lon}")
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True  # บิตคู่เป็นลองจิจูด บิตคี่เป็นละติจูด
+    while len(chars) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+def bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """Return (min_lat, min_lon, max_lat, max_lon) of a geohash cell."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+    for char in geohash.lower():
+        try:
+            value = _DECODE_MAP[char]
+        except KeyError:
+            raise ValueError(f"Invalid geohash character: {char!r}") from None
+        for shift in range(4, -1, -1):
+            rng = lon_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (value >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+
+def decode(geohash: str) -> Tuple[float, float]:
+    """Return the (lat, lon) center of a geohash cell."""
+    min_lat, min_lon, max_lat, max_lon = bounds(geohash)
+    return (min_lat + max_lat) / 2, (min_lon + max_lon) / 2
+
+
+def snap(lat: float, lon: float, precision: int = 5) -> Tuple[str, float, float]:
+    """Snap a coordinate to the center of its geohash cell.
+
+    Returns:
+        (geohash, center_lat, center_lon); every coordinate in the same cell
+        yields the same tuple
+    """
+    cell = encode(lat, lon, precision)
+    center_lat, center_lon = decode(cell)
+    return cell, round(center_lat, 5), round(center_lon, 5)
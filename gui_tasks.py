@@ -0,0 +1,249 @@
+"""Background work for the Tk GUI.
+
+Tk is not thread-safe, so worker threads never call into it. They post
+callbacks to a MainThreadDispatcher, which the Tk main thread drains at a fixed
+cadence with after(); every update posted during one interval runs in the same
+tick and is drawn in a single redraw.
+
+Tasks are submitted to a TaskRunner on a named channel (e.g. 'weather').
+Submitting a new task on a channel supersedes the previous one: its token is
+cancelled, it is dropped if it has not started yet, and its result is
+discarded if it finishes anyway. Only the latest task of a channel ever
+reaches its callbacks.
+"""
+import logging
+import threading
+import tkinter as tk
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class MainThreadDispatcher:
+    """Queue of callbacks run on the Tk main thread in batches."""
+
+    def __init__(self, root: tk.Misc, interval_ms: int = 50, max_batch: int = 200):
+        """Initialize the dispatcher; call start() from the main thread to begin draining.
+
+        Args:
+            root: Application window whose after() drives the drain loop
+            interval_ms: Delay between drains
+            max_batch: Callbacks run per drain at most; the rest wait for the next tick
+        """
+        self.root = root
+        self.interval_ms = interval_ms
+        self.max_batch = max_batch
+        self._items: Deque[Tuple[Optional[Hashable], Callable[..., Any], tuple]] = deque()
+        self._keyed: Dict[Hashable, Tuple[Callable[..., Any], tuple]] = {}
+        self._lock = threading.Lock()
+        self._after_id: Optional[str] = None
+        self.posted = 0
+        self.coalesced = 0
+        self.ticks = 0
+
+    def post(self, fn: Callable[..., Any], *args: Any, key: Optional[Hashable] = None) -> None:
+        """Queue fn(*args) for the main thread. Safe to call from any thread.
+
+        Posts sharing a key are coalesced: if one is still waiting, it is
+        replaced by the newer call and keeps its place in the queue.
+        """
+        with self._lock:
+            self.posted += 1
+            if key is not None:
+                if key in self._keyed:
+                    self._keyed[key] = (fn, args)
+                    self.coalesced += 1
+                    return
+                self._keyed[key] = (fn, args)
+            self._items.append((key, fn, args))
+
+    def start(self) -> None:
+        """Begin draining the queue. Main thread only."""
+        if self._after_id is None:
+            self._after_id = self.root.after(self.interval_ms, self._drain)
+
+    def stop(self) -> None:
+        """Stop draining; callbacks still queued are dropped. Main thread only."""
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+            self._after_id = None
+        with self._lock:
+            self._items.clear()
+            self._keyed.clear()
+
+    def _drain(self) -> None:
+        with self._lock:
+            batch = []
+            while self._items and len(batch) < self.max_batch:
+                key, fn, args = self._items.popleft()
+                if key is not None:
+                    fn, args = self._keyed.pop(key)
+                batch.append((fn, args))
+        if batch:
+            self.ticks += 1
+        for fn, args in batch:
+            try:
+                fn(*args)
+            except Exception:
+                logger.exception(f"UI callback {getattr(fn, '__qualname__', fn)} failed")
+        # ตั้งรอบถัดไปหลังทำงานเสร็จ ถ้า callback ช้า รอบจะไม่ซ้อนกัน
+        if self._after_id is not None:
+            self._after_id = self.root.after(self.interval_ms, self._drain)
+
+    def stats(self) -> Dict[str, int]:
+        """Return posted/coalesced counters, ticks that ran callbacks and the queue length."""
+        with self._lock:
+            return {'posted': self.posted, 'coalesced': self.coalesced, 'ticks': self.ticks,
+                    'queued': len(self._items)}
+
+
+class TaskCancelled(Exception):
+    """Raised inside a task that was superseded or cancelled."""
+
+
+class CancelToken:
+    """Cancellation flag passed to a running task."""
+
+    def __init__(self, channel: str, generation: int):
+        self.channel = channel
+        self.generation = generation
+        self._event = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    def raise_if_cancelled(self) -> None:
+        """Stop the task between steps once it has been superseded.
+
+        Raises:
+            TaskCancelled: If the token was cancelled
+        """
+        if self._event.is_set():
+            raise TaskCancelled(f"{self.channel} task {self.generation} was superseded")
+
+
+class TaskRunner:
+    """Runs GUI background work on a fixed number of threads, latest-wins per channel."""
+
+    def __init__(self, dispatcher: MainThreadDispatcher, max_workers: int = 4):
+        """Initialize the runner.
+
+        Args:
+            dispatcher: Carries results back to the main thread
+            max_workers: Upper bound on concurrently running tasks
+        """
+        self.dispatcher = dispatcher
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='gui-task')
+        self._lock = threading.Lock()
+        self._generations: Dict[str, int] = {}
+        self._current: Dict[str, tuple] = {}
+        self.submitted = 0
+        self.superseded = 0
+        self._closed = False
+
+    def submit(self, channel: str, fn: Callable[[CancelToken], Any],
+               on_success: Callable[[Any], None],
+               on_error: Optional[Callable[[BaseException], None]] = None,
+               on_done: Optional[Callable[[], None]] = None) -> CancelToken:
+        """Run fn(token) in the pool, superseding the channel's previous task.
+
+        The callbacks run on the main thread and only if the task is still the
+        latest of its channel: on_success(result) or on_error(exception), then
+        on_done(). Main thread only.
+
+        Returns:
+            The task's cancellation token
+        """
+        with self._lock:
+            generation = self._generations.get(channel, 0) + 1
+            self._generations[channel] = generation
+            token = CancelToken(channel, generation)
+            previous = self._current.get(channel)
+            self.submitted += 1
+        if previous is not None:
+            self._cancel(*previous)
+        future = self._executor.submit(self._run, token, fn)
+        with self._lock:
+            if self._generations[channel] == generation:
+                self._current[channel] = (token, future)
+        future.add_done_callback(lambda done: self._finish(token, done, on_success, on_error, on_done))
+        return token
+
+    def cancel(self, channel: str) -> None:
+        """Cancel the channel's current task; its callbacks will not run."""
+        with self._lock:
+            self._generations[channel] = self._generations.get(channel, 0) + 1
+            current = self._current.pop(channel, None)
+        if current is not None:
+            self._cancel(*current)
+
+    def _cancel(self, token: CancelToken, future: Future) -> None:
+        token.cancel()
+        # งานที่ยังไม่เริ่มจะไม่ได้ใช้ thread เลย งานที่กำลังทำจะหยุดที่ raise_if_cancelled ถัดไป
+        future.cancel()
+        with self._lock:
+            self.superseded += 1
+
+    def is_current(self, token: CancelToken) -> bool:
+        """Return True if token belongs to the latest task of its channel."""
+        with self._lock:
+            return not token.cancelled and self._generations.get(token.channel) == token.generation
+
+    @staticmethod
+    def _run(token: CancelToken, fn: Callable[[CancelToken], Any]) -> Any:
+        token.raise_if_cancelled()
+        return fn(token)
+
+    def _finish(self, token: CancelToken, future: Future, on_success, on_error, on_done) -> None:
+        """Runs on a worker thread (or the caller if already done); hands off to the main thread."""
+        if future.cancelled() or not self.is_current(token) or self._closed:
+            return
+        # ผลลัพธ์ของ channel เดียวกันที่ยังรอคิวอยู่จะถูกแทนที่ด้วยผลล่าสุด
+        self.dispatcher.post(self._deliver, token, future, on_success, on_error, on_done,
+                             key=('task', token.channel))
+
+    def _deliver(self, token: CancelToken, future: Future, on_success, on_error, on_done) -> None:
+        # ตรวจซ้ำบน main thread เผื่อมีงานใหม่ถูกส่งเข้ามาระหว่างรอคิว
+        if not self.is_current(token):
+            return
+        with self._lock:
+            if self._current.get(token.channel, (None,))[0] is token:
+                del self._current[token.channel]
+        error = future.exception()
+        try:
+            if error is None:
+                on_success(future.result())
+            elif isinstance(error, TaskCancelled):
+                return
+            elif on_error is not None:
+                on_error(error)
+            else:
+                logger.error(f"Unhandled error in {token.channel} task", exc_info=error)
+        finally:
+            if on_done is not None and not isinstance(error, TaskCancelled):
+                on_done()
+
+    def stats(self) -> Dict[str, int]:
+        """Return submitted/superseded counters and the number of live channels."""
+        with self._lock:
+            return {'submitted': self.submitted, 'superseded': self.superseded, 'running': len(self._current)}
+
+    def shutdown(self) -> None:
+        """Cancel everything and stop the worker threads without waiting."""
+        self._closed = True
+        with self._lock:
+            current = list(self._current.values())
+            self._current.clear()
+        for token, future in current:
+            token.cancel()
+            future.cancel()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,217 @@
+"""Weather icon cache for the Tk GUI.
+
+Icons are keyed by (code, size). Each size is resized once and stored as a PNG
+on disk next to the downloaded original, so an icon is fetched from
+openweathermap.org once per install and resized once per size. Decoded
+PhotoImages are kept in a small in-memory LRU, so re-rendering a card is a
+dictionary lookup.
+
+PIL work runs on a background thread; results go through the GUI's
+MainThreadDispatcher, so PhotoImages are only created and handed to callbacks
+on the Tk main thread.
+"""
+import io
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+from PIL import Image, ImageTk
+
+from gui_tasks import MainThreadDispatcher
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'icons')
+ICON_URL = 'http://openweathermap.org/img/wn/{code}@2x.png'
+
+# รหัสไอคอนของ OpenWeatherMap เช่น 01d, 10n (ตรวจรูปแบบก่อนใช้เป็นชื่อไฟล์)
+_CODE_PATTERN = re.compile(r'^\d{2}[dn]$')
+
+IconKey = Tuple[str, int]
+IconCallback = Callable[[Optional[ImageTk.PhotoImage]], None]
+
+
+def _open_png(path: str) -> Image.Image:
+    """Decode a stored icon fully so the file is closed before returning."""
+    image = Image.open(path)
+    image.load()
+    return image
+
+
+class IconCache:
+    """Disk-backed, size-aware cache of weather icons shared by all cards."""
+
+    def __init__(self, dispatcher: MainThreadDispatcher, directory: str = DEFAULT_DIR, max_photos: int = 64,
+                 session: Optional[requests.Session] = None, max_workers: int = 2):
+        """Initialize the cache.
+
+        Args:
+            dispatcher: Carries loaded icons back to the Tk main thread
+            directory: Where original and resized PNGs are stored (created if missing)
+            max_photos: Decoded PhotoImages kept in memory (least recently used dropped)
+            session: HTTP session used to download missing icons
+            max_workers: Threads used for downloading and resizing
+        """
+        self.dispatcher = dispatcher
+        self.directory = directory
+        self.max_photos = max_photos
+        self.session = session or requests.Session()
+        self._photos: "OrderedDict[IconKey, ImageTk.PhotoImage]" = OrderedDict()
+        self._pending: Dict[IconKey, List[IconCallback]] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='icon-loader')
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.downloads = 0
+        self.resizes = 0
+        self.errors = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls, dispatcher: MainThreadDispatcher) -> 'IconCache':
+        """Create a cache configured by ICON_CACHE_DIR and ICON_CACHE_SIZE."""
+        return cls(dispatcher, os.getenv('ICON_CACHE_DIR') or DEFAULT_DIR,
+                   max_photos=int(os.getenv('ICON_CACHE_SIZE', '64')))
+
+    def _path(self, code: str, size: Optional[int]) -> str:
+        name = f"{code}@2x.png" if size is None else f"{code}@{size}px.png"
+        return os.path.join(self.directory, name)
+
+    def photo(self, code: str, size: int) -> Optional[ImageTk.PhotoImage]:
+        """Return the decoded icon if it is in memory. Main thread only."""
+        key = (code, size)
+        photo = self._photos.get(key)
+        if photo is not None:
+            self._photos.move_to_end(key)
+            self.memory_hits += 1
+        return photo
+
+    def request(self, code: str, size: int, callback: IconCallback) -> None:
+        """Deliver the icon for (code, size) to callback on the Tk main thread.
+
+        Calls back immediately when the icon is in memory; otherwise it is
+        loaded from disk (or downloaded and resized once) in the background.
+        callback receives None if the icon cannot be loaded. Main thread only.
+
+        Args:
+            code: OpenWeatherMap icon code, e.g. '01d'
+            size: Width and height in pixels
+            callback: Called with the PhotoImage (or None)
+        """
+        photo = self.photo(code, size)
+        if photo is not None:
+            callback(photo)
+            return
+        key = (code, size)
+        with self._lock:
+            waiting = self._pending.get(key)
+            if waiting is not None:
+                # มีการโหลดไอคอนนี้อยู่แล้ว รอผลเดียวกัน
+                waiting.append(callback)
+                return
+            self._pending[key] = [callback]
+        self._executor.submit(self._load, key)
+
+    def _load(self, key: IconKey) -> None:
+        try:
+            image = self.load_image(*key)
+        except Exception as e:
+            logger.error(f"Failed to load icon {key[0]} at {key[1]}px: {e}")
+            with self._lock:
+                self.errors += 1
+            image = None
+        self.dispatcher.post(self._deliver, key, image)
+
+    def _deliver(self, key: IconKey, image: Optional[Image.Image]) -> None:
+        """Create the PhotoImage on the main thread and run the waiting callbacks."""
+        photo = None
+        if image is not None:
+            photo = ImageTk.PhotoImage(image)
+            self._photos[key] = photo
+            self._photos.move_to_end(key)
+            while len(self._photos) > self.max_photos:
+                self._photos.popitem(last=False)
+        with self._lock:
+            callbacks = self._pending.pop(key, [])
+        for callback in callbacks:
+            try:
+                callback(photo)
+            except Exception as e:
+                logger.error(f"Icon callback for {key} failed: {e}")
+
+    def load_image(self, code: str, size: int) -> Image.Image:
+        """Return the icon resized to size x size, using the disk store when possible.
+
+        Safe to call from any thread; does not touch Tk.
+
+        Raises:
+            ValueError: If code is not an OpenWeatherMap icon code
+            requests.exceptions.RequestException: If a download is needed and fails
+        """
+        if not _CODE_PATTERN.match(code):
+            raise ValueError(f"Invalid icon code: {code!r}")
+        variant = self._path(code, size)
+        try:
+            image = _open_png(variant)
+            with self._lock:
+                self.disk_hits += 1
+            return image
+        except OSError:
+            pass  # ยังไม่มีไฟล์ หรือไฟล์เสีย ให้สร้างใหม่
+
+        original = self._original(code)
+        image = original.resize((size, size), Image.Resampling.LANCZOS)
+        with self._lock:
+            self.resizes += 1
+        self._save(image, variant)
+        return image
+
+    def _original(self, code: str) -> Image.Image:
+        """Return the full-size icon, downloading it if it is not on disk."""
+        path = self._path(code, None)
+        try:
+            return _open_png(path)
+        except OSError:
+            pass  # ยังไม่มีไฟล์ หรือไฟล์เสีย ให้สร้างใหม่
+        response = self.session.get(ICON_URL.format(code=code), timeout=(3.05, 10))
+        response.raise_for_status()
+        with self._lock:
+            self.downloads += 1
+        image = Image.open(io.BytesIO(response.content))
+        image.load()
+        self._save(image, path)
+        return image
+
+    def _save(self, image: Image.Image, path: str) -> None:
+        """Write a PNG atomically; a failed write only costs a resize next time."""
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            image.save(tmp_path, format='PNG')
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Cannot store icon {path}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        """Return load counters and the number of icons held in memory."""
+        with self._lock:
+            return {
+                'in_memory': len(self._photos),
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'downloads': self.downloads,
+                'resizes': self.resizes,
+                'errors': self.errors
+            }
+
+    def close(self) -> None:
+        """Stop the loader threads (pending loads are abandoned)."""
+        self._executor.shutdown(wait=False)
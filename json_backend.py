@@ -0,0 +1,62 @@
+"""JSON encoding/decoding through the fastest available backend.
+
+Uses orjson when it is installed and falls back to the standard library
+otherwise. Both produce compact UTF-8 bytes, with non-ASCII text left as is
+unless ensure_ascii is set, and the same bytes for JSON-native data (str,
+int, bool, None, lists, dicts and floats printed without an exponent).
+They differ on datetimes (orjson serializes them, json calls default), on
+NaN/Infinity (orjson writes null, json writes NaN/Infinity) and on
+exponent floats (1e+16 vs 1e16).
+"""
+import json
+from typing import Any, Callable, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # ทางเลือก: pip install orjson
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+# orjson.JSONDecodeError สืบทอดจาก json.JSONDecodeError จึงจับด้วยชนิดเดียวกันได้
+JSONDecodeError = json.JSONDecodeError
+
+
+def _std_dumps(obj: Any, default: Optional[Callable[[Any], Any]], sort_keys: bool, ensure_ascii: bool) -> bytes:
+    if default is None and not sort_keys and not ensure_ascii:
+        return _encoder.encode(obj).encode('utf-8')
+    encoder = json.JSONEncoder(ensure_ascii=ensure_ascii, sort_keys=sort_keys, separators=(',', ':'),
+                               default=default)
+    return encoder.encode(obj).encode('utf-8')
+
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any, default: Optional[Callable[[Any], Any]] = None,
+              sort_keys: bool = False, ensure_ascii: bool = False) -> bytes:
+        """Serialize obj to compact UTF-8 JSON bytes.
+
+        orjson cannot escape non-ASCII text, so ensure_ascii uses the standard
+        library.
+        """
+        if ensure_ascii:
+            return _std_dumps(obj, default, sort_keys, ensure_ascii)
+        return orjson.dumps(obj, default=default, option=(_OPTIONS | orjson.OPT_SORT_KEYS) if sort_keys else _OPTIONS)
+
+    def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+        """Deserialize JSON bytes or text."""
+        return orjson.loads(data)
+else:
+    def dumps(obj: Any, default: Optional[Callable[[Any], Any]] = None,
+              sort_keys: bool = False, ensure_ascii: bool = False) -> bytes:
+        """Serialize obj to compact UTF-8 JSON bytes."""
+        return _std_dumps(obj, default, sort_keys, ensure_ascii)
+
+    def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+        """Deserialize JSON bytes or text."""
+        if isinstance(data, memoryview):
+            data = bytes(data)
+        return json.loads(data)
@@ -0,0 +1,301 @@
+"""In-process autocomplete index over the Thai geography dataset."""
+import heapq
+import json
+import logging
+import os
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 'location_api', 'data', 'geography.json')
+
+PROVINCE, DISTRICT, SUBDISTRICT = 0, 1, 2
+_LEVEL_NAMES = ('province', 'district', 'subdistrict')
+
+# ประเภทการจับคู่ ใช้เป็นลำดับแรกในการจัดอันดับผลลัพธ์
+_EXACT, _PREFIX, _WORD_PREFIX, _INFIX = 0, 1, 2, 3
+
+_NGRAM = 3
+_MAX_CHAR = chr(0x10FFFF)
+# คำค้นสั้น ๆ ตรงกับคีย์จำนวนมาก จึงเก็บผลจัดอันดับไว้ใช้ซ้ำ
+_SHORT_QUERY_LENGTH = 2
+# เก็บผลของคำค้นสั้นครั้งละ _SHORT_RESULT_LIMIT อันดับ แล้วตัดตาม limit ที่ขอ
+_SHORT_RESULT_LIMIT = 50
+# จำนวนคำค้นสั้นที่จำไว้สูงสุด (คำค้นมาจากผู้ใช้ จึงต้องมีขอบเขต)
+_SHORT_CACHE_SIZE = 2048
+
+
+class Place(NamedTuple):
+    """A province, district or subdistrict that can be suggested."""
+    code: int
+    level: int
+    name_en: str
+    name_th: str
+    district_en: str
+    district_th: str
+    province_en: str
+    province_th: str
+    postal_code: int
+
+    def to_suggestion(self) -> Dict[str, Any]:
+        """Return the suggestion in the JSON shape served by the Go location API."""
+        subdistrict_en = self.name_en if self.level == SUBDISTRICT else ''
+        subdistrict_th = self.name_th if self.level == SUBDISTRICT else ''
+        local_names = {}
+        if self.name_en:
+            local_names['en'] = self.name_en
+        if self.name_th:
+            local_names['th'] = self.name_th
+        return {
+            'id': self.code,
+            'type': _LEVEL_NAMES[self.level],
+            'name': self.name_en,
+            'local_names': local_names,
+            'country': 'TH',
+            'state': self.province_en,
+            'district': self.district_en,
+            'subdistrict': subdistrict_en,
+            'full_display_name': _join(subdistrict_en, self.district_en, self.province_en),
+            'full_display_name_th': _join(subdistrict_th, self.district_th, self.province_th),
+            'postal_code': self.postal_code
+        }
+
+
+def _join(*parts: str) -> str:
+    return ', '.join(part.strip() for part in parts if part and part.strip())
+
+
+def normalize(text: str) -> str:
+    """Fold case and collapse whitespace so queries match regardless of formatting."""
+    return ' '.join(text.split()).casefold()
+
+
+def _ngrams(text: str) -> Set[str]:
+    return {text[i:i + _NGRAM] for i in range(len(text) - _NGRAM + 1)}
+
+
+def places_from_entries(entries: Iterable[Dict[str, Any]]) -> List[Place]:
+    """Derive distinct provinces, districts and subdistricts from geography.json rows."""
+    provinces: Dict[int, Place] = {}
+    districts: Dict[int, Place] = {}
+    subdistricts: List[Place] = []
+    for entry in entries:
+        province_en = entry.get('provinceNameEn', '')
+        province_th = entry.get('provinceNameTh', '')
+        district_en = entry.get('districtNameEn', '')
+        district_th = entry.get('districtNameTh', '')
+        postal_code = entry.get('postalCode', 0)
+        province_code = entry.get('provinceCode', 0)
+        district_code = entry.get('districtCode', 0)
+        if province_code not in provinces:
+            provinces[province_code] = Place(province_code, PROVINCE, province_en, province_th,
+                                             '', '', province_en, province_th, 0)
+        if district_code not in districts:
+            districts[district_code] = Place(district_code, DISTRICT, district_en, district_th,
+                                             district_en, district_th, province_en, province_th, postal_code)
+        if entry.get('subdistrictNameEn') or entry.get('subdistrictNameTh'):
+            subdistricts.append(Place(entry.get('subdistrictCode', 0), SUBDISTRICT,
+                                      entry.get('subdistrictNameEn', ''), entry.get('subdistrictNameTh', ''),
+                                      district_en, district_th, province_en, province_th, postal_code))
+    return list(provinces.values()) + list(districts.values()) + subdistricts
+
+
+class LocationIndex:
+    """Ranked prefix/infix search over Thai and English place names.
+
+    Built once from the dataset: a sorted key table answers prefix queries with
+    a binary search, and a trigram inverted index narrows infix queries (useful
+    for Thai, which has no spaces between words) to a few candidates. The
+    tables only need indexing and len(), so from_tables() can serve them from
+    a memory-mapped geography snapshot instead of Python lists.
+    """
+
+    def __init__(self, places: List[Place]):
+        """Build the index.
+
+        Args:
+            places: Places to index (see places_from_entries)
+        """
+        keyed: List[Tuple[str, int, int]] = []  # (key, kind ถ้าตรงต้นคำ, place index)
+        names: List[Tuple[str, str]] = []
+        ngrams: Dict[str, List[int]] = {}
+        for place_id, place in enumerate(places):
+            name_en = normalize(place.name_en)
+            name_th = normalize(place.name_th)
+            names.append((name_en, name_th))
+            for name in (name_en, name_th):
+                if not name:
+                    continue
+                keyed.append((name, _PREFIX, place_id))
+                # ชื่อภาษาอังกฤษหลายคำ: ค้นจากต้นคำถัด ๆ ไปได้ด้วย เช่น "nakhon" -> "Phra Nakhon"
+                position = name.find(' ')
+                while position != -1:
+                    keyed.append((name[position + 1:], _WORD_PREFIX, place_id))
+                    position = name.find(' ', position + 1)
+                for gram in _ngrams(name):
+                    postings = ngrams.setdefault(gram, [])
+                    if not postings or postings[-1] != place_id:
+                        postings.append(place_id)
+        keyed.sort()
+        self.places: Sequence[Place] = places
+        self._names: Sequence[Tuple[str, str]] = names
+        self._ngrams: Mapping[str, Sequence[int]] = ngrams
+        self._keys: Sequence[str] = [key for key, _, _ in keyed]
+        self._key_entries: Sequence[Tuple[int, int]] = [(kind, place_id) for _, kind, place_id in keyed]
+        # ลำดับตายตัวของแต่ละที่ (ระดับ, ความยาวชื่อ, ชื่อ) คำนวณครั้งเดียว ใช้ตัดสินเมื่อประเภทการจับคู่เท่ากัน
+        ranked_ids = sorted(range(len(places)), key=lambda place_id: (
+            places[place_id].level, len(places[place_id].name_en), places[place_id].name_en))
+        order = [0] * len(places)
+        for position, place_id in enumerate(ranked_ids):
+            order[place_id] = position
+        self._order: Sequence[int] = order
+        self._short_results: 'OrderedDict[str, List[Place]]' = OrderedDict()
+        self._short_lock = threading.Lock()
+
+    @classmethod
+    def from_tables(cls, places: Sequence[Place], names: Sequence[Tuple[str, str]], keys: Sequence[str],
+                    key_entries: Sequence[Tuple[int, int]], ngrams: Mapping[str, Sequence[int]],
+                    order: Sequence[int]) -> 'LocationIndex':
+        """Wrap prebuilt tables (as exported by tables()) without rebuilding them."""
+        index = cls.__new__(cls)
+        index.places = places
+        index._names = names
+        index._keys = keys
+        index._key_entries = key_entries
+        index._ngrams = ngrams
+        index._order = order
+        index._short_results = OrderedDict()
+        index._short_lock = threading.Lock()
+        return index
+
+    def tables(self) -> Tuple[Sequence[Place], Sequence[Tuple[str, str]], Sequence[str],
+                              Sequence[Tuple[int, int]], Mapping[str, Sequence[int]], Sequence[int]]:
+        """Return (places, names, keys, key_entries, ngrams, order) for from_tables()."""
+        return self.places, self._names, self._keys, self._key_entries, self._ngrams, self._order
+
+    @classmethod
+    def from_json(cls, path: str = DEFAULT_DATA_PATH) -> 'LocationIndex':
+        """Load geography.json and build the index."""
+        with open(path, encoding='utf-8') as f:
+            entries = json.load(f)
+        index = cls(places_from_entries(entries))
+        logger.info(f"Location index built: {len(index.places)} places from {len(entries)} entries")
+        return index
+
+    def __len__(self) -> int:
+        return len(self.places)
+
+    def search(self, query: str, limit: int = 10) -> List[Place]:
+        """Return up to limit places matching query, best match first.
+
+        Ranking: exact name, name prefix, word prefix, then infix match; ties go to
+        provinces before districts before subdistricts, then shorter names.
+        """
+        q = normalize(query)
+        if not q or limit <= 0:
+            return []
+        if len(q) <= _SHORT_QUERY_LENGTH and limit <= _SHORT_RESULT_LIMIT:
+            # คำค้นสั้นกว่า n-gram ใช้แค่การจับคู่ต้นคำ ผล limit น้อยจึงเป็นส่วนต้นของผล limit มากเสมอ
+            return self._short_search(q)[:limit]
+        return self._search(q, limit)
+
+    def _short_search(self, q: str) -> List[Place]:
+        with self._short_lock:
+            cached = self._short_results.get(q)
+            if cached is not None:
+                self._short_results.move_to_end(q)
+                return cached
+        cached = self._search(q, _SHORT_RESULT_LIMIT)
+        with self._short_lock:
+            self._short_results[q] = cached
+            while len(self._short_results) > _SHORT_CACHE_SIZE:
+                self._short_results.popitem(last=False)
+        return cached
+
+    def _search(self, q: str, limit: int) -> List[Place]:
+        best: Dict[int, int] = {}
+        keys = self._keys
+        # ทุกคีย์ที่ขึ้นต้นด้วย q อยู่ในช่วง [q, q + อักขระสูงสุด) จึงไม่ต้องอ่านคีย์ทีละตัว
+        start = bisect_left(keys, q)
+        end = bisect_left(keys, q + _MAX_CHAR, start)
+        exact_end = start
+        while exact_end < end and keys[exact_end] == q:
+            exact_end += 1
+        for position in range(start, end):
+            kind, place_id = self._key_entries[position]
+            if kind == _PREFIX and position < exact_end:
+                kind = _EXACT
+            if kind < best.get(place_id, _INFIX + 1):
+                best[place_id] = kind
+
+        if len(best) < limit and len(q) >= _NGRAM:
+            # คำค้นที่ยาวเท่า n-gram พอดีตรงกับทุกตัวใน posting list อยู่แล้ว ไม่ต้องตรวจชื่อซ้ำ
+            verify = len(q) > _NGRAM
+            for place_id in self._infix_candidates(q):
+                if place_id not in best:
+                    if verify:
+                        name_en, name_th = self._names[place_id]
+                        if q not in name_en and q not in name_th:
+                            continue
+                    best[place_id] = _INFIX
+
+        order = self._order
+        ranked = heapq.nsmallest(limit, best.items(), key=lambda item: (item[1], order[item[0]]))
+        return [self.places[place_id] for place_id, _ in ranked]
+
+    def _infix_candidates(self, q: str) -> List[int]:
+        """Intersect trigram posting lists, smallest first."""
+        postings = []
+        for gram in _ngrams(q):
+            ids = self._ngrams.get(gram)
+            if ids is None:
+                return []
+            postings.append(ids)
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for ids in postings[1:]:
+            candidates.intersection_update(ids)
+            if not candidates:
+                break
+        return sorted(candidates)
+
+    def suggest(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Return search results as JSON-ready suggestion dicts."""
+        return [place.to_suggestion() for place in self.search(query, limit)]
+
+
+_default_index: Optional[LocationIndex] = None
+_default_index_lock = threading.Lock()
+
+
+def get_location_index() -> LocationIndex:
+    """Return the process-wide index, loading it on first use.
+
+    The index is served from the compiled snapshot when it is present and up
+    to date (see geography_snapshot), otherwise built from the JSON dataset. The paths can be
+    overridden with GEOGRAPHY_SNAPSHOT_PATH and GEOGRAPHY_DATA_PATH.
+    """
+    global _default_index
+    if _default_index is None:
+        with _default_index_lock:
+            if _default_index is None:
+                _default_index = _load_default_index()
+    return _default_index
+
+
+def _load_default_index() -> LocationIndex:
+    import geography_snapshot  # นำเข้าตอนใช้งาน เพราะ geography_snapshot นำเข้าโมดูลนี้
+
+    json_path = os.getenv('GEOGRAPHY_DATA_PATH', DEFAULT_DATA_PATH)
+    snapshot_path = os.getenv('GEOGRAPHY_SNAPSHOT_PATH', geography_snapshot.DEFAULT_SNAPSHOT_PATH)
+    if geography_snapshot.is_fresh(snapshot_path, json_path):
+        index = geography_snapshot.open_index(snapshot_path)
+        if index is not None:
+            logger.info(f"Location index mapped from snapshot {snapshot_path}: {len(index)} places")
+            return index
+        logger.warning(f"Ignoring unreadable geography snapshot {snapshot_path}")
+    return LocationIndex.from_json(json_path)
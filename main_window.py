@@ -2,17 +2,20 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, font as tkfont
 from typing import Optional, Dict, List, Callable, Any, Tuple
-from PIL import Image, ImageTk
-import urllib.request
-import io
+from PIL import ImageTk
 import requests
-from datetime import datetime
 import logging
-import threading
+import math
+import time
 
 # Assuming config.py and weather_service.py are in the same directory or accessible via PYTHONPATH
 from config import Config # Use .config if it's a package
 from weather_service import WeatherService, WeatherServiceError # Use .weather_service if it's a package
+from weather_models import CurrentWeather, ForecastSeries
+from response_cache import ResponseCache
+from disk_cache import DiskCache
+from icon_cache import IconCache
+from gui_tasks import CancelToken, MainThreadDispatcher, TaskRunner
 from theme_manager import ColorPalette # Added import
 
 logger = logging.getLogger(__name__)
@@ -43,7 +46,14 @@ TEXTS = {
         'theme_select_label': 'เลือกธีม:',
         'theme_light': 'สว่าง (Light)',
         'theme_dark': 'มืด (Dark)',
-        'theme_auto': 'อัตโนมัติตามอุณหภูมิ (Auto)'
+        'theme_auto': 'อัตโนมัติตามอุณหภูมิ (Auto)',
+        'watchlist': 'ติดตาม',
+        'weather_view': 'สภาพอากาศ',
+        'watchlist_add': 'เพิ่ม',
+        'watchlist_placeholder': 'เพิ่มเมืองที่ต้องการติดตาม...',
+        'watchlist_pending': 'กำลังโหลด...',
+        'watchlist_count': 'ติดตาม {count} เมือง',
+        'watchlist_refreshing': 'กำลังรีเฟรช {count} เมือง...'
     },
     'en': {
         'app_title': 'Weather App',
@@ -69,7 +79,14 @@ TEXTS = {
         'theme_select_label': 'Theme:',
         'theme_light': 'Light',
         'theme_dark': 'Dark',
-        'theme_auto': 'Auto by Temperature'
+        'theme_auto': 'Auto by Temperature',
+        'watchlist': 'Watchlist',
+        'weather_view': 'Weather',
+        'watchlist_add': 'Add',
+        'watchlist_placeholder': 'Add a city to watch...',
+        'watchlist_pending': 'Loading...',
+        'watchlist_count': 'Watching {count} cities',
+        'watchlist_refreshing': 'Refreshing {count} cities...'
     }
 }
 
@@ -80,10 +97,14 @@ class MainWindow(tk.Tk):
         self.config = Config()
         self.texts = TEXTS.get(self.config.get_setting('language', 'th'), TEXTS['en'])
         self.weather_service: Optional[WeatherService] = None
-        self.weather_icons: Dict[str, ImageTk.PhotoImage] = {}
+        self.response_cache: Optional[ResponseCache] = None # Created once, kept across settings changes
+        # Worker threads never touch Tk; their results are queued here and applied in batches
+        self.dispatcher = MainThreadDispatcher(self)
+        self.icon_cache = IconCache.from_env(self.dispatcher) # Shared by all cards, keyed by (code, size)
+        self.tasks = TaskRunner(self.dispatcher) # Bounded pool; a new search supersedes the previous one
         self.current_temperature: Optional[float] = None # Added for theme management
-        self.current_weather_data: Optional[Dict] = None # Store current weather data
-        self.forecast_data: Optional[List[Dict]] = None # Store forecast data
+        self.current_weather_data: Optional[CurrentWeather] = None # Store current weather data
+        self.forecast_data: Optional[ForecastSeries] = None # Store forecast data
 
         self.title(self.texts['app_title'])
         self.geometry("450x750")
@@ -91,6 +112,7 @@ class MainWindow(tk.Tk):
 
         self.setup_styles()
         self.create_widgets()
+        self.dispatcher.start()
         self.initialize_weather_service()
 
         if self.weather_service:
@@ -103,128 +125,27 @@ class MainWindow(tk.Tk):
         # และจัดระเบียบฟังก์ชันใหม่ให้เหมาะสม
 
     def apply_theme_and_refresh_ui(self, new_temperature: Optional[float] = None):
-        """Applies the current theme and refreshes UI elements."""
+        """Applies the current theme to the existing widgets."""
         if new_temperature is not None:
             self.current_temperature = new_temperature
         
-        self.setup_styles() # Re-apply styles with current_temperature
-
-        # Re-configure existing widgets or recreate them if necessary
-        # For now, let's assume setup_styles() handles most of it by reconfiguring the ttk.Style
-        # We might need to explicitly update backgrounds of tk.Tk and some frames
-        palette = self.config.get_current_palette(self.current_temperature)
-        self.configure(background=palette.background)
-        
-        # Destroy and recreate widgets to ensure theme is fully applied
-        # This is a more robust way for Tkinter to handle deep style changes
-        for widget in self.winfo_children():
-            widget.destroy()
-        self.create_widgets() # Recreate all widgets
+        # Every widget refers to a ttk style name, so reconfiguring the styles
+        # restyles the whole window in place; nothing is destroyed or rebuilt.
+        self.setup_styles()
         
-        # After recreating widgets, if weather data exists, re-populate it
-        if self.weather_service and self.weather_service.is_service_ready():
-            if self.current_weather_data:
-                self.current_weather_card.update_data(self.current_weather_data)
-            if self.forecast_data:
-                self.forecast_card.update_data(self.forecast_data)
-            if self.status_var.get() != self.texts.get('loading', 'Loading...'): # Avoid overwriting loading message
-                 last_loc = self.config.get_setting('last_location')
-                 if last_loc:
-                    self.update_status_bar(f"{self.texts.get('last_updated', 'Last updated:')} {datetime.now().strftime('%H:%M')} - {last_loc}")
-                 else:
-                    self.update_status_bar(self.texts.get('ready', 'Ready')) 
-        else:
+        if not (self.weather_service and self.weather_service.is_service_ready()):
             self.show_api_key_prompt()
 
     def setup_styles(self):
-        self.style = ttk.Style(self)
+        """Configure the ttk styles for the current palette (no-op if it has not changed)."""
         palette: ColorPalette = self.config.get_current_palette(self.current_temperature)
-
-        # --- Define Base Fonts ---
-        try:
-            base_font_family = "Segoe UI"
-            tkfont.Font(family=base_font_family).actual()
-        except tk.TclError:
-            base_font_family = "Calibri"
-        
-        default_font = (base_font_family, 10)
-        small_font = (base_font_family, 9)
-        medium_font = (base_font_family, 11)
-        large_font = (base_font_family, 16, "bold")
-        xlarge_font = (base_font_family, 28, "bold")
-        header_font = (base_font_family, 18, "bold")
-        button_font = (base_font_family, 10, "bold")
-
-        self.style.theme_use('clam')
-
-        # --- General Styles ---
-        self.configure(background=palette.background) # Set main window background
-        self.style.configure(".", background=palette.background, foreground=palette.text, font=default_font)
-        self.style.configure("TFrame", background=palette.background)
-        self.style.configure("TLabel", background=palette.background, foreground=palette.text, font=default_font)
-        self.style.configure("TButton", padding=(8, 5), font=button_font, relief=tk.FLAT, borderwidth=0)
-        self.style.map("TButton",
-            background=[('active', palette.accent), ('!disabled', palette.primary)],
-            foreground=[('!disabled', palette.button_text)]
-        )
-        self.style.configure("TEntry", 
-                             fieldbackground=palette.card_bg, 
-                             foreground=palette.text, 
-                             insertcolor=palette.text,
-                             font=medium_font,
-                             padding=5)
-        self.style.map("TEntry", bordercolor=[('focus', palette.primary)])
-
-        # --- Card Styles ---
-        self.style.configure("Card.TFrame", 
-                             background=palette.card_bg, 
-                             relief=tk.SOLID, 
-                             borderwidth=1,
-                             padding=15)
-        self.style.configure("Card.TLabel", background=palette.card_bg, foreground=palette.card_text, font=default_font)
-        self.style.configure("Card.Title.TLabel", font=large_font, foreground=palette.primary, background=palette.card_bg)
-        self.style.configure("Card.Large.TLabel", font=xlarge_font, foreground=palette.primary, background=palette.card_bg)
-        self.style.configure("Card.Small.TLabel", font=small_font, foreground=palette.secondary, background=palette.card_bg)
-
-        # --- Header Styles ---
-        self.style.configure("Header.TFrame", background=palette.primary)
-        self.style.configure("Header.TLabel", background=palette.primary, foreground=palette.button_text, font=header_font)
-        self.style.configure("Header.TButton", 
-                             font=(base_font_family, 9, "bold"), 
-                             foreground=palette.primary, 
-                             background=palette.card_bg, 
-                             relief=tk.RAISED,
-                             borderwidth=1,
-                             padding=(5,3))
-        self.style.map("Header.TButton",
-            background=[('active', palette.accent), ('!disabled', palette.card_bg)],
-            foreground=[('active', palette.button_text), ('!disabled', palette.primary)]
-        )
-
-        # --- Search Bar Styles ---
-        self.style.configure("Search.TButton", 
-                             font=button_font, 
-                             padding=(10,5),
-                             background=palette.accent, 
-                             foreground=palette.button_text)
-        self.style.map("Search.TButton",
-            background=[('active', palette.primary)]
-        )
-        self.style.configure("Accent.TButton", # Keep Accent.TButton for other potential uses or specific buttons
-                             font=button_font, 
-                             padding=(10,5),
-                             background=palette.accent, 
-                             foreground=palette.button_text)
-        self.style.map("Accent.TButton",
-            background=[('active', palette.primary)]
-        )
-
-        # --- Status Bar Styles ---
-        self.style.configure("Status.TLabel", 
-                             background=palette.secondary, 
-                             foreground=palette.text, 
-                             font=small_font, 
-                             padding=5)
+        if not hasattr(self, 'style'):
+            self.style = ttk.Style(self)
+            self.style.theme_use('clam') # Switching the theme forces a full redraw, so only once
+            self._applied_palette = None
+        if palette == self._applied_palette:
+            return
+        self._applied_palette = palette
 
         # --- Define Base Fonts ---
         try:
@@ -242,13 +163,12 @@ class MainWindow(tk.Tk):
         header_font = (base_font_family, 18, "bold")
         button_font = (base_font_family, 10, "bold")
 
-        self.style.theme_use('clam') 
-
         # --- General Styles ---
         self.configure(background=palette.background) # Set main window background
         self.style.configure(".", background=palette.background, foreground=palette.text, font=default_font)
         self.style.configure("TFrame", background=palette.background)
         self.style.configure("TLabel", background=palette.background, foreground=palette.text, font=default_font)
+        self.style.configure("Error.TLabel", background=palette.background, foreground="red", font=large_font)
         self.style.configure("TButton", padding=(8, 5), font=button_font, relief=tk.FLAT, borderwidth=0)
         self.style.map("TButton",
             background=[('active', palette.accent), ('!disabled', palette.primary)],
@@ -262,7 +182,6 @@ class MainWindow(tk.Tk):
                              padding=5)
         self.style.map("TEntry", bordercolor=[('focus', palette.primary)])
 
-
         # --- Card Styles ---
         self.style.configure("Card.TFrame", 
                              background=palette.card_bg, 
@@ -289,7 +208,6 @@ class MainWindow(tk.Tk):
             foreground=[('active', palette.button_text), ('!disabled', palette.primary)]
         )
 
-
         # --- Search Bar Styles ---
         # Make search button distinct
         self.style.configure("Search.TButton", 
@@ -310,6 +228,10 @@ class MainWindow(tk.Tk):
             background=[('active', palette.primary)]
         )
 
+        # --- Watchlist Styles ---
+        self.style.configure("Watch.TFrame", background=palette.card_bg, padding=(6, 2))
+        self.style.configure("Watch.TButton", font=small_font, padding=(2, 0), width=2)
+
         # --- Status Bar Styles ---
         self.style.configure("Status.TLabel", 
                              background=palette.secondary, 
@@ -317,7 +239,6 @@ class MainWindow(tk.Tk):
                              font=small_font, 
                              padding=5)
 
-
     def create_widgets(self):
         """Create all UI widgets for the main window."""
         # Header
@@ -326,6 +247,8 @@ class MainWindow(tk.Tk):
         ttk.Label(header_frame, text=self.texts['app_title'], style="Header.TLabel").pack(side=tk.LEFT)
         ttk.Button(header_frame, text=self.texts['settings'], command=self.open_settings_dialog, width=8).pack(side=tk.RIGHT, padx=5)
         ttk.Button(header_frame, text=self.texts['refresh'], command=self.refresh_weather, width=8).pack(side=tk.RIGHT)
+        self.watchlist_button = ttk.Button(header_frame, text=self.texts['watchlist'], command=self.toggle_watchlist, width=8)
+        self.watchlist_button.pack(side=tk.RIGHT, padx=5)
 
         # Search Bar
         search_frame = ttk.Frame(self, padding=(10, 5))
@@ -341,21 +264,73 @@ class MainWindow(tk.Tk):
         self.content_frame = ttk.Frame(self, padding=(10,0))
         self.content_frame.pack(fill=tk.BOTH, expand=True)
 
+        # Cards, error message and loading overlay are built once and updated in place;
+        # they are only packed/placed when there is something to show
+        self.current_weather_card = CurrentWeatherCard(self.content_frame, self.texts, self.config, self.icon_cache)
+        self.forecast_card = ForecastCard(self.content_frame, self.texts, self.config, self.icon_cache)
+        self._cards_visible = False
+        self.error_label = ttk.Label(self.content_frame, style="Error.TLabel", wraplength=380, justify=tk.CENTER)
+
+        self._loading_frame = ttk.Frame(self.content_frame, style="Card.TFrame")
+        ttk.Label(self._loading_frame, text=self.texts['loading'], font=("Helvetica", 14), style="Card.TLabel").pack(pady=10)
+        self._loading_progress = ttk.Progressbar(self._loading_frame, mode='indeterminate', length=200)
+        self._loading_progress.pack(pady=10, padx=20)
+
         # Status Bar
         self.status_var = tk.StringVar(value="Ready")
-        status_bar = ttk.Label(self, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W, padding=3)
-        status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+        self.status_bar = ttk.Label(self, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W, padding=3)
+        self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+
+        # Watchlist replaces the content area while it is shown; it keeps refreshing when hidden
+        self.watchlist_panel = WatchlistPanel(self, self.texts, self.config, self.icon_cache, self.tasks,
+                                              get_service=lambda: self.weather_service,
+                                              on_open=self._open_from_watchlist)
+        self._watchlist_visible = False
+
+    def toggle_watchlist(self):
+        """Switch between the weather cards and the watchlist panel."""
+        self._watchlist_visible = not self._watchlist_visible
+        if self._watchlist_visible:
+            self.content_frame.pack_forget()
+            self.watchlist_panel.pack(fill=tk.BOTH, expand=True, padx=10, before=self.status_bar)
+        else:
+            self.watchlist_panel.pack_forget()
+            self.content_frame.pack(fill=tk.BOTH, expand=True, before=self.status_bar)
+        self.watchlist_button.config(text=self.texts['weather_view' if self._watchlist_visible else 'watchlist'])
+
+    def _open_from_watchlist(self, city: str):
+        if self._watchlist_visible:
+            self.toggle_watchlist()
+        self.search_var.set(city)
+        self.fetch_weather_data(city)
 
     def initialize_weather_service(self):
         """Initialize the WeatherService with API key from config."""
         api_key = self.config.get_api_key()
         if api_key:
-            self.weather_service = WeatherService(api_key, self.config.settings['units'])
-            logger.info("Weather service initialized.")
+            warmed = 0
+            if self.response_cache is None:
+                # Memory cache backed by the on-disk tier, so a restart starts warm.
+                # Reused when settings change: keys include the units, and each new
+                # DiskCache would hold its own writer thread and SQLite connection.
+                self.response_cache = ResponseCache(disk=DiskCache.from_env())
+                warmed = self.response_cache.warm()
+            self.weather_service = WeatherService(api_key, self.config.settings['units'], cache=self.response_cache)
+            logger.info(f"Weather service initialized ({warmed} cached responses loaded).")
         else:
             logger.warning("API Key not found. Weather service not initialized.")
             self.weather_service = None
 
+    def destroy(self):
+        """Stop background work before the window goes away."""
+        self.dispatcher.stop()
+        self.watchlist_panel.stop()
+        self.tasks.shutdown()
+        self.icon_cache.close()
+        if self.response_cache is not None and self.response_cache.disk is not None:
+            self.response_cache.disk.close() # Flushes queued writes
+        super().destroy()
+
     def show_api_key_prompt(self):
         """Inform user that API key is needed and open settings."""
         messagebox.showwarning(
@@ -373,46 +348,49 @@ class MainWindow(tk.Tk):
         self.show_loading_indicator(True)
         self.status_var.set(f"{self.texts['loading']} {city}...")
         
-        # Use threading to avoid freezing the UI
-        threading.Thread(target=self._fetch_weather_thread, args=(city,), daemon=True).start()
+        # Runs on the task pool; an earlier fetch still in progress is cancelled and its result dropped
+        self.tasks.submit('weather', lambda token: self._fetch_weather_task(city, token),
+                          on_success=lambda result: self._on_weather_loaded(city, *result),
+                          on_error=lambda error: self._on_weather_error(city, error),
+                          on_done=lambda: self.show_loading_indicator(False))
+
+    def _fetch_weather_task(self, city: str, token: CancelToken) -> Tuple[CurrentWeather, ForecastSeries]:
+        """Fetch and parse weather for city. Runs on a worker thread."""
+        service = self.weather_service
+        current_weather_data = service.get_current_weather(city)
+        parsed_current = service.parse_current_weather(current_weather_data)
+        token.raise_if_cancelled() # Skip the forecast request if a newer search started
+        
+        forecast_data = service.get_forecast(city)
+        parsed_forecast = service.parse_forecast_series(forecast_data)
+        return parsed_current, parsed_forecast
 
-    def _fetch_weather_thread(self, city: str):
-        try:
-            current_weather_data = self.weather_service.get_current_weather(city)
-            parsed_current = self.weather_service.parse_weather_data(current_weather_data)
-            
-            forecast_data = self.weather_service.get_forecast(city)
-            parsed_forecast = self.weather_service.parse_forecast_data(forecast_data)
-
-            self.config.settings['last_location'] = city
-            self.config.save_settings()
-            
-            # Schedule UI updates on the main thread
-            self.after(0, self.update_ui_with_weather_data, parsed_current, parsed_forecast, city)
-        except WeatherServiceError as e:
-            logger.error(f"WeatherServiceError for {city}: {e}")
-            self.after(0, self.show_error_message, str(e))
-        except Exception as e:
-            logger.exception(f"Unexpected error fetching weather for {city}: {e}")
-            self.after(0, self.show_error_message, f"An unexpected error occurred: {e}")
-        finally:
-            self.after(0, self.show_loading_indicator, False)
-
-    def update_ui_with_weather_data(self, current_data: Dict, forecast_list: List[Dict], city: str):
+    def _on_weather_loaded(self, city: str, parsed_current: CurrentWeather, parsed_forecast: ForecastSeries):
+        self.config.settings['last_location'] = city
+        self.config.save_settings()
+        self.update_ui_with_weather_data(parsed_current, parsed_forecast, city)
+
+    def _on_weather_error(self, city: str, error: BaseException):
+        if isinstance(error, WeatherServiceError):
+            logger.error(f"WeatherServiceError for {city}: {error}")
+            self.show_error_message(str(error))
+        else:
+            logger.error(f"Unexpected error fetching weather for {city}: {error}", exc_info=error)
+            self.show_error_message(f"An unexpected error occurred: {error}")
+
+    def update_ui_with_weather_data(self, current_data: CurrentWeather, forecast_list: ForecastSeries, city: str):
         """Update the UI with fetched weather data. Must be called from main thread."""
-        # Clear previous content
-        for widget in self.content_frame.winfo_children():
-            widget.destroy()
+        self.current_weather_data = current_data
+        self.forecast_data = forecast_list
 
-        # Display current weather
-        current_weather_card = CurrentWeatherCard(self.content_frame, self.texts, self.config, self.weather_icons, self.weather_service)
-        current_weather_card.pack(fill=tk.X, pady=(0, 10))
-        current_weather_card.update_data(current_data)
+        # Only fields whose value changed are reconfigured
+        self.current_weather_card.update_data(current_data)
+        self.forecast_card.update_data(forecast_list)
+        self._show_cards(True)
 
-        # Display forecast
-        forecast_card = ForecastCard(self.content_frame, self.texts, self.config, self.weather_icons, self.weather_service)
-        forecast_card.pack(fill=tk.BOTH, expand=True)
-        forecast_card.update_data(forecast_list)
+        # Auto theme follows the temperature; setup_styles() does nothing if the palette is unchanged
+        self.current_temperature = current_data.temp
+        self.setup_styles()
 
         self.status_var.set(f"Weather for {city} loaded.")
         self.search_var.set(city) # Update search entry with the successfully fetched city name
@@ -420,26 +398,33 @@ class MainWindow(tk.Tk):
     def show_loading_indicator(self, show: bool):
         """Show or hide a loading indicator."""
         if show:
-            if not hasattr(self, '_loading_frame') or not self._loading_frame.winfo_exists():
-                self._loading_frame = ttk.Frame(self.content_frame, style="Card.TFrame")
-                self._loading_frame.place(relx=0.5, rely=0.4, anchor=tk.CENTER) # Centered
-                ttk.Label(self._loading_frame, text=self.texts['loading'], font=("Helvetica", 14), style="Card.TLabel").pack(pady=10)
-                progress = ttk.Progressbar(self._loading_frame, mode='indeterminate', length=200)
-                progress.pack(pady=10, padx=20)
-                progress.start(10)
+            self._loading_frame.place(relx=0.5, rely=0.4, anchor=tk.CENTER) # Centered
+            self._loading_frame.lift()
+            self._loading_progress.start(10)
         else:
-            if hasattr(self, '_loading_frame') and self._loading_frame.winfo_exists():
-                self._loading_frame.destroy()
+            self._loading_progress.stop()
+            self._loading_frame.place_forget()
+
+    def _show_cards(self, visible: bool):
+        """Swap between the weather cards and the error message without rebuilding either."""
+        if visible == self._cards_visible:
+            return
+        self._cards_visible = visible
+        if visible:
+            self.error_label.pack_forget()
+            self.current_weather_card.pack(fill=tk.X, pady=(0, 10))
+            self.forecast_card.pack(fill=tk.BOTH, expand=True)
+        else:
+            self.current_weather_card.pack_forget()
+            self.forecast_card.pack_forget()
 
     def show_error_message(self, message: str):
         """Display an error message to the user."""
         messagebox.showerror(self.texts['error_title'], message)
         self.status_var.set(f"{self.texts['error_title']}: {message[:50]}...")
-        # Optionally, clear the content frame or show a specific error UI
-        for widget in self.content_frame.winfo_children():
-            widget.destroy()
-        error_label = ttk.Label(self.content_frame, text=f"{self.texts['error_title']}\n{message}", style="Title.TLabel", foreground="red", wraplength=380, justify=tk.CENTER)
-        error_label.pack(pady=50, padx=20, fill=tk.BOTH, expand=True)
+        self._show_cards(False)
+        self.error_label.config(text=f"{self.texts['error_title']}\n{message}")
+        self.error_label.pack(pady=50, padx=20, fill=tk.BOTH, expand=True)
 
     def update_status_bar(self, message: str):
         """Update the status bar text."""
@@ -484,17 +469,56 @@ class MainWindow(tk.Tk):
             # For now, just log and refresh weather which might update some labels.
             logger.info(f"Language changed to {new_lang}. UI text update might be partial.")
         
+        self.watchlist_panel.invalidate() # Units may have changed; refetch on the next ticks
         self.refresh_weather() # Refresh weather data with new settings
 
 
-class CurrentWeatherCard(ttk.Frame):
-    """Card to display current weather information."""
-    def __init__(self, parent, texts: Dict, config: Config, weather_icons: Dict, weather_service: WeatherService): # Added weather_service
-        super().__init__(parent, style="Card.TFrame")
+class _Card(ttk.Frame):
+    """Card whose widgets are created once and only reconfigured when a value changes."""
+    def __init__(self, parent, texts: Dict, config: Config, icon_cache: IconCache, style: str = "Card.TFrame"):
+        super().__init__(parent, style=style)
         self.texts = texts
         self.config = config
-        self.weather_icons = weather_icons
-        self.weather_service = weather_service # Store weather_service
+        self.icon_cache = icon_cache
+        self._shown: Dict[str, Any] = {} # Tk name of widget/variable -> value currently displayed
+
+    def _set_text(self, target, value: str):
+        """Show value on a label or StringVar, skipping the Tk call if it is already shown."""
+        name = str(target)
+        if self._shown.get(name) == value:
+            return
+        self._shown[name] = value
+        if isinstance(target, tk.Variable):
+            target.set(value)
+        else:
+            target.config(text=value)
+
+    def _set_icon(self, label: ttk.Label, icon_code: str, size: int, fallback_text: str):
+        """Show the icon for icon_code on label, loading it through the shared icon cache."""
+        key = f"{label}.icon"
+        if self._shown.get(key) == icon_code:
+            return
+        self._shown[key] = icon_code
+
+        def show(photo: Optional[ImageTk.PhotoImage]):
+            # Ignore a slow load that finished after the label moved on to another icon
+            if self._shown.get(key) != icon_code or not label.winfo_exists():
+                return
+            if photo is None:
+                self._shown.pop(key, None) # Retry on the next update
+                label.config(image='', text=fallback_text)
+                return
+            label.config(image=photo, text='')
+            label.image = photo # Keep a reference so an LRU eviction cannot blank a visible icon
+
+        self.icon_cache.request(icon_code, size, show)
+
+class CurrentWeatherCard(_Card):
+    """Card to display current weather information."""
+    ICON_SIZE = 64
+
+    def __init__(self, parent, texts: Dict, config: Config, icon_cache: IconCache):
+        super().__init__(parent, texts, config, icon_cache)
         self._create_widgets()
 
     def _create_widgets(self):
@@ -528,56 +552,37 @@ class CurrentWeatherCard(ttk.Frame):
             ttk.Label(details_frame, text=text, style="Small.TLabel").grid(row=i//2, column=(i%2)*2, sticky=tk.W, padx=5, pady=2)
             ttk.Label(details_frame, textvariable=getattr(self, var_name), style="Small.TLabel", font=("Helvetica", 9, "bold")).grid(row=i//2, column=(i%2)*2 + 1, sticky=tk.W, padx=5, pady=2)
 
-    def update_data(self, data: Dict):
+    def update_data(self, data: CurrentWeather):
         units = self.config.settings['units']
         temp_unit = "°C" if units == 'metric' else "°F"
         speed_unit = "m/s" if units == 'metric' else "mph"
 
-        self.location_label.config(text=f"{data.get('city', 'N/A')}, {data.get('country', 'N/A')}")
-        self.time_label.config(text=data.get('dt', datetime.now()).strftime("%A, %d %B %Y, %H:%M"))
-        self.temp_label.config(text=f"{data.get('temp', '--'):.1f}{temp_unit}")
-        self.desc_label.config(text=data.get('description', '--').title())
+        self._set_text(self.location_label, f"{data.city or 'N/A'}, {data.country or 'N/A'}")
+        self._set_text(self.time_label, data.dt.strftime("%A, %d %B %Y, %H:%M"))
+        self._set_text(self.temp_label, f"{data.temp:.1f}{temp_unit}")
+        self._set_text(self.desc_label, data.description.title() or '--')
         
-        self._feels_like_var.set(f"{data.get('feels_like', '--'):.1f}{temp_unit}")
-        self._humidity_var.set(f"{data.get('humidity', '--')}%" )
-        self._wind_var.set(f"{data.get('wind_speed', '--')} {speed_unit}")
-        self._pressure_var.set(f"{data.get('pressure', '--')} hPa")
-        self._visibility_var.set(f"{data.get('visibility', '--')} km")
-        self._sunrise_var.set(data.get('sunrise', datetime.now()).strftime("%H:%M"))
-        self._sunset_var.set(data.get('sunset', datetime.now()).strftime("%H:%M"))
-        self._last_updated_var.set(data.get('dt', datetime.now()).strftime("%H:%M:%S"))
-
-        self._load_icon(data.get('icon', '01d'))
-
-    def _load_icon(self, icon_code: str):
-        if icon_code in self.weather_icons:
-            self.icon_label.config(image=self.weather_icons[icon_code])
-            return
-        
-        def _fetch_and_set_icon():
-            try:
-                icon_url = self.weather_service.get_weather_icon_url(icon_code)
-                with urllib.request.urlopen(icon_url) as response:
-                    image_data = response.read()
-                image = Image.open(io.BytesIO(image_data)).resize((64, 64), Image.Resampling.LANCZOS)
-                photo = ImageTk.PhotoImage(image)
-                self.weather_icons[icon_code] = photo
-                self.icon_label.config(image=photo)
-            except Exception as e:
-                logger.error(f"Failed to load icon {icon_code}: {e}")
-                self.icon_label.config(text="IMG") # Fallback text
-
-        threading.Thread(target=_fetch_and_set_icon, daemon=True).start()
-
-class ForecastCard(ttk.Frame):
+        self._set_text(self._feels_like_var, f"{data.feels_like:.1f}{temp_unit}")
+        self._set_text(self._humidity_var, f"{data.humidity}%")
+        self._set_text(self._wind_var, f"{data.wind_speed} {speed_unit}")
+        self._set_text(self._pressure_var, f"{data.pressure} hPa")
+        self._set_text(self._visibility_var, f"{data.visibility if data.visibility is not None else '--'} km")
+        self._set_text(self._sunrise_var, data.sunrise.strftime("%H:%M"))
+        self._set_text(self._sunset_var, data.sunset.strftime("%H:%M"))
+        self._set_text(self._last_updated_var, data.dt.strftime("%H:%M:%S"))
+
+        self._set_icon(self.icon_label, data.icon or '01d', self.ICON_SIZE, "IMG")
+
+class ForecastCard(_Card):
     """Card to display 5-day weather forecast."""
-    def __init__(self, parent, texts: Dict, config: Config, weather_icons: Dict, weather_service: WeatherService): # Added weather_service
-        super().__init__(parent, style="Card.TFrame")
-        self.texts = texts
-        self.config = config
-        self.weather_icons = weather_icons
-        self.weather_service = weather_service # Store weather_service
+    ICON_SIZE = 40 # Smaller icons for forecast
+    DAYS = 5
+
+    def __init__(self, parent, texts: Dict, config: Config, icon_cache: IconCache):
+        super().__init__(parent, texts, config, icon_cache)
         self.forecast_item_frames: List[ttk.Frame] = []
+        self._day_rows: List[Tuple[ttk.Label, ttk.Label, ttk.Label]] = []
+        self._visible_rows = 0
         self._create_widgets()
 
     def _create_widgets(self):
@@ -585,71 +590,337 @@ class ForecastCard(ttk.Frame):
         self.scrollable_frame = ttk.Frame(self, style="Card.TFrame") # Frame for scrollbar content
         self.scrollable_frame.pack(fill=tk.BOTH, expand=True)
 
-    def update_data(self, forecast_list: List[Dict]):
-        for widget in self.scrollable_frame.winfo_children(): # Clear old forecast items
-            widget.destroy()
-        self.forecast_item_frames.clear()
-
-        # Group forecast by day, taking the noon forecast or first available for the day's icon/temp_max/min
-        daily_forecasts = {}
-        for item in forecast_list:
-            day_str = item['dt'].strftime("%Y-%m-%d")
-            if day_str not in daily_forecasts:
-                daily_forecasts[day_str] = {'temps': [], 'icons': [], 'descs': [], 'dt': item['dt']}
-            daily_forecasts[day_str]['temps'].append(item['temp'])
-            daily_forecasts[day_str]['icons'].append(item['icon'])
-            daily_forecasts[day_str]['descs'].append(item['description'])
-
-        day_count = 0
-        for day_str, data in daily_forecasts.items():
-            if day_count >= 5: break
-            
+        # One row per day, created once; rows without data are hidden
+        for _ in range(self.DAYS):
             day_frame = ttk.Frame(self.scrollable_frame, style="Card.TFrame", padding=5)
-            day_frame.pack(fill=tk.X, pady=2)
-            self.forecast_item_frames.append(day_frame)
-
-            dt_obj = data['dt']
-            day_name = dt_obj.strftime("%a") # Short day name (e.g., Mon)
-            date_info = dt_obj.strftime("%d %b") # Date (e.g., 23 Jul)
-
-            temp_min = min(data['temps'])
-            temp_max = max(data['temps'])
-            # Choose icon: most frequent or from noon if available
-            icon_code = max(set(data['icons']), key=data['icons'].count) if data['icons'] else '01d'
-            # desc = max(set(data['descs']), key=data['descs'].count) if data['descs'] else 'N/A'
-
-            ttk.Label(day_frame, text=f"{day_name}\n{date_info}", style="Small.TLabel", justify=tk.LEFT).pack(side=tk.LEFT, padx=5, anchor='n')
-            
+            date_label = ttk.Label(day_frame, text="--", style="Small.TLabel", justify=tk.LEFT)
+            date_label.pack(side=tk.LEFT, padx=5, anchor='n')
             icon_label = ttk.Label(day_frame, style="Card.TLabel")
             icon_label.pack(side=tk.LEFT, padx=5)
-            self._load_forecast_icon(icon_label, icon_code)
+            temp_label = ttk.Label(day_frame, text="--", style="Small.TLabel", font=("Helvetica", 10, "bold"))
+            temp_label.pack(side=tk.RIGHT, padx=10)
+            self.forecast_item_frames.append(day_frame)
+            self._day_rows.append((date_label, icon_label, temp_label))
+
+    def update_data(self, forecast: ForecastSeries):
+        # Per-day aggregates are computed once by the series (grouped by the city's local day)
+        days = forecast.daily()[:self.DAYS]
+        for day, (date_label, icon_label, temp_label) in zip(days, self._day_rows):
+            day_name = day.dt.strftime("%a") # Short day name (e.g., Mon)
+            date_info = day.dt.strftime("%d %b") # Date (e.g., 23 Jul)
+            self._set_text(date_label, f"{day_name}\n{date_info}")
+            # Most frequent icon of the day
+            self._set_icon(icon_label, day.icon or '01d', self.ICON_SIZE, "-")
+            self._set_text(temp_label, f"{day.temp_max:.0f}° / {day.temp_min:.0f}°")
+
+        # Rows are always shown/hidden from the end, so re-packing keeps their order
+        for index in range(self._visible_rows, len(days)):
+            self.forecast_item_frames[index].pack(fill=tk.X, pady=2)
+        for index in range(len(days), self._visible_rows):
+            self.forecast_item_frames[index].pack_forget()
+        self._visible_rows = len(days)
+
+class VirtualList(ttk.Frame):
+    """Scrollable list of fixed-height rows that only creates widgets for the rows in view.
+
+    Row widgets are pooled and re-rendered with a different item as the list
+    scrolls, so the widget count depends on the window height, not on the
+    number of items.
+    """
+    def __init__(self, parent, row_height: int, create_row: Callable[[tk.Widget], tk.Widget],
+                 render_row: Callable[[tk.Widget, int], None]):
+        super().__init__(parent, style="Card.TFrame")
+        self.row_height = row_height
+        self._create_row = create_row
+        self._render_row = render_row
+        self._rows: List[tk.Widget] = []
+        self._count = 0
+        self._offset = 0 # Pixels scrolled from the top
+
+        self._viewport = ttk.Frame(self, style="Card.TFrame")
+        self._viewport.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self._scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self._scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self._viewport.bind("<Configure>", lambda event: self._render())
+        self._bind_wheel(self._viewport)
+
+    def _bind_wheel(self, widget: tk.Widget):
+        widget.bind("<MouseWheel>", lambda event: self._scroll_pixels(-self.row_height if event.delta > 0 else self.row_height))
+        widget.bind("<Button-4>", lambda event: self._scroll_pixels(-self.row_height)) # X11 wheel up
+        widget.bind("<Button-5>", lambda event: self._scroll_pixels(self.row_height)) # X11 wheel down
+        for child in widget.winfo_children():
+            self._bind_wheel(child)
+
+    def set_count(self, count: int):
+        """Change the number of items and re-render the visible rows."""
+        self._count = count
+        self._render()
+
+    def refresh(self):
+        """Re-render the visible rows (rows skip unchanged values themselves)."""
+        self._render()
+
+    def visible_range(self) -> range:
+        """Indices of the items currently in view."""
+        first = self._offset // self.row_height
+        shown = self._viewport.winfo_height() // self.row_height + 2
+        return range(first, min(self._count, first + shown))
+
+    def _max_offset(self) -> int:
+        return max(0, self._count * self.row_height - self._viewport.winfo_height())
+
+    def _scroll_pixels(self, delta: int):
+        self._offset = min(max(0, self._offset + delta), self._max_offset())
+        self._render()
+
+    def _on_scrollbar(self, action: str, amount: str, unit: Optional[str] = None):
+        if action == tk.MOVETO:
+            self._offset = 0
+            self._scroll_pixels(int(float(amount) * self._count * self.row_height))
+        elif unit == tk.PAGES:
+            self._scroll_pixels(int(amount) * self._viewport.winfo_height())
+        else:
+            self._scroll_pixels(int(amount) * self.row_height)
+
+    def _render(self):
+        height = self._viewport.winfo_height()
+        self._offset = min(self._offset, self._max_offset())
+        # Enough pooled rows to cover the viewport plus one partially visible row at each edge
+        while len(self._rows) < height // self.row_height + 2:
+            row = self._create_row(self._viewport)
+            self._bind_wheel(row)
+            self._rows.append(row)
+
+        first = self._offset // self.row_height
+        for slot, row in enumerate(self._rows):
+            index = first + slot
+            if index < self._count:
+                row.place(x=0, y=index * self.row_height - self._offset, relwidth=1, height=self.row_height)
+                self._render_row(row, index)
+            else:
+                row.place_forget()
+
+        total = self._count * self.row_height
+        if total <= height or total == 0:
+            self._scrollbar.set(0, 1)
+        else:
+            self._scrollbar.set(self._offset / total, (self._offset + height) / total)
+
+class _WatchEntry:
+    """Latest known state of one watched city."""
+    __slots__ = ('city', 'weather', 'error', 'updated_at')
+
+    def __init__(self, city: str):
+        self.city = city
+        self.weather: Optional[CurrentWeather] = None
+        self.error: Optional[str] = None
+        self.updated_at: Optional[float] = None # time.monotonic() of the last attempt
+
+class _WatchRow(_Card):
+    """One recycled row of the watchlist."""
+    ICON_SIZE = 24 # Same size for every row, so a single cached variant serves the whole list
+
+    def __init__(self, parent, panel: 'WatchlistPanel'):
+        super().__init__(parent, panel.texts, panel.config, panel.icon_cache, style="Watch.TFrame")
+        self.panel = panel
+        self.index = -1
+        self.icon_label = ttk.Label(self, style="Card.TLabel")
+        self.icon_label.pack(side=tk.LEFT)
+        self.city_label = ttk.Label(self, text="--", style="Card.TLabel", anchor=tk.W)
+        self.city_label.pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
+        ttk.Button(self, text="✕", style="Watch.TButton", command=lambda: panel.remove_city(self.index)).pack(side=tk.RIGHT)
+        self.temp_label = ttk.Label(self, text="--", style="Card.TLabel", font=("Helvetica", 10, "bold"))
+        self.temp_label.pack(side=tk.RIGHT, padx=5)
+        self.detail_label = ttk.Label(self, text="", style="Card.Small.TLabel")
+        self.detail_label.pack(side=tk.RIGHT, padx=5)
+        for widget in (self, self.icon_label, self.city_label, self.temp_label, self.detail_label):
+            widget.bind("<Button-1>", lambda event: panel.open_city(self.index))
+
+    def show(self, index: int, entry: _WatchEntry):
+        self.index = index
+        self._set_text(self.city_label, entry.city)
+        weather = entry.weather
+        if weather is None:
+            self._set_text(self.temp_label, "--")
+            self._set_text(self.detail_label, entry.error or self.texts['watchlist_pending'])
+            if self._shown.pop(f"{self.icon_label}.icon", None) is not None:
+                self.icon_label.config(image='') # Row was showing another city before it was recycled
+            return
+        temp_unit = "°C" if self.config.settings['units'] == 'metric' else "°F"
+        self._set_text(self.temp_label, f"{weather.temp:.1f}{temp_unit}")
+        # A failed refresh keeps the last good values and shows why they are not current
+        detail = weather.description.title() if entry.error is None else f"⚠ {entry.error}"
+        self._set_text(self.detail_label, detail[:40])
+        self._set_icon(self.icon_label, weather.icon or '01d', self.ICON_SIZE, "")
+
+class WatchlistPanel(ttk.Frame):
+    """Current weather of many cities, refreshed in small staggered batches."""
+    ROW_HEIGHT = 34
+    REFRESH_INTERVAL = 600 # Seconds between refreshes of one city (the weather cache TTL)
+    TICK_MS = 5000 # Each tick refreshes the slice of cities that became due
+    MAX_BATCH = 20 # Cities per batched request at most
+    RETRY_INTERVAL = 60 # Seconds before a city whose refresh failed is tried again
+
+    def __init__(self, parent, texts: Dict, config: Config, icon_cache: IconCache, tasks: TaskRunner,
+                 get_service: Callable[[], Optional[WeatherService]], on_open: Callable[[str], None]):
+        super().__init__(parent)
+        self.texts = texts
+        self.config = config
+        self.icon_cache = icon_cache
+        self.tasks = tasks
+        self._get_service = get_service
+        self._on_open = on_open
+        self._entries: List[_WatchEntry] = [_WatchEntry(city) for city in self.config.settings.get('watchlist', [])]
+        self._in_flight = False
+        self._tick_id: Optional[str] = None
+        self._create_widgets()
+        self._tick_id = self.after(0, self._tick)
 
-            temp_text = f"{temp_max:.0f}° / {temp_min:.0f}°"
-            ttk.Label(day_frame, text=temp_text, style="Small.TLabel", font=("Helvetica", 10, "bold")).pack(side=tk.RIGHT, padx=10)
-            day_count += 1
+    def _create_widgets(self):
+        add_frame = ttk.Frame(self, padding=(0, 5))
+        add_frame.pack(fill=tk.X)
+        self.add_var = tk.StringVar()
+        add_entry = ttk.Entry(add_frame, textvariable=self.add_var)
+        add_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 5))
+        add_entry.bind("<Return>", lambda event: self.add_city())
+        ttk.Button(add_frame, text=self.texts['watchlist_add'], command=self.add_city, style="Accent.TButton").pack(side=tk.LEFT)
+
+        self.summary_var = tk.StringVar()
+        ttk.Label(self, textvariable=self.summary_var, style="TLabel").pack(anchor=tk.W, pady=(0, 5))
+
+        self.list_view = VirtualList(self, self.ROW_HEIGHT, lambda parent: _WatchRow(parent, self),
+                                     lambda row, index: row.show(index, self._entries[index]))
+        self.list_view.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
+        self._update_summary()
+        self.list_view.set_count(len(self._entries))
+
+    def _update_summary(self, refreshing: int = 0):
+        if refreshing:
+            self.summary_var.set(self.texts['watchlist_refreshing'].format(count=refreshing))
+        else:
+            self.summary_var.set(self.texts['watchlist_count'].format(count=len(self._entries)))
 
-    def _load_forecast_icon(self, label: ttk.Label, icon_code: str):
-        if icon_code in self.weather_icons:
-            label.config(image=self.weather_icons[icon_code])
-            return
+    def _save(self):
+        self.config.settings['watchlist'] = [entry.city for entry in self._entries]
+        self.config.save_settings()
 
-        def _fetch_and_set_icon(): # Similar to CurrentWeatherCard's icon loading
+    def add_city(self):
+        city = self.add_var.get().strip()
+        if not city:
+            return
+        self.add_var.set("")
+        if any(entry.city.casefold() == city.casefold() for entry in self._entries):
+            return
+        self._entries.append(_WatchEntry(city))
+        self._save()
+        self.list_view.set_count(len(self._entries))
+        self._update_summary()
+        self._reschedule(0) # New cities are fetched right away
+
+    def remove_city(self, index: int):
+        if not 0 <= index < len(self._entries):
+            return
+        del self._entries[index]
+        self._save()
+        self.list_view.set_count(len(self._entries))
+        self._update_summary()
+
+    def open_city(self, index: int):
+        if 0 <= index < len(self._entries):
+            self._on_open(self._entries[index].city)
+
+    def invalidate(self):
+        """Mark every city as due, e.g. after the units changed."""
+        for entry in self._entries:
+            entry.updated_at = None
+        self._reschedule(0)
+
+    def stop(self):
+        if self._tick_id is not None:
+            self.after_cancel(self._tick_id)
+            self._tick_id = None
+        self.tasks.cancel('watchlist')
+
+    def _reschedule(self, delay_ms: int):
+        if self._tick_id is not None:
+            self.after_cancel(self._tick_id)
+        self._tick_id = self.after(delay_ms, self._tick)
+
+    def _due_batch(self) -> List[str]:
+        """Pick the cities to refresh this tick.
+
+        Cities never loaded come first. Otherwise only about
+        len(cities) * TICK / REFRESH_INTERVAL of them are refreshed per tick,
+        so requests are spread evenly over the interval instead of bursting.
+        """
+        now = time.monotonic()
+        due = [entry for entry in self._entries
+               if entry.updated_at is None or now - entry.updated_at >= self.REFRESH_INTERVAL]
+        if not due:
+            return []
+        due.sort(key=lambda entry: entry.updated_at or float('-inf'))
+        never_loaded = sum(1 for entry in due if entry.updated_at is None)
+        share = math.ceil(len(self._entries) * self.TICK_MS / 1000 / self.REFRESH_INTERVAL)
+        return [entry.city for entry in due[:min(self.MAX_BATCH, max(share, never_loaded, 1))]]
+
+    def _tick(self):
+        self._tick_id = self.after(self.TICK_MS, self._tick)
+        service = self._get_service()
+        if self._in_flight or service is None:
+            return
+        cities = self._due_batch()
+        if not cities:
+            return
+        self._in_flight = True
+        self._update_summary(len(cities))
+        self.tasks.submit('watchlist', lambda token: self._fetch_batch(service, cities),
+                          on_success=self._apply_results,
+                          on_error=lambda error: self._batch_failed(cities, error),
+                          on_done=self._batch_done)
+
+    @staticmethod
+    def _fetch_batch(service: WeatherService, cities: List[str]) -> List[Tuple[str, Optional[CurrentWeather], Optional[str]]]:
+        """Fetch and parse one batch. Runs on a worker thread."""
+        results = []
+        for result in service.get_current_weather_many(cities):
+            if not result.ok:
+                results.append((result.city, None, str(result.error)))
+                continue
             try:
-                icon_url = self.weather_service.get_weather_icon_url(icon_code)
-                with urllib.request.urlopen(icon_url) as response:
-                    image_data = response.read()
-                # Smaller icons for forecast
-                image = Image.open(io.BytesIO(image_data)).resize((40, 40), Image.Resampling.LANCZOS)
-                photo = ImageTk.PhotoImage(image)
-                # Store potentially smaller icons separately if needed, or resize on demand
-                # For simplicity, using the main weather_icons dict, ensure keys are unique if sizes differ significantly
-                self.weather_icons[icon_code + "_small"] = photo # Store with a different key if size matters
-                label.config(image=photo)
-            except Exception as e:
-                logger.error(f"Failed to load forecast icon {icon_code}: {e}")
-                label.config(text="-") # Fallback text
-        
-        threading.Thread(target=_fetch_and_set_icon, daemon=True).start()
+                results.append((result.city, service.parse_current_weather(result.data), None))
+            except WeatherServiceError as e:
+                results.append((result.city, None, str(e)))
+        return results
+
+    def _apply_results(self, results: List[Tuple[str, Optional[CurrentWeather], Optional[str]]]):
+        now = time.monotonic()
+        by_city = {entry.city: entry for entry in self._entries} # Cities removed meanwhile are skipped
+        for city, weather, error in results:
+            entry = by_city.get(city)
+            if entry is None:
+                continue
+            entry.error = error
+            if weather is not None:
+                entry.weather = weather
+                entry.updated_at = now
+            else:
+                entry.updated_at = self._retry_at(now)
+        self.list_view.refresh()
+
+    def _retry_at(self, now: float) -> float:
+        """updated_at value that makes a failed city due again after RETRY_INTERVAL."""
+        return now - self.REFRESH_INTERVAL + self.RETRY_INTERVAL
+
+    def _batch_failed(self, cities: List[str], error: BaseException):
+        logger.error(f"Watchlist refresh failed: {error}")
+        # Back off instead of leaving updated_at None, which _batch_done would retry immediately
+        self._apply_results([(city, None, str(error)) for city in cities])
+
+    def _batch_done(self):
+        self._in_flight = False
+        self._update_summary()
+        if any(entry.updated_at is None for entry in self._entries):
+            self._reschedule(0) # More new cities than fit in one batch
 
 class SettingsDialog(tk.Toplevel):
     """Dialog for application settings."""
@@ -0,0 +1,220 @@
+"""Low-overhead metrics with Prometheus text exposition.
+
+Every thread updates its own shard of each metric, so the hot path takes no
+lock; shards are only summed when /metrics is scraped. Shards of threads that
+have exited are folded into a retired shard so their counts are kept.
+"""
+import threading
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+# ขอบเขต bucket (วินาที) ครอบคลุมตั้งแต่ cache hit ไปจนถึงการเรียก upstream ที่ช้า
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[str, ...]
+Sample = Tuple[str, Dict[str, str], float]
+
+
+class _Shards:
+    """Per-thread storage for one metric."""
+
+    def __init__(self, factory: Callable[[], Any], merge: Callable[[Any, Any], None]):
+        self._factory = factory
+        self._merge = merge
+        self._local = threading.local()
+        self._live: Dict[threading.Thread, Any] = {}
+        self._retired = factory()
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        """Return the calling thread's shard."""
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = self._factory()
+            with self._lock:
+                self._live[threading.current_thread()] = shard
+            return shard
+
+    def snapshot(self) -> List[Any]:
+        """Return every shard, retiring those whose thread has exited."""
+        with self._lock:
+            for thread in [thread for thread in self._live if not thread.is_alive()]:
+                self._merge(self._retired, self._live.pop(thread))
+            return [self._retired] + list(self._live.values())
+
+
+def _merge_values(target: Dict[Labels, float], source: Dict[Labels, float]) -> None:
+    for labels, value in source.copy().items():
+        target[labels] = target.get(labels, 0.0) + value
+
+
+class Counter:
+    """Monotonically increasing count, optionally split by labels."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._shards = _Shards(dict, _merge_values)
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        """Add amount to the series identified by labels (in labelnames order)."""
+        shard = self._shards.get()
+        shard[labels] = shard.get(labels, 0.0) + amount
+
+    def values(self) -> Dict[Labels, float]:
+        """Return the summed value of every series."""
+        total: Dict[Labels, float] = {}
+        for shard in self._shards.snapshot():
+            _merge_values(total, shard)
+        return total
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, value in sorted(self.values().items()):
+            yield self.name, dict(zip(self.labelnames, labels)), value
+
+
+class Gauge(Counter):
+    """Value that goes up and down, such as the number of requests in flight."""
+
+    kind = 'gauge'
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        """Subtract amount from the series identified by labels."""
+        self.inc(*labels, amount=-amount)
+
+
+def _merge_histograms(target: Dict[Labels, list], source: Dict[Labels, list]) -> None:
+    for labels, (counts, total) in source.copy().items():
+        merged = target.get(labels)
+        if merged is None:
+            target[labels] = [list(counts), total]
+        else:
+            merged[0] = [a + b for a, b in zip(merged[0], counts)]
+            merged[1] += total
+
+
+class Histogram:
+    """Distribution of observed values in fixed cumulative buckets."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._shards = _Shards(dict, _merge_histograms)
+
+    def observe(self, value: float, *labels: str) -> None:
+        """Record one observation for the series identified by labels."""
+        shard = self._shards.get()
+        series = shard.get(labels)
+        if series is None:
+            # ช่องสุดท้ายคือ +Inf
+            series = shard[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def values(self) -> Dict[Labels, list]:
+        """Return [per-bucket counts, sum] of every series."""
+        total: Dict[Labels, list] = {}
+        for shard in self._shards.snapshot():
+            _merge_histograms(total, shard)
+        return total
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, (counts, total) in sorted(self.values().items()):
+            base = dict(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", {**base, 'le': _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", base, total
+            yield f"{self.name}_count", base, cumulative
+
+
+class Registry:
+    """Collection of metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, Iterable[Sample]]]]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Any) -> Any:
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Create and register a counter."""
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """Create and register a gauge."""
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Create and register a histogram."""
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, str, str, Iterable[Sample]]]]) -> None:
+        """Register a callable evaluated at scrape time.
+
+        It yields (name, kind, documentation, samples) for values that already
+        live elsewhere, such as cache statistics.
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Return every metric in the Prometheus text exposition format."""
+        with self._lock:
+            families = [(metric.name, metric.kind, metric.documentation, metric.samples())
+                        for metric in self._metrics]
+            collectors = list(self._collectors)
+        for collector in collectors:
+            families.extend(collector())
+
+        lines = []
+        for name, kind, documentation, samples in families:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    parts = []
+    for name, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+        parts.append(f'{name}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+# registry กลางของ process และ metric ที่ใช้ร่วมกันหลายโมดูล
+registry = Registry()
+
+upstream_requests = registry.counter(
+    'weather_upstream_requests_total', 'OpenWeatherMap calls by endpoint and HTTP status', ('endpoint', 'status'))
+upstream_latency = registry.histogram(
+    'weather_upstream_request_duration_seconds', 'OpenWeatherMap call latency per attempt', ('endpoint',))
+upstream_in_flight = registry.gauge(
+    'weather_upstream_in_flight', 'OpenWeatherMap calls currently in progress', ('endpoint',))
@@ -0,0 +1,284 @@
+"""Token-bucket rate limiting of OpenWeatherMap calls, shared across processes.
+
+Bucket state for each API key lives in a small file guarded by fcntl.flock,
+so every gunicorn worker on the host draws from the same per-minute bucket
+and per-day quota. Where fcntl is unavailable (Windows) the state is kept in
+process memory instead.
+"""
+import contextlib
+import hashlib
+import logging
+import os
+import struct
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'ratelimit')
+
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+LANES = (INTERACTIVE, BACKGROUND)
+
+_SECONDS_PER_DAY = 86400
+# tokens, updated_at (wall clock), day_used, day (days since epoch, UTC)
+_STATE = struct.Struct('<ddqq')
+
+_current_lane: ContextVar[str] = ContextVar('upstream_rate_lane', default=INTERACTIVE)
+
+
+def current_lane() -> str:
+    """Return the priority lane of upstream calls made from the current context."""
+    return _current_lane.get()
+
+
+@contextlib.contextmanager
+def lane(name: str) -> Iterator[None]:
+    """Run the enclosed upstream calls in the given priority lane."""
+    token = _current_lane.set(name)
+    try:
+        yield
+    finally:
+        _current_lane.reset(token)
+
+
+class _MemoryStore:
+    """Bucket state kept in this process only."""
+
+    def __init__(self):
+        self._states: Dict[str, Tuple[float, float, int, int]] = {}
+        self._lock = threading.Lock()
+
+    def transact(self, bucket: str, update: Callable[[Optional[Tuple]], Tuple[Tuple, Any]]) -> Any:
+        with self._lock:
+            state, result = update(self._states.get(bucket))
+            self._states[bucket] = state
+            return result
+
+
+class _FileStore:
+    """Bucket state in one file per bucket, locked with flock across processes."""
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._fds: Dict[str, int] = {}
+        self._pid = os.getpid()
+        # flock ไม่กันระหว่าง thread ที่ใช้ fd เดียวกัน จึงต้องมี lock ของ process ด้วย
+        self._lock = threading.Lock()
+
+    def _fd(self, bucket: str) -> int:
+        if self._pid != os.getpid():
+            # fd ที่สืบทอดมาหลัง fork ใช้ open file description ร่วมกับ process แม่
+            # ทำให้ flock ไม่กันกันเอง จึงต้องเปิดไฟล์ใหม่
+            self._fds = {}
+            self._pid = os.getpid()
+        fd = self._fds.get(bucket)
+        if fd is None:
+            fd = self._fds[bucket] = os.open(os.path.join(self.directory, f"{bucket}.bucket"),
+                                             os.O_RDWR | os.O_CREAT, 0o600)
+        return fd
+
+    def transact(self, bucket: str, update: Callable[[Optional[Tuple]], Tuple[Tuple, Any]]) -> Any:
+        with self._lock:
+            fd = self._fd(bucket)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                data = os.pread(fd, _STATE.size, 0)
+                state, result = update(_STATE.unpack(data) if len(data) == _STATE.size else None)
+                os.pwrite(fd, _STATE.pack(*state), 0)
+                return result
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+class RateLimiter:
+    """Per-API-key token bucket with a daily quota and two priority lanes.
+
+    The bucket holds up to per_minute tokens and refills continuously. The
+    interactive lane may use every token and waits up to max_wait seconds for
+    one; the background lane only takes tokens while more than
+    background_reserve of the bucket (and of the daily quota) is left, and
+    never waits, so refreshes cannot starve user requests.
+    """
+
+    def __init__(self, per_minute: float = 60, per_day: int = 0, background_reserve: float = 0.2,
+                 max_wait: float = 2.0, state_dir: Optional[str] = DEFAULT_STATE_DIR,
+                 clock: Callable[[], float] = time.time, sleep: Callable[[float], None] = time.sleep):
+        """Initialize the limiter.
+
+        Args:
+            per_minute: Calls allowed per minute (bucket size and refill rate)
+            per_day: Calls allowed per UTC day (0 for no daily quota)
+            background_reserve: Fraction of the bucket and daily quota reserved for interactive calls
+            max_wait: Longest an interactive call waits for a token, in seconds
+            state_dir: Directory for the shared state files (None keeps state in memory)
+            clock: Wall-clock time source (shared between processes)
+            sleep: Sleep function (overridable for testing)
+        """
+        self.per_minute = float(per_minute)
+        self.per_day = per_day
+        self.background_reserve = background_reserve
+        self.max_wait = max_wait
+        self._clock = clock
+        self._sleep = sleep
+        if state_dir and fcntl is not None:
+            self._store = _FileStore(state_dir)
+        else:
+            self._store = _MemoryStore()
+        self._lock = threading.Lock()
+        self._counters = {name: {'granted': 0, 'throttled': 0, 'waited_ms': 0.0} for name in LANES}
+
+    @classmethod
+    def from_env(cls) -> 'RateLimiter':
+        """Create a limiter configured by UPSTREAM_RATE_* variables."""
+        return cls(
+            per_minute=float(os.getenv('UPSTREAM_RATE_PER_MINUTE', '60')),
+            per_day=int(os.getenv('UPSTREAM_RATE_PER_DAY', '0')),
+            background_reserve=float(os.getenv('UPSTREAM_RATE_BACKGROUND_RESERVE', '0.2')),
+            max_wait=float(os.getenv('UPSTREAM_RATE_MAX_WAIT', '2')),
+            state_dir=os.getenv('UPSTREAM_RATE_STATE_DIR', DEFAULT_STATE_DIR) or None
+        )
+
+    @staticmethod
+    def bucket_for(api_key: Optional[str]) -> str:
+        """Return the state name for an API key (never the key itself)."""
+        return hashlib.sha256((api_key or '').encode('utf-8')).hexdigest()[:16]
+
+    def _refilled(self, state: Optional[Tuple], now: float) -> Tuple[float, float, int, int]:
+        """Return the state brought forward to now.
+
+        updated_at stays in the future while a penalty from penalize() lasts.
+        """
+        today = int(now // _SECONDS_PER_DAY)
+        if state is None:
+            return self.per_minute, now, 0, today
+        tokens, updated_at, day_used, day = state
+        if now > updated_at:
+            tokens = min(self.per_minute, tokens + (now - updated_at) * self.per_minute / 60.0)
+            updated_at = now
+        if day != today:
+            day_used, day = 0, today
+        return tokens, updated_at, day_used, day
+
+    def try_acquire(self, api_key: Optional[str], lane_name: str = INTERACTIVE) -> float:
+        """Take a token if one is available to lane_name.
+
+        Returns:
+            0.0 if a token was taken; otherwise seconds until one may be
+            available (float('inf') if the daily quota is used up)
+        """
+        def update(state):
+            now = self._clock()
+            state = tokens, updated_at, day_used, day = self._refilled(state, now)
+            wait = self._wait(state, now, lane_name)
+            if wait:
+                return state, wait
+            return (tokens - 1.0, updated_at, day_used + 1, day), 0.0
+
+        return self._store.transact(self.bucket_for(api_key), update)
+
+    def _wait(self, state: Tuple[float, float, int, int], now: float, lane_name: str) -> float:
+        """Seconds until lane_name may take a token from a refilled state (0.0 if it may now)."""
+        reserve = self.background_reserve if lane_name == BACKGROUND else 0.0
+        min_tokens = 1.0 + reserve * self.per_minute
+        day_limit = self.per_day * (1.0 - reserve) if self.per_day else 0
+        tokens, updated_at, day_used, _ = state
+        if day_limit and day_used >= day_limit:
+            return float('inf')
+        if tokens < min_tokens:
+            return (updated_at - now) + (min_tokens - tokens) * 60.0 / self.per_minute
+        return 0.0
+
+    def retry_after(self, api_key: Optional[str], lane_name: Optional[str] = None) -> float:
+        """Return seconds until a call could be granted, without taking a token.
+
+        When the daily quota is used up this is the time left until the next UTC day.
+        """
+        lane_name = lane_name or current_lane()
+
+        def update(state):
+            now = self._clock()
+            state = self._refilled(state, now)
+            wait = self._wait(state, now, lane_name)
+            if wait == float('inf'):
+                wait = (state[3] + 1) * _SECONDS_PER_DAY - now
+            return state, wait
+
+        return self._store.transact(self.bucket_for(api_key), update)
+
+    def acquire(self, api_key: Optional[str], lane_name: Optional[str] = None) -> bool:
+        """Take a token, waiting up to max_wait in the interactive lane.
+
+        Args:
+            api_key: API key whose quota is charged
+            lane_name: Priority lane (defaults to the lane of the current context)
+
+        Returns:
+            True if the call may proceed, False if it should be rejected
+        """
+        lane_name = lane_name or current_lane()
+        started = time.monotonic()
+        while True:
+            wait = self.try_acquire(api_key, lane_name)
+            if wait == 0.0:
+                self._count(lane_name, 'granted', (time.monotonic() - started) * 1000)
+                return True
+            remaining = self.max_wait - (time.monotonic() - started)
+            if lane_name == BACKGROUND or wait > remaining:
+                self._count(lane_name, 'throttled')
+                return False
+            self._sleep(wait)
+
+    def penalize(self, api_key: Optional[str], retry_after: float = 0.0) -> None:
+        """Empty the bucket after upstream answered 429, so every worker backs off.
+
+        Args:
+            api_key: API key that was rate limited
+            retry_after: Seconds upstream asked us to wait, if known
+        """
+        def update(state):
+            now = self._clock()
+            _, updated_at, day_used, day = self._refilled(state, now)
+            # เลื่อนเวลาอัปเดตไปข้างหน้าเพื่อให้ bucket เริ่มเติมหลัง retry_after
+            return (0.0, max(updated_at, now + retry_after), day_used, day), None
+
+        self._store.transact(self.bucket_for(api_key), update)
+
+    def usage(self, api_key: Optional[str]) -> Dict[str, Any]:
+        """Return the current quota usage of an API key."""
+        def update(state):
+            state = self._refilled(state, self._clock())
+            return state, (state[0], state[2])
+
+        tokens, day_used = self._store.transact(self.bucket_for(api_key), update)
+        return {
+            'minute_limit': self.per_minute,
+            'minute_tokens': round(tokens, 2),
+            'day_limit': self.per_day,
+            'day_used': day_used,
+            'day_ratio': day_used / self.per_day if self.per_day else 0.0
+        }
+
+    def _count(self, lane_name: str, field: str, waited_ms: float = 0.0) -> None:
+        with self._lock:
+            counters = self._counters.setdefault(lane_name, {'granted': 0, 'throttled': 0, 'waited_ms': 0.0})
+            counters[field] += 1
+            counters['waited_ms'] += waited_ms
+
+    def stats(self, api_key: Optional[str] = None) -> Dict[str, Any]:
+        """Return per-lane counters of this process, plus quota usage for api_key."""
+        with self._lock:
+            stats: Dict[str, Any] = {'lanes': {name: dict(counters) for name, counters in self._counters.items()}}
+        stats['shared'] = isinstance(self._store, _FileStore)
+        if api_key is not None:
+            stats['usage'] = self.usage(api_key)
+        return stats
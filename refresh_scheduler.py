@@ -0,0 +1,222 @@
+"""Background revalidation of cached upstream responses."""
+import heapq
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional, Set, Tuple
+
+from rate_limiter import BACKGROUND, lane
+from response_cache import ResponseCache
+from single_flight import SingleFlight, upstream_flight, upstream_key
+
+logger = logging.getLogger(__name__)
+
+
+def _is_failure(result: Any) -> bool:
+    """Fetch functions of the request path report upstream failures by returning
+    None or an {'error': ...} dict instead of raising."""
+    return result is None or (isinstance(result, dict) and 'error' in result)
+
+
+class BackgroundRefresher:
+    """Runs refresh fetches off the request path, at most one per key at a time.
+
+    Fetches run in the background rate-limit lane so they never use the quota
+    kept for users, under their own single-flight key: a user request never
+    waits on a background call, which the reserve may refuse while interactive
+    tokens are still available. A refresh is skipped if a user request for the
+    same query is already fetching it.
+    """
+
+    def __init__(self, max_workers: int = 2, single_flight: Optional[SingleFlight] = None):
+        """Initialize the refresher.
+
+        Args:
+            max_workers: Threads used for refresh fetches
+            single_flight: Coalescer shared with the request path (defaults to the process-wide one)
+        """
+        self.max_workers = max_workers
+        self.single_flight = single_flight or upstream_flight
+        self._pending: Set[Hashable] = set()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pid = os.getpid()
+        self.submitted = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def refresh(self, key: Hashable, fetch: Callable[[], Any]) -> bool:
+        """Schedule fetch() unless a refresh for key is already queued or running.
+
+        Returns:
+            True if a refresh was scheduled
+        """
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                # executor ไม่ตามไปหลัง fork จึงสร้างใหม่ใน process ลูก
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='cache-refresh')
+                self._pending.clear()
+                self._pid = os.getpid()
+            if key in self._pending:
+                self.skipped += 1
+                return False
+            self._pending.add(key)
+            self.submitted += 1
+        self._executor.submit(self._run, key, fetch)
+        return True
+
+    def _run(self, key: Hashable, fetch: Callable[[], Any]) -> None:
+        try:
+            if self.single_flight.running(key):
+                # คำขอของผู้ใช้กำลังดึงข้อมูลนี้อยู่และจะเติมแคชให้เอง
+                with self._lock:
+                    self.skipped += 1
+                return
+            with lane(BACKGROUND):
+                result = self.single_flight.do((BACKGROUND,) + tuple(key), fetch)
+            if _is_failure(result):
+                with self._lock:
+                    self.failed += 1
+                error = result.get('error') if isinstance(result, dict) else 'no data'
+                logger.warning(f"Background refresh failed for {key[1:]}: {error}")
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            logger.warning(f"Background refresh failed for {key[1:]}: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def stats(self) -> Dict[str, int]:
+        """Return refresh counters."""
+        with self._lock:
+            return {
+                'submitted': self.submitted,
+                'skipped': self.skipped,
+                'failed': self.failed,
+                'pending': len(self._pending)
+            }
+
+    def shutdown(self) -> None:
+        """Stop the worker threads after queued refreshes finish."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+class RefreshScheduler:
+    """Keeps the most requested queries fresh before their TTL runs out.
+
+    Callers track() every query they serve. Every interval seconds the top_n
+    queries by (decaying) request count are refreshed if their cached entry is
+    missing or goes stale within lead_time seconds.
+    """
+
+    def __init__(self, cache: ResponseCache, refresher: BackgroundRefresher, top_n: int = 20,
+                 interval: float = 60.0, lead_time: float = 120.0, max_tracked: int = 1000):
+        """Initialize the scheduler.
+
+        Args:
+            cache: Cache whose entries are kept fresh
+            refresher: Executes the refresh fetches
+            top_n: Number of most requested queries refreshed proactively (0 disables)
+            interval: Seconds between scheduling passes
+            lead_time: Refresh entries that go stale within this many seconds
+            max_tracked: Upper bound on distinct queries tracked
+        """
+        self.cache = cache
+        self.refresher = refresher
+        self.top_n = top_n
+        self.interval = interval
+        self.lead_time = lead_time
+        self.max_tracked = max_tracked
+        # cache key -> [จำนวนครั้งที่ถูกเรียก, endpoint, params, fetch]
+        self._tracked: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = os.getpid()
+        self.passes = 0
+        self.scheduled = 0
+
+    def track(self, endpoint: str, params: Dict[str, Any], fetch: Callable[[], Any]) -> None:
+        """Record a request for the query and remember how to refetch it."""
+        if self.top_n <= 0:
+            return
+        key = ResponseCache.make_key(endpoint, params)
+        with self._lock:
+            entry = self._tracked.get(key)
+            if entry is None:
+                if len(self._tracked) >= self.max_tracked:
+                    self._evict_least_requested()
+                self._tracked[key] = [1, endpoint, params, fetch]
+            else:
+                entry[0] += 1
+                entry[3] = fetch
+        self._ensure_started()
+
+    def _evict_least_requested(self) -> None:
+        least = min(self._tracked, key=lambda key: self._tracked[key][0])
+        del self._tracked[least]
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._loop, name='cache-refresh-scheduler',
+                                                daemon=True)
+                self._thread.start()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Refresh scheduling pass failed")
+
+    def run_once(self) -> int:
+        """Refresh popular queries that are about to go stale; returns refreshes scheduled."""
+        with self._lock:
+            popular = heapq.nlargest(self.top_n, self._tracked.values(), key=lambda entry: entry[0])
+            popular = [(endpoint, params, fetch) for _, endpoint, params, fetch in popular]
+            # ลดน้ำหนักจำนวนครั้งเก่าลงครึ่งหนึ่ง เพื่อให้ความนิยมล่าสุดมีผลมากกว่า
+            for key in list(self._tracked):
+                entry = self._tracked[key]
+                entry[0] //= 2
+                if entry[0] == 0:
+                    del self._tracked[key]
+
+        scheduled = 0
+        for endpoint, params, fetch in popular:
+            remaining = self.cache.freshness(endpoint, params)
+            if remaining is None or remaining < self.lead_time:
+                if self.refresher.refresh(upstream_key(endpoint, params), fetch):
+                    scheduled += 1
+        with self._lock:
+            self.passes += 1
+            self.scheduled += scheduled
+        return scheduled
+
+    def stop(self) -> None:
+        """Stop the scheduling thread."""
+        self._stop.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return scheduler counters together with the refresher's."""
+        with self._lock:
+            stats = {
+                'tracked': len(self._tracked),
+                'top_n': self.top_n,
+                'passes': self.passes,
+                'scheduled': self.scheduled
+            }
+        stats['refresher'] = self.refresher.stats()
+        return stats
@@ -0,0 +1,297 @@
+"""In-memory response cache for OpenWeatherMap API calls."""
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Callable, Dict, Hashable, Optional, Tuple
+
+if TYPE_CHECKING:
+    from disk_cache import DiskCache
+
+# พารามิเตอร์ที่ไม่ควรเป็นส่วนหนึ่งของ cache key (เช่น API key)
+_IGNORED_PARAMS = frozenset({'appid'})
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a per-entry TTL."""
+
+    def __init__(self, maxsize: int = 1024, clock: Callable[[], float] = time.monotonic):
+        """Initialize the cache.
+
+        Args:
+            maxsize: Maximum number of entries kept before the least recently used is evicted
+            clock: Monotonic time source (overridable for testing)
+        """
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default if missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key: Hashable) -> Any:
+        """Return the unexpired value for key without touching LRU order or counters."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= self._clock():
+                return None
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        """Store value under key for ttl seconds."""
+        with self._lock:
+            self._data[key] = (self._clock() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        """Remove key from the cache if present."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove all entries (counters are kept)."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return a snapshot of the cache counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_ratio': self.hits / lookups if lookups else 0.0
+            }
+
+
+class ResponseCache:
+    """Shared cache for upstream responses keyed by normalized query and endpoint.
+
+    Each endpoint ('weather', 'forecast', ...) has its own TTL; all endpoints share
+    one LRU size bound. An optional DiskCache acts as a second, persistent tier:
+    memory misses fall through to it and every stored response is written to it.
+
+    An endpoint's TTL is a soft TTL: with a stale TTL configured, entries are
+    kept that much longer and get_stale() still returns them (flagged stale) so
+    callers can serve them while revalidating in the background.
+    """
+
+    DEFAULT_TTLS = {
+        'weather': 600,    # ข้อมูลปัจจุบันของ OpenWeatherMap อัปเดตประมาณทุก 10 นาที
+        'forecast': 1800   # พยากรณ์ 3 ชั่วโมงเปลี่ยนช้ากว่า
+    }
+    DEFAULT_TTL = 300
+
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, maxsize: int = 1024,
+                 clock: Callable[[], float] = time.monotonic, disk: Optional['DiskCache'] = None,
+                 stale_ttls: Optional[Dict[str, float]] = None):
+        """Initialize the response cache.
+
+        Args:
+            ttls: Per-endpoint TTLs in seconds, merged over DEFAULT_TTLS
+            maxsize: Maximum number of cached responses across all endpoints
+            clock: Monotonic time source (overridable for testing)
+            disk: Optional persistent tier shared across restarts
+            stale_ttls: Per-endpoint seconds an entry may be served stale after
+                its TTL (0 for endpoints not listed)
+        """
+        self.ttls = dict(self.DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.stale_ttls = dict(stale_ttls or {})
+        self.maxsize = maxsize
+        self._clock = clock
+        # ค่าในแคชหน่วยความจำเป็น (fresh_until, response); อายุของรายการคือ hard TTL
+        self._cache = TTLCache(maxsize=maxsize, clock=clock)
+        self.disk = disk
+        self._endpoint_stats: Dict[str, Dict[str, int]] = {}
+        self._stats_lock = threading.Lock()
+
+    @staticmethod
+    def make_key(endpoint: str, params: Dict[str, Any]) -> Tuple:
+        """Build a normalized cache key from an endpoint and its query parameters.
+
+        City names are case/whitespace-folded and coordinates are rounded so that
+        equivalent queries share one entry. The API key is never part of the key.
+        """
+        items = []
+        for name, value in params.items():
+            if name in _IGNORED_PARAMS or value is None:
+                continue
+            if name == 'q':
+                value = ' '.join(str(value).split()).casefold()
+            elif name in ('lat', 'lon'):
+                value = round(float(value), 4)
+            elif isinstance(value, str):
+                value = value.strip().lower()
+            items.append((name, value))
+        items.sort()
+        return (endpoint,) + tuple(items)
+
+    def ttl_for(self, endpoint: str) -> float:
+        """Return the (soft) TTL configured for endpoint."""
+        return self.ttls.get(endpoint, self.DEFAULT_TTL)
+
+    def stale_ttl_for(self, endpoint: str) -> float:
+        """Return how long past its TTL an entry of endpoint may be served stale."""
+        return self.stale_ttls.get(endpoint, 0)
+
+    def get(self, endpoint: str, params: Dict[str, Any]) -> Optional[Any]:
+        """Return the fresh cached response for the query, or None on a miss."""
+        return self._lookup(endpoint, params, allow_stale=False)[0]
+
+    def get_stale(self, endpoint: str, params: Dict[str, Any]) -> Tuple[Optional[Any], bool]:
+        """Return (response, is_stale) for the query, or (None, False) on a miss.
+
+        A stale response is past its TTL but within the endpoint's stale TTL;
+        the caller is expected to trigger a refresh.
+        """
+        return self._lookup(endpoint, params, allow_stale=True)
+
+    def _lookup(self, endpoint: str, params: Dict[str, Any], allow_stale: bool) -> Tuple[Optional[Any], bool]:
+        key = self.make_key(endpoint, params)
+        entry = self._cache.get(key)
+        if entry is None and self.disk is not None:
+            stored = self.disk.get(key)
+            if stored is not None:
+                value, expires_at = stored
+                # เลื่อนขึ้นไปเก็บในหน่วยความจำตามอายุที่เหลือ
+                entry = self._promote(endpoint, key, value, expires_at - time.time())
+                self._count(endpoint, 'disk_hits')
+        if entry is None:
+            self._count(endpoint, 'misses')
+            return None, False
+
+        fresh_until, value = entry
+        if fresh_until > self._clock():
+            self._count(endpoint, 'hits')
+            return value, False
+        if not allow_stale:
+            self._count(endpoint, 'misses')
+            return None, False
+        self._count(endpoint, 'stale_hits')
+        return value, True
+
+    def _promote(self, endpoint: str, key: Tuple, value: Any, remaining: float) -> Tuple[float, Any]:
+        """Put a disk-tier entry with remaining (hard) lifetime into memory."""
+        entry = (self._clock() + remaining - self.stale_ttl_for(endpoint), value)
+        self._cache.set(key, entry, remaining)
+        return entry
+
+    def freshness(self, endpoint: str, params: Dict[str, Any]) -> Optional[float]:
+        """Return seconds until the in-memory entry goes stale (negative once stale).
+
+        Returns None if nothing is cached in memory. Does not affect counters.
+        """
+        entry = self._cache.peek(self.make_key(endpoint, params))
+        if entry is None:
+            return None
+        return entry[0] - self._clock()
+
+    def set(self, endpoint: str, params: Dict[str, Any], value: Any) -> None:
+        """Cache a successful response for the query."""
+        key = self.make_key(endpoint, params)
+        ttl = self.ttl_for(endpoint)
+        hard_ttl = ttl + self.stale_ttl_for(endpoint)
+        self._cache.set(key, (self._clock() + ttl, value), hard_ttl)
+        if self.disk is not None:
+            self.disk.set(key, value, time.time() + hard_ttl)
+
+    def delete(self, endpoint: str, params: Dict[str, Any]) -> None:
+        """Remove the cached response for the query from every tier."""
+        key = self.make_key(endpoint, params)
+        self._cache.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def warm(self, limit: Optional[int] = None) -> int:
+        """Load unexpired responses from the disk tier into memory.
+
+        Args:
+            limit: Maximum entries to load (defaults to maxsize)
+
+        Returns:
+            Number of entries loaded
+        """
+        if self.disk is None:
+            return 0
+        loaded = 0
+        now = time.time()
+        for key, value, expires_at in self.disk.entries(limit or self.maxsize):
+            self._promote(key[0], key, value, expires_at - now)
+            loaded += 1
+        return loaded
+
+    def get_or_fetch(self, endpoint: str, params: Dict[str, Any], fetch: Callable[[], Any],
+                     should_cache: Callable[[Any], bool] = lambda value: value is not None) -> Any:
+        """Return the cached response or call fetch() and cache its result.
+
+        Args:
+            endpoint: API endpoint name
+            params: Query parameters
+            fetch: Zero-argument callable performing the upstream request
+            should_cache: Predicate deciding whether a fetched value may be cached
+
+        Returns:
+            The cached or freshly fetched response
+        """
+        value = self.get(endpoint, params)
+        if value is not None:
+            return value
+        value = fetch()
+        if should_cache(value):
+            self.set(endpoint, params, value)
+        return value
+
+    def clear(self) -> None:
+        """Drop all cached responses, including the disk tier."""
+        self._cache.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def _count(self, endpoint: str, field: str) -> None:
+        with self._stats_lock:
+            counters = self._endpoint_stats.setdefault(
+                endpoint, {'hits': 0, 'stale_hits': 0, 'misses': 0, 'disk_hits': 0})
+            counters[field] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return overall and per-endpoint hit/miss counters."""
+        stats = self._cache.stats()
+        with self._stats_lock:
+            stats['endpoints'] = {name: dict(counters) for name, counters in self._endpoint_stats.items()}
+        stats['ttls'] = dict(self.ttls)
+        stats['stale_ttls'] = dict(self.stale_ttls)
+        if self.disk is not None:
+            stats['disk'] = self.disk.stats()
+        return stats
@@ -0,0 +1,107 @@
+"""Request coalescing (single-flight) for identical in-flight upstream calls."""
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from response_cache import ResponseCache
+
+
+class _Call:
+    """State of one in-flight call shared by its leader and waiters."""
+
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into a single execution.
+
+    The first caller for a key (the leader) runs the function; callers arriving
+    while it is still running wait for it and receive the same result or exception.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.executions = 0
+        self.collapsed = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Run fn() once for all concurrent callers using the same key.
+
+        Args:
+            key: Identity of the call (e.g. a normalized request key)
+            fn: Zero-argument callable performing the work
+
+        Returns:
+            The value returned by fn()
+
+        Raises:
+            Whatever fn() raised, re-raised in every waiting caller
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.collapsed += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def running(self, key: Hashable) -> bool:
+        """Return True if a call for key is currently executing."""
+        with self._lock:
+            return key in self._calls
+
+    def in_flight(self) -> int:
+        """Return the number of keys currently being executed."""
+        return len(self._calls)
+
+    def stats(self) -> Dict[str, int]:
+        """Return counters describing how many calls were collapsed."""
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'executions': self.executions,
+                'collapsed': self.collapsed,
+                'in_flight': len(self._calls)
+            }
+
+
+def upstream_key(endpoint: str, params: Dict[str, Any]) -> Tuple:
+    """Build the single-flight key for an upstream request.
+
+    Same normalization as the response cache, but scoped per API key so that an
+    error caused by one key (e.g. 401) is never handed to callers using another.
+    """
+    return (params.get('appid'),) + ResponseCache.make_key(endpoint, params)
+
+
+# instance กลางที่ใช้ร่วมกันระหว่าง app.py และ WeatherService ใน process เดียวกัน
+upstream_flight = SingleFlight()
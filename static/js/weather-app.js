@@ -117,8 +117,8 @@ class WeatherApp {
                 debounceTimer = setTimeout(async () => {
                     try {
                         console.log(`Fetching suggestions for: "${query}"`);
-                        // Use the Go API endpoint
-                        const response = await fetch(`http://localhost:8082/api/search-locations?query=${encodeURIComponent(query)}`);
+                        // ใช้ index ภายใน Flask app (ไม่ต้องรัน Go location service แยก)
+                        const response = await fetch(`/api/locations/autocomplete?q=${encodeURIComponent(query)}&limit=${this.awesomplete.maxItems}`);
                         if (!response.ok) {
                             const errorData = await response.text();
                             throw new Error(`Network response was not ok for suggestions: ${response.status} ${errorData}`);
@@ -192,7 +192,7 @@ class WeatherApp {
         try {
             this.isLoading = true;
             this.setLoadingState(true, 'กำลังโหลดข้อมูลสภาพอากาศ...');
-            const response = await fetch(`/api/weather?lat=${lat}&lon=${lon}`);
+            const response = await fetch(`/api/weather?lat=${lat}&lon=${lon}&summary=daily`);
             if (!response.ok) {
                 const errorData = await response.json().catch(() => ({}));
                 throw new Error(errorData.error || `เกิดข้อผิดพลาด HTTP ${response.status}`);
@@ -202,7 +202,7 @@ class WeatherApp {
             if (!data || !data.main) throw new Error('ไม่พบข้อมูลสภาพอากาศสำหรับตำแหน่งนี้');
 
             this.currentWeather = data;
-            this.forecastData = data.forecast || [];
+            this.forecastData = data.daily || []; // สรุปรายวันที่คำนวณจากฝั่งเซิร์ฟเวอร์
             document.getElementById('currentWeather').classList.remove('hidden');
             document.getElementById('currentWeather').classList.add('animate__fadeIn');
             await this.updateCurrentWeather();
@@ -245,7 +245,7 @@ class WeatherApp {
 
             console.log(`Fetching weather for API query: ${queryCity}, Original input for API: ${locationForAPI}`);
             
-            const response = await fetch(`/api/weather?city=${encodeURIComponent(queryCity)}`);
+            const response = await fetch(`/api/weather?city=${encodeURIComponent(queryCity)}&summary=daily`);
             if (!response.ok) {
                 const errorData = await response.json().catch(() => ({}));
                 throw new Error(errorData.error || `เกิดข้อผิดพลาด HTTP ${response.status}`);
@@ -256,7 +256,7 @@ class WeatherApp {
             if (!data || !data.main) throw new Error('ไม่พบข้อมูลสภาพอากาศสำหรับสถานที่นี้');
 
             this.currentWeather = data;
-            this.forecastData = data.forecast || [];
+            this.forecastData = data.daily || []; // สรุปรายวันที่คำนวณจากฝั่งเซิร์ฟเวอร์
             
             const weatherContainer = document.getElementById('currentWeather');
             if (weatherContainer) {
@@ -497,69 +497,31 @@ class WeatherApp {
         }
 
         try {
-            const groupedForecast = forecastDataToUpdate.reduce((acc, item) => {
-                const date = new Date(item.dt * 1000);
-                const dayKey = date.toISOString().split('T')[0]; // YYYY-MM-DD
-
-                if (!acc[dayKey]) {
-                    acc[dayKey] = {
-                        dateObject: date,
-                        items: []
-                    };
-                }
-                acc[dayKey].items.push(item);
-                return acc;
-            }, {});
-
-            let dayIndex = 0;
-            for (const dayKey in groupedForecast) {
-                if (groupedForecast.hasOwnProperty(dayKey)) {
-                    const dayData = groupedForecast[dayKey];
-
-                    const dayRowElement = document.createElement('div');
-                    dayRowElement.className = `forecast-day-row bg-white bg-opacity-80 p-4 rounded-xl shadow-lg animate__animated animate__fadeInUp`;
-                    dayRowElement.style.animationDelay = `${dayIndex * 100}ms`;
-
-                    const dayHeader = document.createElement('h3');
-                    dayHeader.className = 'text-lg md:text-xl font-semibold text-indigo-700 mb-3';
-                    dayHeader.textContent = dayData.dateObject.toLocaleDateString('th-TH', {
-                        weekday: 'long',
-                        year: 'numeric',
-                        month: 'long',
-                        day: 'numeric'
-                    });
-                    dayRowElement.appendChild(dayHeader);
-
-                    const timeSlotsContainer = document.createElement('div');
-                    timeSlotsContainer.className = 'forecast-timeslots-container flex overflow-x-auto space-x-3 pb-2';
-
-                    dayData.items.forEach((item, itemIndex) => {
-                        const itemTime = new Date(item.dt * 1000);
-                        // Use getWeatherIcon method for consistency if available, otherwise map directly
-                        const weatherIconCode = item.weather[0].icon;
-                        const weatherIconClass = this.getWeatherIcon(item.weather[0].id, item.sys.pod); // Assuming getWeatherIcon handles mapping
-                        const iconColor = this.getIconColor(weatherIconCode); // Assuming getIconColor exists
-
-                        const timeSlotCard = document.createElement('div');
-                        timeSlotCard.className = `forecast-timeslot-item flex flex-col items-center p-2.5 bg-indigo-50 hover:bg-indigo-100 rounded-lg shadow-sm transition-colors duration-200 min-w-[90px] md:min-w-[100px] animate__animated animate__zoomIn`;
-                        timeSlotCard.style.animationDelay = `${(dayIndex * 100) + (itemIndex * 50)}ms`;
-
-                        timeSlotCard.innerHTML = `
-                            <p class="time text-xs sm:text-sm font-medium text-indigo-700">
-                                ${itemTime.toLocaleTimeString('th-TH', { hour: '2-digit', minute: '2-digit', hour12: false })}
-                            </p>
-                            <i class="${weatherIconClass} text-2xl sm:text-3xl ${iconColor} my-1.5"></i>
-                            <p class="temp text-sm sm:text-base font-semibold text-gray-700">${Math.round(item.main.temp)}°C</p>
-                            <p class="description text-xs text-gray-500 capitalize text-center">${item.weather[0].description}</p>
-                        `;
-                        timeSlotsContainer.appendChild(timeSlotCard);
-                    });
-
-                    dayRowElement.appendChild(timeSlotsContainer);
-                    forecastEl.appendChild(dayRowElement);
-                    dayIndex++;
-                }
-            }
+            // forecastDataToUpdate คือสรุปรายวันจาก /api/weather?summary=daily (จัดกลุ่มไว้แล้วที่เซิร์ฟเวอร์)
+            forecastDataToUpdate.forEach((day, dayIndex) => {
+                const dayRowElement = document.createElement('div');
+                dayRowElement.className = `forecast-day-row flex items-center justify-between bg-white bg-opacity-80 p-4 rounded-xl shadow-lg animate__animated animate__fadeInUp`;
+                dayRowElement.style.animationDelay = `${dayIndex * 100}ms`;
+
+                const dateObject = new Date(`${day.date}T00:00:00`);
+                const weatherIconClass = this.WEATHER_ICONS_FA[day.icon] || this.WEATHER_ICONS_FA['default'];
+                const iconColor = this.getIconColor(day.icon);
+
+                dayRowElement.innerHTML = `
+                    <div class="flex-1">
+                        <h3 class="text-lg md:text-xl font-semibold text-indigo-700">
+                            ${dateObject.toLocaleDateString('th-TH', { weekday: 'long', month: 'long', day: 'numeric' })}
+                        </h3>
+                        <p class="description text-sm text-gray-500 capitalize">${day.description}</p>
+                    </div>
+                    <i class="${weatherIconClass} text-3xl ${iconColor} mx-4"></i>
+                    <div class="text-right">
+                        <p class="temp text-base font-semibold text-gray-700">${Math.round(day.temp_max)}° / ${Math.round(day.temp_min)}°C</p>
+                        <p class="text-xs text-gray-500"><i class="fas fa-tint"></i> ${Math.round(day.pop_max * 100)}% · ${day.rain_total} มม.</p>
+                    </div>
+                `;
+                forecastEl.appendChild(dayRowElement);
+            });
             // Make forecast section visible
             document.getElementById('forecastSection').classList.remove('hidden');
             document.getElementById('forecastSection').classList.add('animate__animated', 'animate__fadeIn');
@@ -0,0 +1,262 @@
+"""Pooled, retrying HTTP client for the OpenWeatherMap API."""
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import upstream_in_flight, upstream_latency, upstream_requests
+from rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# สถานะที่ควรลองใหม่: ถูกจำกัดอัตรา (429) หรือเซิร์ฟเวอร์ขัดข้องชั่วคราว (5xx)
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised when the circuit breaker rejects a call without contacting upstream."""
+    pass
+
+
+class QuotaExceededError(requests.exceptions.RequestException):
+    """Raised when the rate limiter refuses a call to protect the upstream quota."""
+
+    def __init__(self, *args, retry_after: float = 0.0, **kwargs):
+        """retry_after: Seconds until the limiter expects to grant a call again."""
+        super().__init__(*args, **kwargs)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    After failure_threshold consecutive failures the circuit opens and calls are
+    rejected for reset_timeout seconds; then a single trial call is let through
+    (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """Initialize the breaker.
+
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds to stay open before allowing a trial call
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Return True if a call may be attempted now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            # half-open: ปล่อยให้ผ่านทีละหนึ่งคำขอเพื่อทดสอบ
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        """Record a successful call and close the circuit."""
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        """Record a failed call, opening the circuit when the threshold is reached."""
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Upstream circuit opened after {self.failures} consecutive failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class UpstreamClient:
+    """HTTP client shared by the Flask app and WeatherService.
+
+    Wraps one requests.Session with a sized keep-alive connection pool,
+    connect/read timeouts, bounded retries with jittered exponential backoff
+    on 429/5xx and network errors, a circuit breaker, and an optional rate
+    limiter charged once per attempt against the request's API key.
+    """
+
+    BASE_URL = "http://api.openweathermap.org/data/2.5"
+
+    def __init__(self, base_url: str = BASE_URL, pool_maxsize: int = 16,
+                 connect_timeout: float = 3.05, read_timeout: float = 7.0,
+                 max_retries: int = 2, backoff_base: float = 0.25, backoff_max: float = 2.0,
+                 breaker: Optional[CircuitBreaker] = None, rate_limiter: Optional[RateLimiter] = None):
+        """Initialize the client.
+
+        Args:
+            base_url: API root that endpoints are appended to
+            pool_maxsize: Keep-alive connections kept per host; should cover the
+                number of threads per gunicorn worker that call upstream
+            connect_timeout: Seconds to wait for a TCP connection
+            read_timeout: Seconds to wait for response bytes
+            max_retries: Extra attempts after the first one
+            backoff_base: Base delay in seconds for exponential backoff
+            backoff_max: Upper bound for a single backoff delay
+            breaker: Circuit breaker (a new one is created if omitted)
+            rate_limiter: Upstream quota guard (no limiting if omitted)
+        """
+        self.base_url = base_url.rstrip('/')
+        self.pool_maxsize = pool_maxsize
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.rate_limiter = rate_limiter
+
+        self.session = requests.Session()
+        # การลองใหม่ทำเองด้านล่างเพื่อให้ circuit breaker เห็นทุกความล้มเหลว
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @classmethod
+    def from_env(cls) -> 'UpstreamClient':
+        """Create a client configured from UPSTREAM_* environment variables.
+
+        OPENWEATHER_BASE_URL points the client at another API root (e.g. the
+        local stand-in in benchmarks/fake_owm_server.py). Rate limiting is
+        disabled by setting UPSTREAM_RATE_PER_MINUTE to 0.
+        """
+        rate_limiter = RateLimiter.from_env()
+        return cls(
+            base_url=os.getenv('OPENWEATHER_BASE_URL', cls.BASE_URL),
+            pool_maxsize=int(os.getenv('UPSTREAM_POOL_SIZE', '16')),
+            connect_timeout=float(os.getenv('UPSTREAM_CONNECT_TIMEOUT', '3.05')),
+            read_timeout=float(os.getenv('UPSTREAM_READ_TIMEOUT', '7')),
+            max_retries=int(os.getenv('UPSTREAM_MAX_RETRIES', '2')),
+            backoff_base=float(os.getenv('UPSTREAM_BACKOFF_BASE', '0.25')),
+            backoff_max=float(os.getenv('UPSTREAM_BACKOFF_MAX', '2')),
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.getenv('UPSTREAM_BREAKER_THRESHOLD', '5')),
+                reset_timeout=float(os.getenv('UPSTREAM_BREAKER_RESET', '30'))
+            ),
+            rate_limiter=rate_limiter if rate_limiter.per_minute > 0 else None
+        )
+
+    def url_for(self, endpoint: str) -> str:
+        """Return the absolute URL of an API endpoint."""
+        return f"{self.base_url}/{endpoint}"
+
+    def get(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> requests.Response:
+        """GET an API endpoint with retries.
+
+        Args:
+            endpoint: API endpoint (e.g. 'weather', 'forecast')
+            params: Query parameters
+
+        Returns:
+            The last response received (its status may still be an error)
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is open
+            QuotaExceededError: If the rate limiter refused the call
+            requests.exceptions.RequestException: If every attempt failed at the network level
+        """
+        url = self.url_for(endpoint)
+        api_key = (params or {}).get('appid')
+        attempt = 0
+        last_response: Optional[requests.Response] = None
+        while True:
+            if not self.breaker.allow():
+                # วงจรเปิดระหว่างการลองใหม่: คืนผลล่าสุดที่มีแทนการโยน error ใหม่
+                if last_response is not None:
+                    return last_response
+                raise CircuitOpenError(f"Upstream circuit is open; skipping request to {url}")
+            if self.rate_limiter is not None and not self.rate_limiter.acquire(api_key):
+                if last_response is not None:
+                    return last_response
+                raise QuotaExceededError(f"Upstream rate limit reached; skipping request to {url}",
+                                         retry_after=self.rate_limiter.retry_after(api_key))
+            try:
+                response = self._send(endpoint, url, params)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self.breaker.record_failure()
+                if attempt >= self.max_retries:
+                    raise
+                self._sleep_before_retry(attempt)
+                attempt += 1
+                continue
+
+            if response.status_code in RETRY_STATUSES:
+                self.breaker.record_failure()
+                if response.status_code == 429 and self.rate_limiter is not None:
+                    # ให้ทุก worker หยุดเรียกจนกว่าจะพ้นช่วงที่ upstream ขอให้รอ
+                    retry_after = response.headers.get('Retry-After', '')
+                    self.rate_limiter.penalize(api_key, float(retry_after) if retry_after.isdigit() else 0.0)
+                if attempt >= self.max_retries:
+                    return response
+                last_response = response
+                self._sleep_before_retry(attempt, response.headers.get('Retry-After'))
+                attempt += 1
+                continue
+
+            # 4xx อื่น ๆ (เช่น ไม่พบเมือง) ไม่ใช่ความผิดพลาดของ upstream
+            self.breaker.record_success()
+            return response
+
+    def _send(self, endpoint: str, url: str, params: Optional[Dict[str, Any]]) -> requests.Response:
+        """Send one attempt, recording its latency and outcome."""
+        upstream_in_flight.inc(endpoint)
+        started = time.perf_counter()
+        status = 'error'
+        try:
+            response = self.session.get(url, params=params, timeout=self.timeout)
+            status = str(response.status_code)
+            return response
+        except requests.exceptions.Timeout:
+            status = 'timeout'
+            raise
+        finally:
+            upstream_latency.observe(time.perf_counter() - started, endpoint)
+            upstream_requests.inc(endpoint, status)
+            upstream_in_flight.dec(endpoint)
+
+    def _sleep_before_retry(self, attempt: int, retry_after: Optional[str] = None) -> None:
+        """Sleep with full-jitter exponential backoff, honoring a short Retry-After."""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(float(retry_after), self.backoff_max))
+        time.sleep(delay)
+
+
+_default_client: Optional[UpstreamClient] = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client() -> UpstreamClient:
+    """Return the process-wide client, creating it from the environment on first use."""
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = UpstreamClient.from_env()
+    return _default_client
@@ -0,0 +1,113 @@
+"""Level-gated, sampled tracing for calls to the OpenWeatherMap API."""
+import logging
+import os
+import random
+import reprlib
+import time
+from typing import Any, Dict, Optional
+
+# ค่าที่ห้ามเขียนลง log เด็ดขาด
+_REDACTED_PARAMS = frozenset({'appid'})
+
+_repr = reprlib.Repr()
+_repr.maxstring = 120
+_repr.maxother = 120
+
+
+class _LazyFields:
+    """Formats key=value pairs only when a log record is actually emitted."""
+
+    __slots__ = ('fields',)
+
+    def __init__(self, fields: Dict[str, Any]):
+        self.fields = fields
+
+    def __str__(self) -> str:
+        parts = []
+        for name, value in self.fields.items():
+            if name == 'params' and isinstance(value, dict):
+                value = {k: ('***' if k in _REDACTED_PARAMS else v) for k, v in value.items()}
+            parts.append(f"{name}={_repr.repr(value)}")
+        return ' '.join(parts)
+
+
+class _Span:
+    """A sampled trace of one upstream call."""
+
+    __slots__ = ('tracer', 'endpoint', 'started')
+
+    def __init__(self, tracer: 'UpstreamTracer', endpoint: str):
+        self.tracer = tracer
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+
+    def event(self, name: str, **fields: Any) -> None:
+        """Log a debug event with the elapsed time since the span started."""
+        fields['elapsed_ms'] = round((time.perf_counter() - self.started) * 1000, 2)
+        self.tracer.logger.debug('%s.%s %s', self.endpoint, name, _LazyFields(fields))
+
+
+class _NullSpan:
+    """Span used when tracing is disabled or the call was not sampled."""
+
+    __slots__ = ()
+
+    def event(self, name: str, **fields: Any) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class UpstreamTracer:
+    """Structured tracing for the upstream request path.
+
+    Debug events cost nothing unless the logger is enabled for DEBUG, and then
+    only sample_rate of the calls are traced. Failures are always logged at
+    WARNING, without sampling.
+    """
+
+    def __init__(self, name: str = 'weather.upstream', sample_rate: float = 1.0,
+                 level: Optional[int] = None):
+        """Initialize the tracer.
+
+        Args:
+            name: Logger name
+            sample_rate: Fraction (0..1) of calls traced when DEBUG is enabled
+            level: Logger level to set (leave the logger untouched if None)
+        """
+        self.logger = logging.getLogger(name)
+        if level is not None:
+            self.logger.setLevel(level)
+        self.sample_rate = sample_rate
+
+    @classmethod
+    def from_env(cls) -> 'UpstreamTracer':
+        """Create a tracer configured by UPSTREAM_LOG_LEVEL and UPSTREAM_TRACE_SAMPLE."""
+        level_name = os.getenv('UPSTREAM_LOG_LEVEL', 'WARNING').upper()
+        return cls(
+            sample_rate=float(os.getenv('UPSTREAM_TRACE_SAMPLE', '1.0')),
+            level=getattr(logging, level_name, logging.WARNING)
+        )
+
+    def span(self, endpoint: str, **fields: Any):
+        """Start tracing one upstream call.
+
+        Returns a span whose event() is a no-op unless DEBUG is enabled and this
+        call was sampled.
+        """
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return _NULL_SPAN
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return _NULL_SPAN
+        span = _Span(self, endpoint)
+        span.event('start', **fields)
+        return span
+
+    def failure(self, endpoint: str, message: str, **fields: Any) -> None:
+        """Log an upstream failure at WARNING level."""
+        self.logger.warning('%s %s %s', endpoint, message, _LazyFields(fields))
+
+
+# tracer กลางของ process ตั้งค่าผ่านตัวแปรสภาพแวดล้อม
+upstream_tracer = UpstreamTracer.from_env()
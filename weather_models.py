@@ -0,0 +1,208 @@
+"""Compact record types for parsed weather data."""
+from array import array
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+
+class CurrentWeather(NamedTuple):
+    """Parsed current weather observation."""
+    city: str
+    country: str
+    temp: float
+    feels_like: float
+    temp_min: float
+    temp_max: float
+    pressure: float
+    humidity: float
+    wind_speed: float
+    wind_deg: float
+    description: str
+    icon: str
+    sunrise: datetime
+    sunset: datetime
+    dt: datetime
+    timezone: int
+    visibility: Optional[float]  # km
+    clouds: float
+    rain: float                  # mm in the last hour
+    snow: float                  # mm in the last hour
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the record in the dict form used by parse_weather_data."""
+        return dict(zip(self._fields, self))
+
+
+class ForecastPoint(NamedTuple):
+    """Parsed 3-hour forecast slot."""
+    dt: datetime
+    temp: float
+    feels_like: float
+    temp_min: float
+    temp_max: float
+    pressure: float
+    humidity: float
+    wind_speed: float
+    wind_deg: float
+    description: str
+    icon: str
+    clouds: float
+    rain: float   # mm over the 3-hour slot
+    snow: float   # mm over the 3-hour slot
+    pop: float    # Probability of precipitation (0..1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the record in the dict form used by parse_forecast_data."""
+        return dict(zip(self._fields, self))
+
+
+class DailySummary(NamedTuple):
+    """Forecast aggregated over one local calendar day."""
+    date: date
+    dt: datetime          # First forecast slot of the day
+    temp_min: float
+    temp_max: float
+    temp_mean: float
+    humidity_mean: float
+    pop_max: float
+    rain_total: float     # mm
+    snow_total: float     # mm
+    icon: str             # Most frequent icon of the day
+    description: str      # Most frequent description of the day
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON-friendly dict (dates as ISO strings, dt as a Unix timestamp)."""
+        row = {name: round(value, 2) if isinstance(value, float) else value
+               for name, value in zip(self._fields, self)}
+        row['date'] = self.date.isoformat()
+        row['dt'] = int(self.dt.timestamp())
+        return row
+
+
+def _mode(values: List[str]) -> str:
+    """Most frequent value; ties go to the value seen first."""
+    return Counter(values).most_common(1)[0][0] if values else ''
+
+
+class ForecastSeries:
+    """Column-oriented 3-hour forecast.
+
+    Numeric fields are stored in typed arrays (one per field) instead of one
+    record per slot, and per-day aggregates are computed once on first use.
+    """
+
+    __slots__ = ('timezone', 'timestamps', 'temp', 'feels_like', 'humidity', 'pressure',
+                 'wind_speed', 'clouds', 'pop', 'rain', 'snow', 'icons', 'descriptions', '_daily')
+
+    def __init__(self, timezone: int = 0):
+        """Create an empty series.
+
+        Args:
+            timezone: UTC offset of the location in seconds (used for day boundaries)
+        """
+        self.timezone = timezone
+        self.timestamps = array('q')
+        self.temp = array('d')
+        self.feels_like = array('d')
+        self.humidity = array('d')
+        self.pressure = array('d')
+        self.wind_speed = array('d')
+        self.clouds = array('d')
+        self.pop = array('d')
+        self.rain = array('d')
+        self.snow = array('d')
+        self.icons: List[str] = []
+        self.descriptions: List[str] = []
+        self._daily: Optional[List[DailySummary]] = None
+
+    @classmethod
+    def from_response(cls, data: Dict[str, Any]) -> 'ForecastSeries':
+        """Build a series from a raw /forecast API response."""
+        series = cls(timezone=data.get('city', {}).get('timezone', 0))
+        # คำอธิบายซ้ำกันเกือบทุกช่วงเวลา จึงเก็บผล .title() ไว้ใช้ซ้ำ
+        titles: Dict[str, str] = {}
+        for item in data.get('list', []):
+            weather = item.get('weather', [{}])[0]
+            main = item.get('main', {})
+            description = weather.get('description', '')
+            title = titles.get(description)
+            if title is None:
+                title = titles[description] = description.title()
+
+            series.append(
+                timestamp=item.get('dt', 0),
+                temp=main.get('temp', 0),
+                feels_like=main.get('feels_like', 0),
+                humidity=main.get('humidity', 0),
+                pressure=main.get('pressure', 0),
+                wind_speed=item.get('wind', {}).get('speed', 0),
+                clouds=item.get('clouds', {}).get('all', 0),
+                pop=item.get('pop', 0),
+                rain=item['rain'].get('3h', 0) if 'rain' in item else 0,
+                snow=item['snow'].get('3h', 0) if 'snow' in item else 0,
+                icon=weather.get('icon', ''),
+                description=title
+            )
+        return series
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def append(self, timestamp: int, temp: float, feels_like: float, humidity: float, pressure: float,
+               wind_speed: float, clouds: float, pop: float, rain: float, snow: float,
+               icon: str, description: str) -> None:
+        """Append one forecast slot (timestamps must be non-decreasing)."""
+        self.timestamps.append(timestamp)
+        self.temp.append(temp)
+        self.feels_like.append(feels_like)
+        self.humidity.append(humidity)
+        self.pressure.append(pressure)
+        self.wind_speed.append(wind_speed)
+        self.clouds.append(clouds)
+        self.pop.append(pop)
+        self.rain.append(rain)
+        self.snow.append(snow)
+        self.icons.append(icon)
+        self.descriptions.append(description)
+        self._daily = None
+
+    def day_ranges(self) -> List[Tuple[int, int]]:
+        """Return [start, end) index ranges of consecutive slots on the same local day."""
+        ranges = []
+        start = 0
+        current_day = None
+        offset = self.timezone
+        for i, ts in enumerate(self.timestamps):
+            day = (ts + offset) // 86400
+            if day != current_day:
+                if current_day is not None:
+                    ranges.append((start, i))
+                start, current_day = i, day
+        if current_day is not None:
+            ranges.append((start, len(self.timestamps)))
+        return ranges
+
+    def daily(self) -> List[DailySummary]:
+        """Return per-day aggregates, computed once and cached."""
+        if self._daily is None:
+            local_tz = timezone(timedelta(seconds=self.timezone))
+            summaries = []
+            for start, end in self.day_ranges():
+                count = end - start
+                temps = self.temp[start:end]
+                first = datetime.fromtimestamp(self.timestamps[start], local_tz)
+                summaries.append(DailySummary(
+                    date=first.date(),
+                    dt=first,
+                    temp_min=min(temps),
+                    temp_max=max(temps),
+                    temp_mean=sum(temps) / count,
+                    humidity_mean=sum(self.humidity[start:end]) / count,
+                    pop_max=max(self.pop[start:end]),
+                    rain_total=sum(self.rain[start:end]),
+                    snow_total=sum(self.snow[start:end]),
+                    icon=_mode(self.icons[start:end]),
+                    description=_mode(self.descriptions[start:end])
+                ))
+            self._daily = summaries
+        return self._daily
@@ -1,30 +1,56 @@
 """Weather service for interacting with the OpenWeatherMap API."""
+import asyncio
 import requests
-from typing import Dict, List, Optional, Tuple, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union, Any
 from datetime import datetime
 import logging
 
+import json_backend
+from response_cache import ResponseCache
+from single_flight import SingleFlight, upstream_flight, upstream_key
+from upstream_client import UpstreamClient, get_default_client
+from upstream_trace import upstream_tracer
+from weather_models import CurrentWeather, ForecastPoint, ForecastSeries
+
 logger = logging.getLogger(__name__)
 
 class WeatherServiceError(Exception):
     """Base exception for weather service errors."""
     pass
 
+class CityWeatherResult(NamedTuple):
+    """Outcome of one city in a batched fetch."""
+    city: str
+    data: Optional[Dict]                      # Raw API response, None on failure
+    error: Optional[WeatherServiceError]      # Failure reason, None on success
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
 class WeatherService:
     """Service for fetching weather data from OpenWeatherMap API."""
     
-    BASE_URL = "http://api.openweathermap.org/data/2.5"
+    BASE_URL = UpstreamClient.BASE_URL
     
-    def __init__(self, api_key: str, units: str = 'metric'):
+    def __init__(self, api_key: str, units: str = 'metric', cache: Optional[ResponseCache] = None,
+                 single_flight: Optional[SingleFlight] = None, client: Optional[UpstreamClient] = None):
         """Initialize the weather service.
         
         Args:
             api_key: OpenWeatherMap API key
             units: Units of measurement ('metric' or 'imperial')
+            cache: Optional response cache shared with other services
+            single_flight: Coalescer for identical in-flight requests (defaults to the process-wide one)
+            client: Pooled HTTP client (defaults to the process-wide one)
         """
         self.api_key = api_key
         self.units = units
-        self.session = requests.Session()
+        self.cache = cache
+        self.single_flight = single_flight or upstream_flight
+        self.client = client or get_default_client()
+        self.session = self.client.session
     
     def is_service_ready(self) -> bool:
         """Check if the weather service is ready (API key is set)."""
@@ -49,13 +75,31 @@ class WeatherService:
         params['appid'] = self.api_key
         params['units'] = self.units
         
+        if self.cache is not None:
+            cached = self.cache.get(endpoint, params)
+            if cached is not None:
+                return cached
+        
+        return self.single_flight.do(upstream_key(endpoint, params),
+                                     lambda: self._fetch(endpoint, params))
+    
+    def _fetch(self, endpoint: str, params: Dict) -> Dict:
+        """Perform the upstream request and populate the cache."""
+        span = upstream_tracer.span(endpoint, params=params)
         try:
-            response = self.session.get(f"{self.BASE_URL}/{endpoint}", params=params, timeout=10)
+            response = self.client.get(endpoint, params)
+            span.event('response', status=response.status_code)
             response.raise_for_status()
-            return response.json()
+            data = json_backend.loads(response.content)
+            if self.cache is not None:
+                self.cache.set(endpoint, params, data)
+            return data
         except requests.exceptions.RequestException as e:
             logger.error(f"API request failed: {e}")
             raise WeatherServiceError(f"Failed to fetch weather data: {str(e)}") from e
+        except json_backend.JSONDecodeError as e:
+            logger.error(f"Invalid JSON from API: {e}")
+            raise WeatherServiceError(f"Invalid response from weather API: {str(e)}") from e
     
     def get_current_weather(self, city: str, country_code: str = '') -> Dict:
         """Get current weather for a city.
@@ -109,6 +153,37 @@ class WeatherService:
         """
         return self._make_request("forecast", {'lat': lat, 'lon': lon, 'cnt': days * 8})
     
+    def get_current_weather_many(self, cities: Iterable[str], concurrency: int = 8) -> List[CityWeatherResult]:
+        """Get current weather for many cities, several requests at a time.
+        
+        Cached cities are answered from the cache; the rest share the pooled
+        client and the single-flight layer like single requests do.
+        
+        Args:
+            cities: City names (optionally "City,CC")
+            concurrency: Maximum number of requests in flight at once; clamped
+                to the client's connection pool size
+            
+        Returns:
+            One CityWeatherResult per city, in input order; failures are reported
+            per city instead of aborting the batch
+        """
+        cities = list(cities)
+        concurrency = min(concurrency, self.client.pool_maxsize)
+        if not cities:
+            return []
+        
+        def fetch_one(city: str) -> CityWeatherResult:
+            try:
+                return CityWeatherResult(city, self.get_current_weather(city), None)
+            except WeatherServiceError as e:
+                return CityWeatherResult(city, None, e)
+        
+        if concurrency <= 1 or len(cities) == 1:
+            return [fetch_one(city) for city in cities]
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(cities)), thread_name_prefix='owm-batch') as pool:
+            return list(pool.map(fetch_one, cities))
+    
     def get_weather_icon_url(self, icon_code: str) -> str:
         """Get URL for weather icon.
         
@@ -120,81 +195,243 @@ class WeatherService:
         """
         return f"http://openweathermap.org/img/wn/{icon_code}@2x.png"
     
-    def parse_weather_data(self, data: Dict) -> Dict:
-        """Parse weather data from API response.
+    def parse_current_weather(self, data: Dict) -> CurrentWeather:
+        """Parse current weather data from API response into a compact record.
         
         Args:
             data: Raw API response
             
         Returns:
-            Parsed weather data
+            Parsed current weather record
         """
         try:
             weather = data.get('weather', [{}])[0]
             main = data.get('main', {})
             wind = data.get('wind', {})
             sys = data.get('sys', {})
+            visibility = data.get('visibility')
             
-            return {
-                'city': data.get('name', 'Unknown'),
-                'country': sys.get('country', ''),
-                'temp': main.get('temp', 0),
-                'feels_like': main.get('feels_like', 0),
-                'temp_min': main.get('temp_min', 0),
-                'temp_max': main.get('temp_max', 0),
-                'pressure': main.get('pressure', 0),
-                'humidity': main.get('humidity', 0),
-                'wind_speed': wind.get('speed', 0),
-                'wind_deg': wind.get('deg', 0),
-                'description': weather.get('description', '').title(),
-                'icon': weather.get('icon', ''),
-                'sunrise': datetime.fromtimestamp(sys.get('sunrise', 0)),
-                'sunset': datetime.fromtimestamp(sys.get('sunset', 0)),
-                'dt': datetime.fromtimestamp(data.get('dt', 0)),
-                'timezone': data.get('timezone', 0),
-                'visibility': data.get('visibility', 0) / 1000 if data.get('visibility') else None,  # Convert to km
-                'clouds': data.get('clouds', {}).get('all', 0),
-                'rain': data.get('rain', {}).get('1h', 0) if 'rain' in data else 0,
-                'snow': data.get('snow', {}).get('1h', 0) if 'snow' in data else 0
-            }
+            return CurrentWeather(
+                city=data.get('name', 'Unknown'),
+                country=sys.get('country', ''),
+                temp=main.get('temp', 0),
+                feels_like=main.get('feels_like', 0),
+                temp_min=main.get('temp_min', 0),
+                temp_max=main.get('temp_max', 0),
+                pressure=main.get('pressure', 0),
+                humidity=main.get('humidity', 0),
+                wind_speed=wind.get('speed', 0),
+                wind_deg=wind.get('deg', 0),
+                description=weather.get('description', '').title(),
+                icon=weather.get('icon', ''),
+                sunrise=datetime.fromtimestamp(sys.get('sunrise', 0)),
+                sunset=datetime.fromtimestamp(sys.get('sunset', 0)),
+                dt=datetime.fromtimestamp(data.get('dt', 0)),
+                timezone=data.get('timezone', 0),
+                visibility=visibility / 1000 if visibility else None,  # Convert to km
+                clouds=data.get('clouds', {}).get('all', 0),
+                rain=data['rain'].get('1h', 0) if 'rain' in data else 0,
+                snow=data['snow'].get('1h', 0) if 'snow' in data else 0
+            )
         except Exception as e:
             logger.error(f"Error parsing weather data: {e}")
             raise WeatherServiceError(f"Failed to parse weather data: {str(e)}") from e
     
-    def parse_forecast_data(self, data: Dict) -> List[Dict]:
-        """Parse forecast data from API response.
+    def parse_forecast_points(self, data: Dict) -> List[ForecastPoint]:
+        """Parse forecast data from API response into compact records.
         
         Args:
             data: Raw API response
             
         Returns:
-            List of parsed forecast data points
+            List of forecast records in API order
         """
         try:
+            fromtimestamp = datetime.fromtimestamp
+            # คำอธิบายซ้ำกันเกือบทุกช่วงเวลา จึงเก็บผล .title() ไว้ใช้ซ้ำ
+            titles: Dict[str, str] = {}
             forecast_list = []
             for item in data.get('list', []):
                 weather = item.get('weather', [{}])[0]
                 main = item.get('main', {})
                 wind = item.get('wind', {})
+                description = weather.get('description', '')
+                title = titles.get(description)
+                if title is None:
+                    title = titles[description] = description.title()
                 
-                forecast_list.append({
-                    'dt': datetime.fromtimestamp(item.get('dt', 0)),
-                    'temp': main.get('temp', 0),
-                    'feels_like': main.get('feels_like', 0),
-                    'temp_min': main.get('temp_min', 0),
-                    'temp_max': main.get('temp_max', 0),
-                    'pressure': main.get('pressure', 0),
-                    'humidity': main.get('humidity', 0),
-                    'wind_speed': wind.get('speed', 0),
-                    'wind_deg': wind.get('deg', 0),
-                    'description': weather.get('description', '').title(),
-                    'icon': weather.get('icon', ''),
-                    'clouds': item.get('clouds', {}).get('all', 0),
-                    'rain': item.get('rain', {}).get('3h', 0) if 'rain' in item else 0,
-                    'snow': item.get('snow', {}).get('3h', 0) if 'snow' in item else 0,
-                    'pop': item.get('pop', 0)  # Probability of precipitation
-                })
+                forecast_list.append(ForecastPoint(
+                    dt=fromtimestamp(item.get('dt', 0)),
+                    temp=main.get('temp', 0),
+                    feels_like=main.get('feels_like', 0),
+                    temp_min=main.get('temp_min', 0),
+                    temp_max=main.get('temp_max', 0),
+                    pressure=main.get('pressure', 0),
+                    humidity=main.get('humidity', 0),
+                    wind_speed=wind.get('speed', 0),
+                    wind_deg=wind.get('deg', 0),
+                    description=title,
+                    icon=weather.get('icon', ''),
+                    clouds=item.get('clouds', {}).get('all', 0),
+                    rain=item['rain'].get('3h', 0) if 'rain' in item else 0,
+                    snow=item['snow'].get('3h', 0) if 'snow' in item else 0,
+                    pop=item.get('pop', 0)  # Probability of precipitation
+                ))
             return forecast_list
         except Exception as e:
             logger.error(f"Error parsing forecast data: {e}")
             raise WeatherServiceError(f"Failed to parse forecast data: {str(e)}") from e
+    
+    def parse_forecast_series(self, data: Dict) -> ForecastSeries:
+        """Parse forecast data from API response into a columnar series.
+        
+        Args:
+            data: Raw API response
+            
+        Returns:
+            Forecast series with per-day aggregates available via daily()
+        """
+        try:
+            return ForecastSeries.from_response(data)
+        except Exception as e:
+            logger.error(f"Error parsing forecast data: {e}")
+            raise WeatherServiceError(f"Failed to parse forecast data: {str(e)}") from e
+    
+    def parse_weather_data(self, data: Dict) -> Dict:
+        """Parse weather data from API response.
+        
+        Args:
+            data: Raw API response
+            
+        Returns:
+            Parsed weather data (dict form of parse_current_weather)
+        """
+        return self.parse_current_weather(data).to_dict()
+    
+    def parse_forecast_data(self, data: Dict, columnar: bool = False) -> Union[List[Dict], ForecastSeries]:
+        """Parse forecast data from API response.
+        
+        Args:
+            data: Raw API response
+            columnar: Return a ForecastSeries instead of a list of dicts
+            
+        Returns:
+            List of parsed forecast data points (dict form of parse_forecast_points),
+            or the columnar series when columnar is True
+        """
+        if columnar:
+            return self.parse_forecast_series(data)
+        return [point.to_dict() for point in self.parse_forecast_points(data)]
+
+class AsyncWeatherService:
+    """Asyncio front end to WeatherService for refreshing many cities at once.
+
+    Wraps a WeatherService rather than subclassing it, so the synchronous
+    service keeps its blocking signatures. Requests go through the same cache,
+    single-flight layer and pooled client; the blocking HTTP calls run on a
+    private thread pool sized to what the client's connection pool can keep
+    alive, so raising concurrency never queues calls behind the pool or makes
+    urllib3 discard connections. The parse helpers are synchronous (CPU only)
+    and delegate to the wrapped service.
+    """
+    
+    DEFAULT_CONCURRENCY = 16
+    
+    def __init__(self, api_key: str, units: str = 'metric', cache: Optional[ResponseCache] = None,
+                 single_flight: Optional[SingleFlight] = None, client: Optional[UpstreamClient] = None,
+                 max_workers: int = DEFAULT_CONCURRENCY):
+        """Initialize the async weather service.
+        
+        Args:
+            api_key: OpenWeatherMap API key
+            units: Units of measurement ('metric' or 'imperial')
+            cache: Optional response cache shared with other services
+            single_flight: Coalescer for identical in-flight requests
+            client: Pooled HTTP client (defaults to the process-wide one)
+            max_workers: Upper bound on concurrent upstream calls; clamped to the
+                client's pool_maxsize
+        """
+        self.service = WeatherService(api_key, units, cache=cache, single_flight=single_flight, client=client)
+        self.max_workers = max(1, min(max_workers, self.service.client.pool_maxsize))
+        if self.max_workers < max_workers:
+            logger.info(f"AsyncWeatherService limited to {self.max_workers} workers by the upstream pool size")
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='owm-async')
+    
+    def is_service_ready(self) -> bool:
+        """Check if the weather service is ready (API key is set)."""
+        return self.service.is_service_ready()
+    
+    def get_weather_icon_url(self, icon_code: str) -> str:
+        """Get URL for weather icon (see WeatherService.get_weather_icon_url)."""
+        return self.service.get_weather_icon_url(icon_code)
+    
+    def parse_current_weather(self, data: Dict) -> CurrentWeather:
+        """Parse current weather into a record (see WeatherService.parse_current_weather)."""
+        return self.service.parse_current_weather(data)
+    
+    def parse_forecast_points(self, data: Dict) -> List[ForecastPoint]:
+        """Parse forecast data into records (see WeatherService.parse_forecast_points)."""
+        return self.service.parse_forecast_points(data)
+    
+    def parse_forecast_series(self, data: Dict) -> ForecastSeries:
+        """Parse forecast data into columns (see WeatherService.parse_forecast_series)."""
+        return self.service.parse_forecast_series(data)
+    
+    def parse_weather_data(self, data: Dict) -> Dict:
+        """Parse weather data into a dict (see WeatherService.parse_weather_data)."""
+        return self.service.parse_weather_data(data)
+    
+    def parse_forecast_data(self, data: Dict, columnar: bool = False) -> Union[List[Dict], ForecastSeries]:
+        """Parse forecast data into dicts or a series (see WeatherService.parse_forecast_data)."""
+        return self.service.parse_forecast_data(data, columnar)
+    
+    async def _make_request(self, endpoint: str, params: Optional[Dict] = None) -> Dict:
+        """Run the blocking request on the service thread pool without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.service._make_request, endpoint, params)
+    
+    async def get_current_weather(self, city: str, country_code: str = '') -> Dict:
+        """Get current weather for a city."""
+        query = f"{city},{country_code}" if country_code else city
+        return await self._make_request("weather", {'q': query})
+    
+    async def get_weather_by_coords(self, lat: float, lon: float) -> Dict:
+        """Get current weather by coordinates."""
+        return await self._make_request("weather", {'lat': lat, 'lon': lon})
+    
+    async def get_forecast(self, city: str, country_code: str = '', days: int = 5) -> Dict:
+        """Get weather forecast for a city."""
+        query = f"{city},{country_code}" if country_code else city
+        return await self._make_request("forecast", {'q': query, 'cnt': days * 8})
+    
+    async def get_forecast_by_coords(self, lat: float, lon: float, days: int = 5) -> Dict:
+        """Get weather forecast by coordinates."""
+        return await self._make_request("forecast", {'lat': lat, 'lon': lon, 'cnt': days * 8})
+    
+    async def get_current_weather_many(self, cities: Iterable[str],
+                                       concurrency: int = DEFAULT_CONCURRENCY) -> List[CityWeatherResult]:
+        """Get current weather for many cities concurrently.
+        
+        Args:
+            cities: City names (optionally "City,CC")
+            concurrency: Maximum number of requests in flight at once; clamped
+                to max_workers, since extra calls would only wait in the pool
+            
+        Returns:
+            One CityWeatherResult per city, in input order; failures are reported
+            per city instead of aborting the batch
+        """
+        semaphore = asyncio.Semaphore(max(1, min(concurrency, self.max_workers)))
+        
+        async def fetch_one(city: str) -> CityWeatherResult:
+            async with semaphore:
+                try:
+                    return CityWeatherResult(city, await self.get_current_weather(city), None)
+                except WeatherServiceError as e:
+                    return CityWeatherResult(city, None, e)
+        
+        return list(await asyncio.gather(*(fetch_one(city) for city in cities)))
+    
+    def close(self) -> None:
+        """Shut down the service thread pool."""
+        self._executor.shutdown(wait=False)